@@ -0,0 +1,304 @@
+# src/gra_multiverse/aio.py
+
+"""
+EN:
+Asyncio API for answer selection.
+
+`AsyncAnswerOptimizer` exposes coroutine versions of
+`llm_module.optimize_answers` and `llm_anti_hallucination.optimize_answers`
+for asyncio services:
+
+- CPU work runs in a managed thread pool, never on the event loop;
+- `embed_fn` / `embed_many_fn` may be async callables (e.g. remote
+  embedding APIs); they are awaited on the loop before the CPU stage;
+- concurrent requests arriving within `batch_window` seconds are coalesced
+  into one call of the vectorized `optimize_answers_many`;
+- cancellation and timeouts propagate: a request cancelled before its batch
+  starts is dropped from the batch, and `timeout=` raises
+  `asyncio.TimeoutError` in the caller.
+
+RU:
+Asyncio-API для выбора ответов.
+
+CPU-работа выполняется в пуле потоков, асинхронные эмбеддеры ожидаются
+в цикле событий, одновременные запросы в окне `batch_window` склеиваются
+в один векторизованный вызов `optimize_answers_many`; отмена и тайм-ауты
+передаются вызывающему.
+"""
+
+import asyncio
+import inspect
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import llm_module
+from .cache import ResultCache
+from .llm_module import default_embed
+from .llm_anti_hallucination import ensemble
+from .llm_anti_hallucination.context_index import ContextIndex
+from .llm_anti_hallucination.rag_consistency import RagConsistencyEngine
+
+
+def _is_async(fn: Callable | None) -> bool:
+    if fn is None:
+        return False
+    return inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(getattr(fn, "__call__", None))
+
+
+BatchRunner = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+def isolate_failures(fn: Callable[[List[Any]], List[Any]], payloads: List[Any]) -> List[Any]:
+    """
+    fn(payloads), with payload-level failures isolated by bisection: if the
+    batch raises, each half is retried, down to single payloads whose
+    exception becomes their result. k bad payloads cost O(k log n) extra
+    calls instead of n.
+    """
+    try:
+        return list(fn(payloads))
+    except Exception as exc:
+        if len(payloads) == 1:
+            return [exc]
+        mid = len(payloads) // 2
+        return isolate_failures(fn, payloads[:mid]) + isolate_failures(fn, payloads[mid:])
+
+
+def _check_answers(answers: List[Any]) -> None:
+    if not all(isinstance(a, str) for a in answers):
+        raise TypeError("answers must be strings")
+
+
+class RequestCoalescer:
+    """
+    EN:
+    Groups requests by key; a group is flushed `window` seconds after its
+    first request or as soon as it holds `max_batch` requests. `run_batch`
+    receives the key and the request payloads and returns one result per
+    payload, in order.
+
+    A result that is an `Exception` instance is raised in that request only;
+    `run_batch` uses this for payload-level errors (see `isolate_failures`).
+    An exception raised by `run_batch` itself (e.g. a failing remote
+    embedder) is a batch-level error and is raised in every request of the
+    batch, without retries.
+
+    RU:
+    Группирует запросы по ключу и выполняет группу одним батчем; ошибка
+    отдельного запроса возвращается только ему, ошибка всего батча — всем.
+    """
+
+    def __init__(self, run_batch: BatchRunner, window: float = 0.002, max_batch: int = 256):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.n_requests = 0
+        self.n_batches = 0
+
+    def submit(self, key: Hashable, payload: Any) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((payload, fut))
+        self.n_requests += 1
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return fut
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        # requests cancelled while waiting for the window are dropped here
+        batch = [(p, f) for p, f in self._pending.pop(key, []) if not f.done()]
+        if not batch:
+            return
+        self.n_batches += 1
+        task = asyncio.ensure_future(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.run_batch(key, [p for p, _ in batch])
+        except asyncio.CancelledError:
+            for _, fut in batch:
+                fut.cancel()
+            raise
+        except Exception as exc:
+            results = [exc] * len(batch)
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    async def aclose(self) -> None:
+        """Flush pending groups and wait for running batches."""
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class AsyncAnswerOptimizer:
+    """
+    EN:
+    Async front end for answer selection with request coalescing.
+
+        async with AsyncAnswerOptimizer(embed_many_fn=remote_embed) as opt:
+            res = await opt.optimize_answers(answers, timeout=2.0)
+            grounded = await opt.optimize_answers_grounded(answers, context_documents=docs)
+
+    Args:
+        embed_fn, embed_many_fn, meta_goal: as in `llm_module.optimize_answers_many`
+            (sync or async callables).
+        executor: executor for CPU work; if None a ThreadPoolExecutor with
+            `max_workers` threads is created and shut down by `aclose`.
+        batch_window: coalescing window in seconds.
+        max_batch: flush a group as soon as it holds this many requests.
+        cache: optional `ResultCache` for `optimize_answers` requests
+            (see `llm_module.optimize_answers_many`).
+
+    RU:
+    Асинхронный интерфейс выбора ответов со склейкой запросов.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], Any] = default_embed,
+        embed_many_fn: Callable[[List[str]], Any] | None = None,
+        meta_goal: str = "max_consistency",
+        executor: Executor | None = None,
+        max_workers: int | None = None,
+        batch_window: float = 0.002,
+        max_batch: int = 256,
+        cache: ResultCache | None = None,
+    ):
+        self.embed_fn = embed_fn
+        self.cache = cache
+        self.embed_many_fn = embed_many_fn
+        self.meta_goal = meta_goal
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="gra-aio"
+        )
+        self.coalescer = RequestCoalescer(self._run_batch, batch_window, max_batch)
+
+    async def __aenter__(self) -> "AsyncAnswerOptimizer":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self.coalescer.aclose()
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+    # ---- batch execution ----
+
+    async def _embed_async(self, texts: List[str]) -> np.ndarray:
+        if _is_async(self.embed_many_fn):
+            return np.asarray(await self.embed_many_fn(texts), dtype=np.complex128)
+        rows = await asyncio.gather(*(self.embed_fn(t) for t in texts))
+        return np.stack([np.asarray(r, dtype=np.complex128) for r in rows], axis=0)
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        if self.embed_many_fn is not None:
+            return np.asarray(self.embed_many_fn(texts), dtype=np.complex128)
+        if self.embed_fn is default_embed:
+            return llm_module.default_embed_many(texts)
+        return np.stack([np.asarray(self.embed_fn(t), dtype=np.complex128) for t in texts], axis=0)
+
+    async def _run_batch(self, key: Hashable, payloads: List[Any]) -> List[Any]:
+        """
+        Embedding runs once for the whole batch; its errors fail the batch.
+        The selection step is run through `isolate_failures`, so a payload
+        it cannot handle fails alone.
+        """
+        loop = asyncio.get_running_loop()
+        if key == "llm":
+            flat = [a for answers in payloads for a in answers]
+            if _is_async(self.embed_many_fn) or (self.embed_many_fn is None and _is_async(self.embed_fn)):
+                embeds = await self._embed_async(flat)
+            else:
+                embeds = await loop.run_in_executor(self.executor, self._embed_sync, flat)
+            # precomputed; looked up by text since cache hits and bisected halves are subsets
+            rows = dict(zip(flat, embeds))
+            call = partial(
+                llm_module.optimize_answers_many,
+                meta_goal=self.meta_goal,
+                embed_fn=self.embed_fn,
+                embed_many_fn=lambda texts: np.stack([rows[t] for t in texts]),
+                cache=self.cache,
+            )
+        else:
+            _, lambda_items, return_all_scores, graded_level1, rag_engine = key
+
+            def call(items: List[Any]) -> List[Any]:
+                return ensemble.optimize_answers_many(
+                    [answers for answers, _ in items],
+                    context_documents=[ctx for _, ctx in items],
+                    lambda_levels=dict(lambda_items) if lambda_items is not None else None,
+                    return_all_scores=return_all_scores,
+                    graded_level1=graded_level1,
+                    rag_engine=rag_engine,
+                )
+        return await loop.run_in_executor(self.executor, isolate_failures, call, payloads)
+
+    @staticmethod
+    async def _await(fut: asyncio.Future, timeout: float | None) -> Any:
+        if timeout is None:
+            return await fut
+        return await asyncio.wait_for(fut, timeout)
+
+    # ---- public API ----
+
+    async def optimize_answers(self, answers: List[str], timeout: float | None = None) -> Dict[str, Any]:
+        """
+        EN: Coroutine version of `llm_module.optimize_answers` (same result dict).
+        RU: Асинхронная версия `llm_module.optimize_answers`.
+        """
+        if len(answers) == 0:
+            return {"chosen": "", "index": -1, "debug": "no answers provided"}
+        _check_answers(answers)
+        fut = self.coalescer.submit("llm", list(answers))
+        return await self._await(fut, timeout)
+
+    async def optimize_answers_grounded(
+        self,
+        answers: List[str],
+        context_documents: Optional[List[str] | ContextIndex] = None,
+        lambda_levels: Optional[Dict[int, float]] = None,
+        return_all_scores: bool = True,
+        graded_level1: bool = False,
+        rag_engine: Optional[RagConsistencyEngine] = None,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        """
+        EN:
+        Coroutine version of `llm_anti_hallucination.optimize_answers`.
+        Requests with equal scoring options share a batch; each request keeps
+        its own context documents.
+
+        RU:
+        Асинхронная версия `llm_anti_hallucination.optimize_answers`.
+        """
+        if not answers:
+            raise ValueError("answers list must not be empty")
+        _check_answers(answers)
+        lambda_items = tuple(sorted(lambda_levels.items())) if lambda_levels is not None else None
+        key = ("grounded", lambda_items, return_all_scores, graded_level1, rag_engine)
+        fut = self.coalescer.submit(key, (list(answers), context_documents))
+        return await self._await(fut, timeout)
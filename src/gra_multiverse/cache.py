@@ -0,0 +1,268 @@
+# src/gra_multiverse/cache.py
+
+"""
+EN:
+Result cache for repeated selection calls (`llm_module.optimize_answers`,
+`vpn_module.select_best_vpn_config`).
+
+Entries are keyed by an order-insensitive fingerprint of the inputs plus the
+hyperparameters. An exact hit on a permuted input set is remapped to the
+caller's ordering. In near-hit mode, an entry that differs from the request
+by only a few inputs provides a warm start: its embeddings are reused and
+its meta-node is shifted by the added / removed inputs.
+
+RU:
+Кэш результатов для повторяющихся вызовов выбора.
+
+Ключ — не зависящий от порядка отпечаток входов плюс гиперпараметры.
+Точное попадание с переставленными входами переотображается на порядок
+вызывающего. В режиме «почти попадания» запись, отличающаяся лишь
+несколькими входами, даёт тёплый старт оптимизатора.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+
+def fingerprint_item(item: Any) -> str:
+    """Stable digest of one input (text, config dict or structured-array row)."""
+    if isinstance(item, str):
+        data = b"s:" + item.encode("utf-8")
+    elif isinstance(item, np.void):
+        data = b"r:" + item.tobytes()
+    else:
+        data = b"j:" + json.dumps(item, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def fingerprint_items(items: Sequence[Any]) -> List[str]:
+    """Digests of all inputs, in the caller's order."""
+    return [fingerprint_item(item) for item in items]
+
+
+def embedder_key(fn: Callable) -> Hashable:
+    """
+    Part of the cache parameters that identifies an embedder.
+
+    An embedder may define a `cache_key` attribute (e.g. model name and
+    version) to share entries across equivalent instances. Otherwise the
+    function object itself is the key: two closures from one factory or two
+    lambdas never share entries, and the entries keep the embedder alive, so
+    its identity cannot be reused while they exist.
+    """
+    key = getattr(fn, "cache_key", None)
+    if key is not None:
+        return ("cache_key", key)
+    return fn
+
+
+@dataclass
+class CacheEntry:
+    """One solved input set."""
+    digests: Tuple[str, ...]  # sorted multiset of input digests
+    chosen: str  # digest of the selected input
+    similarity: float
+    meta: np.ndarray  # optimized meta-node
+    embeds: Dict[str, np.ndarray]  # digest -> embedding
+    expires_at: float | None = None
+    nbytes: int = 0  # size of meta + embeds
+
+
+@dataclass
+class CacheHit:
+    """
+    Result of `ResultCache.lookup`.
+
+    For an exact hit `index` is the position of the cached choice in the
+    caller's ordering. For a near hit `index` is -1, `added` lists caller
+    positions not covered by the entry and `removed` the entry digests that
+    are absent from the request.
+    """
+    entry: CacheEntry
+    index: int = -1
+    added: List[int] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def exact(self) -> bool:
+        return self.index >= 0
+
+    def warm_meta(self, digests: Sequence[str], embeds: np.ndarray) -> np.ndarray:
+        """
+        Shift the cached meta-node to the request: the entry sum minus removed
+        embeddings plus added ones, divided by the new number of inputs.
+        """
+        n_old = len(self.entry.digests)
+        total = self.entry.meta * n_old
+        for d in self.removed:
+            total = total - self.entry.embeds[d]
+        for i in self.added:
+            total = total + embeds[i]
+        return total / len(digests)
+
+
+class ResultCache:
+    """
+    LRU cache with TTL for selection results.
+
+    The cache is thread-safe: lookups, stores and evictions hold an internal
+    lock, so one instance can be shared by executor threads (e.g. the
+    scoring server).
+
+    Args:
+        maxsize: maximum number of entries (least recently used are evicted).
+        max_bytes: bound on the memory held by cached meta-nodes and
+            embeddings (None = unbounded). Every entry keeps the embeddings
+            of its whole input set, so for fleet-sized inputs this, not
+            `maxsize`, is the effective limit; least recently used entries
+            are evicted and an entry larger than the bound is not cached.
+        ttl: entry lifetime in seconds (None = no expiry).
+        max_diff: near-hit threshold, i.e. the maximum number of added plus
+            removed inputs for which a cached entry is used as a warm start
+            (0 disables near hits).
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float | None = 300.0,
+        max_diff: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+        max_bytes: int | None = 256 * 2**20,
+    ):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.ttl = ttl
+        self.max_diff = max_diff
+        self.clock = clock
+        self._entries: "OrderedDict[Tuple[Hashable, Tuple[str, ...]], CacheEntry]" = OrderedDict()
+        self._by_digest: Dict[Tuple[Hashable, str], Set[Tuple[Hashable, Tuple[str, ...]]]] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    # ---- internals ----
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return entry.expires_at is not None and self.clock() >= entry.expires_at
+
+    def _remove(self, key: Tuple[Hashable, Tuple[str, ...]]) -> None:
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.nbytes
+        params = key[0]
+        for d in set(entry.digests):
+            keys = self._by_digest.get((params, d))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_digest[(params, d)]
+
+    def _near(self, params: Hashable, digests: Sequence[str]) -> CacheHit | None:
+        shared: Counter = Counter()
+        for d in set(digests):
+            for key in self._by_digest.get((params, d), ()):
+                shared[key] += 1
+
+        wanted = Counter(digests)
+        best: CacheHit | None = None
+        best_diff = self.max_diff + 1
+        for key, _ in shared.most_common(8):
+            entry = self._entries[key]
+            if self._expired(entry):
+                self._remove(key)
+                continue
+            have = Counter(entry.digests)
+            removed = list((have - wanted).elements())
+            diff = sum((wanted - have).values()) + len(removed)
+            if diff < best_diff:
+                covered = Counter(have)
+                added: List[int] = []
+                for i, d in enumerate(digests):
+                    if covered[d] > 0:
+                        covered[d] -= 1
+                    else:
+                        added.append(i)
+                best = CacheHit(entry=entry, added=added, removed=removed)
+                best_diff = diff
+        return best
+
+    # ---- public API ----
+
+    def lookup(self, digests: Sequence[str], params: Hashable) -> CacheHit | None:
+        """Find an exact (or, with `max_diff` > 0, near) hit for `digests`."""
+        with self._lock:
+            return self._lookup(digests, params)
+
+    def _lookup(self, digests: Sequence[str], params: Hashable) -> CacheHit | None:
+        key = (params, tuple(sorted(digests)))
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return CacheHit(entry=entry, index=list(digests).index(entry.chosen))
+
+        if self.max_diff > 0:
+            hit = self._near(params, digests)
+            if hit is not None:
+                self.near_hits += 1
+                return hit
+
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        digests: Sequence[str],
+        params: Hashable,
+        chosen_index: int,
+        similarity: float,
+        meta: np.ndarray,
+        embeds: np.ndarray,
+    ) -> None:
+        """Store a solved input set (`embeds` rows follow `digests`)."""
+        key = (params, tuple(sorted(digests)))
+        expires_at = None if self.ttl is None else self.clock() + self.ttl
+        entry = CacheEntry(
+            digests=key[1],
+            chosen=digests[chosen_index],
+            similarity=similarity,
+            meta=np.array(meta, copy=True),
+            embeds={d: np.array(e, copy=True) for d, e in zip(digests, embeds)},
+            expires_at=expires_at,
+        )
+        entry.nbytes = entry.meta.nbytes + sum(e.nbytes for e in entry.embeds.values())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and entry.nbytes > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.nbytes += entry.nbytes
+            for d in set(digests):
+                self._by_digest.setdefault((params, d), set()).add(key)
+            while len(self._entries) > self.maxsize or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_digest.clear()
+            self.nbytes = 0
@@ -0,0 +1,97 @@
+# src/gra_multiverse/cli.py
+
+"""
+EN:
+Command-line entry point `gra-multiverse`.
+
+    gra-multiverse serve                        # JSON lines on stdin/stdout
+    gra-multiverse serve --socket /tmp/gra.sock --context-index ./ctx_index
+
+RU:
+Точка входа командной строки `gra-multiverse`.
+"""
+
+import argparse
+import asyncio
+import os
+import stat
+import sys
+from typing import List
+
+from .cache import ResultCache
+from .server import ScoringServer
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="gra-multiverse")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="run a long-lived local scoring server")
+    serve.add_argument("--socket", help="Unix socket path (default: JSON lines on stdin/stdout)")
+    serve.add_argument("--context-index", help="directory written by ContextIndex.save")
+    serve.add_argument("--doc-matrix", help=".npy file written by DocumentMatrix.build")
+    serve.add_argument("--rag-top-k", type=int, default=3)
+    serve.add_argument("--batch-window", type=float, default=0.002, help="coalescing window, seconds")
+    serve.add_argument("--max-batch", type=int, default=256)
+    serve.add_argument("--workers", type=int, default=None, help="threads for CPU work")
+    serve.add_argument("--max-in-flight", type=int, default=1024, help="requests running at once")
+    serve.add_argument("--cache-size", type=int, default=1024)
+    serve.add_argument("--cache-ttl", type=float, default=300.0)
+    serve.add_argument("--cache-max-mb", type=float, default=256.0, help="memory bound of the result cache")
+    return parser
+
+
+def make_server(args: argparse.Namespace) -> ScoringServer:
+    context_index = None
+    if args.context_index:
+        from .llm_anti_hallucination.context_index import ContextIndex
+        context_index = ContextIndex.load(args.context_index)
+
+    rag_engine = None
+    if args.doc_matrix:
+        from .llm_anti_hallucination.rag_consistency import DocumentMatrix, RagConsistencyEngine
+        rag_engine = RagConsistencyEngine(DocumentMatrix.load(args.doc_matrix), top_k=args.rag_top_k)
+
+    return ScoringServer(
+        context_index=context_index,
+        rag_engine=rag_engine,
+        cache=ResultCache(
+            maxsize=args.cache_size, ttl=args.cache_ttl, max_bytes=int(args.cache_max_mb * 2**20)
+        ),
+        batch_window=args.batch_window,
+        max_batch=args.max_batch,
+        max_workers=args.workers,
+        max_in_flight=args.max_in_flight,
+    )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = make_server(args)
+    try:
+        if args.socket:
+            if os.path.lexists(args.socket):
+                if not stat.S_ISSOCK(os.lstat(args.socket).st_mode):
+                    raise SystemExit(f"gra-multiverse: {args.socket} exists and is not a socket")
+                os.unlink(args.socket)  # stale socket of a previous run
+            unix = await server.start_unix(args.socket)
+            print(f"gra-multiverse: listening on {args.socket}", file=sys.stderr)
+            async with unix:
+                await unix.serve_forever()
+        else:
+            await server.serve_stdio()
+    finally:
+        await server.aclose()
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        try:
+            asyncio.run(_serve(args))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
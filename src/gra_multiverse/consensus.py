@@ -0,0 +1,248 @@
+# src/gra_multiverse/consensus.py
+
+"""
+EN:
+Streaming consensus over LLM / agent answers that arrive one by one.
+
+`ConsensusSession` keeps the embedding matrix, the foam scores and the
+optimized meta-node between calls. Each `add` only embeds the new answer,
+warm-starts the optimizer from the previous meta-node and re-ranks all
+answers with one vectorized product. A stability signal tells the caller
+when the remaining (slow) backends can no longer change the choice.
+
+RU:
+Потоковый консенсус по ответам LLM / агентов, приходящим по одному.
+
+`ConsensusSession` хранит матрицу эмбеддингов, оценки пены и
+оптимизированный мета-узел между вызовами. Каждый `add` эмбеддит только
+новый ответ, стартует оптимизатор с предыдущего мета-узла и
+переранжирует ответы одним векторным произведением. Сигнал стабильности
+показывает, что оставшиеся (медленные) бэкенды уже не изменят выбор.
+"""
+
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+
+from .core import Level, Goal, MultiverseState, MultiverseFunctional
+from .optimizer import MultiverseOptimizer
+from .llm_module import default_embed, default_index_dim_fn
+from .llm_anti_hallucination.metrics import foam_level0
+
+
+META_KEY: Tuple[int, ...] = (0, 1)
+
+
+class ConsensusSession:
+    """
+    EN:
+    Incremental version of `llm_module.optimize_answers`.
+
+    Answers are added one at a time with `add`; after every call `result()`
+    returns the current choice in the same format as `optimize_answers`,
+    extended with level-0/1 foam scores and a stability signal.
+
+    If `expected` (the total number of answers in the session, received
+    plus pending) is given, `stable` is True once no further answer can make another already
+    received answer overtake the current choice. A late answer can still be
+    chosen itself if it is closer to the consensus than every received one.
+
+    The bound assumes that no future embedding has a norm above `max_norm`.
+    The default embedder returns unit vectors, so `max_norm` defaults to 1.0
+    for it. For a custom `embed_fn` the norms of future answers are unknown:
+    pass `max_norm` to enable the early stability signal, otherwise `stable`
+    only becomes True once all expected answers are received.
+
+    RU:
+    Инкрементальная версия `llm_module.optimize_answers`.
+    Ответы добавляются по одному через `add`; `result()` возвращает текущий
+    выбор, оценки пены и сигнал стабильности.
+    """
+
+    def __init__(
+        self,
+        meta_goal: str = "max_consistency",
+        embed_fn: Callable[[str], np.ndarray] = default_embed,
+        expected: int | None = None,
+        lambda0: float = 1.0,
+        alpha: float = 0.8,
+        step_size: float = 1e-2,
+        max_steps: int = 50,
+        tol: float = 1e-6,
+        max_norm: float | None = None,
+    ):
+        if max_norm is None and embed_fn is default_embed:
+            max_norm = 1.0  # default_embed is normalized
+        self.embed_fn = embed_fn
+        self.expected = expected
+        self.max_norm = max_norm
+        self.max_steps = max_steps
+        self.tol = tol
+
+        level0 = Level(index=0, name="local_answers")
+        level1 = Level(index=1, name="meta_consistency")
+        goals = [
+            Goal(level=level0, description="local plausibility"),
+            Goal(level=level1, description=f"meta goal: {meta_goal}"),
+        ]
+        self.functional = MultiverseFunctional(
+            levels=[level0, level1],
+            goals=goals,
+            lambda0=lambda0,
+            alpha=alpha,
+            index_dim_fn=default_index_dim_fn,
+        )
+        self.optimizer = MultiverseOptimizer(
+            functional=self.functional,
+            step_size=step_size,
+        )
+
+        self.answers: List[str] = []
+        self._embeds: np.ndarray | None = None  # (capacity, d), rows [:n] valid
+        self._norms = np.zeros(0)  # (capacity,)
+        self._sum: np.ndarray | None = None
+        self._meta: np.ndarray | None = None
+        self._max_norm = 0.0
+
+        self._phi0: List[float] = []
+        self._norm_keys: List[str] = []
+        self._norm_counts: Counter = Counter()
+
+        self._sims = np.zeros(0)
+        self._best_idx = -1
+
+    # ---- incremental updates ----
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def add(self, answer: str) -> Dict[str, Any]:
+        """Add one answer, update the consensus and return `result()`."""
+        e = np.asarray(self.embed_fn(answer), dtype=np.complex128).ravel()
+        n = len(self.answers)
+        self._append_row(e)
+        self.answers.append(answer)
+
+        # foam: level 0 per answer once, level 1 via duplicate counts
+        self._phi0.append(foam_level0(answer))
+        key = answer.strip().lower()
+        self._norm_keys.append(key)
+        self._norm_counts[key] += 1
+
+        # warm start: shift the previous optimized meta-node by the change of the mean
+        if n == 0:
+            self._sum = e.copy()
+            meta_init = e.copy()
+        else:
+            prev_mean = self._sum / n
+            self._sum = self._sum + e
+            meta_init = self._meta + (self._sum / (n + 1) - prev_mean)
+
+        self._meta = self._optimize_meta(meta_init)
+        self._rank()
+        return self.result()
+
+    def _append_row(self, e: np.ndarray) -> None:
+        n = len(self.answers)
+        if self._embeds is None:
+            self._embeds = np.zeros((8, e.size), dtype=np.complex128)
+            self._norms = np.zeros(8)
+        elif e.size != self._embeds.shape[1]:
+            raise ValueError("embedding dimension changed within a session")
+        if n == self._embeds.shape[0]:
+            # amortized O(1) append: double the capacity
+            grown = np.zeros((2 * n, e.size), dtype=np.complex128)
+            grown[:n] = self._embeds[:n]
+            self._embeds = grown
+            self._norms = np.concatenate([self._norms, np.zeros(n)])
+        self._embeds[n] = e
+        norm = float(np.linalg.norm(e))
+        self._norms[n] = norm
+        self._max_norm = max(self._max_norm, norm)
+
+    def _optimize_meta(self, meta_init: np.ndarray) -> np.ndarray:
+        """
+        Run the optimizer over the meta-node only. Level-0 nodes are held fixed:
+        their J_loc terms are constant w.r.t. the meta-node and drop out of ∇J.
+        """
+        psi = MultiverseState({META_KEY: meta_init})
+        psi_opt = self.optimizer.run_to_convergence(
+            state=psi,
+            max_steps=self.max_steps,
+            tol=self.tol,
+            callback=None,
+            active_keys=[META_KEY],
+        )
+        return psi_opt[META_KEY]
+
+    def _rank(self) -> None:
+        n = len(self.answers)
+        embeds = self._embeds[:n]
+        num = np.real(np.conj(embeds) @ self._meta)
+        denom = self._norms[:n] * np.linalg.norm(self._meta) + 1e-9
+        self._sims = num / denom
+        self._best_idx = int(np.argmax(self._sims))
+
+    # ---- read-out ----
+
+    def remaining(self) -> int | None:
+        """Number of answers still expected (None if unknown)."""
+        if self.expected is None:
+            return None
+        return max(self.expected - len(self.answers), 0)
+
+    def stability_margin(self) -> float:
+        """
+        Smallest slack (in units of the mean embedding) by which the current
+        choice beats any other received answer under the worst case of the
+        remaining answers. Non-negative means the choice is stable.
+        """
+        n = len(self.answers)
+        if n == 0:
+            return -np.inf
+        remaining = self.remaining()
+        if remaining is None:
+            return -np.inf
+        if n == 1:
+            return np.inf if remaining == 0 else -np.inf
+        if remaining > 0 and self.max_norm is None:
+            return -np.inf  # pending answers of unknown norm can move the sum arbitrarily
+
+        # Scores are Re<ê_i, s> for the sum s of embeddings. The remaining answers
+        # move s by at most remaining * max_norm, which changes the gap between
+        # the leader b and a rival j by at most |ê_b - ê_j| * remaining * max_norm.
+        unit = self._embeds[:n] / (self._norms[:n, None] + 1e-9)
+        scores = np.real(np.conj(unit) @ self._sum)
+        b = self._best_idx
+        gap = scores[b] - scores
+        dist = np.linalg.norm(unit - unit[b], axis=1)
+        max_norm = max(self.max_norm or 0.0, self._max_norm)
+        slack = gap - dist * remaining * max_norm
+        slack[b] = np.inf
+        return float(np.min(slack) / n)
+
+    def is_stable(self) -> bool:
+        """True if the remaining answers can no longer change the choice among received ones."""
+        return self.stability_margin() >= 0.0
+
+    def scores(self) -> Dict[str, List[float]]:
+        """Current per-answer foam scores (level 0 and level 1)."""
+        n = len(self.answers)
+        phi1 = [float(n - self._norm_counts[k]) for k in self._norm_keys]
+        return {"phi0": list(self._phi0), "phi1": phi1}
+
+    def result(self) -> Dict[str, Any]:
+        """Current choice in the format of `optimize_answers` plus stability info."""
+        if not self.answers:
+            return {"chosen": "", "index": -1, "debug": "no answers provided", "stable": False}
+        idx = self._best_idx
+        best_sim = float(self._sims[idx])
+        margin = self.stability_margin()
+        return {
+            "chosen": self.answers[idx],
+            "index": idx,
+            "debug": f"best_cosine_similarity={best_sim:.4f}, n_answers={len(self.answers)}",
+            "scores": self.scores(),
+            "stable": margin >= 0.0,
+            "margin": margin,
+        }
@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Tuple, Callable
 import numpy as np
 
+from .parallel import WorkerPool
+
 
 @dataclass
 class Level:
@@ -60,20 +62,37 @@ class FoamFunctional:
         level: Level,
         index_dim_fn: Callable[[Tuple[int, ...]], int],
     ) -> float:
-        """Compute Φ^(l) over all pairs with dim(a)=dim(b)=l."""
+        """
+        Compute Φ^(l) over all pairs with dim(a)=dim(b)=l.
+
+        Vectorized: Φ = Σ_{a≠b} (Re <Ψ^a | P_G Ψ^b>)² from one Gram matrix,
+        so the work runs inside BLAS (which releases the GIL).
+        """
+        return self.phi_from_vectors(self.level_vectors(state, level, index_dim_fn))
+
+    def level_vectors(
+        self,
+        state: MultiverseState,
+        level: Level,
+        index_dim_fn: Callable[[Tuple[int, ...]], int],
+    ) -> Tuple[np.ndarray, np.ndarray] | None:
+        """Stacked (Ψ^a, P_G Ψ^a) rows of one level; None if it has fewer than 2 nodes."""
         keys = [k for k in state.keys() if index_dim_fn(k) == level.index]
-        val = 0.0
-        for i in range(len(keys)):
-            for j in range(len(keys)):
-                if i == j:
-                    continue
-                a, b = keys[i], keys[j]
-                psi_a = state[a]
-                psi_b = state[b]
-                p_psi_b = self.projector(psi_b)
-                inner = float(np.vdot(psi_a, p_psi_b))
-                val += abs(inner) ** 2
-        return val
+        if len(keys) < 2:
+            return None
+        vecs = np.stack([np.ravel(state[k]) for k in keys])
+        projected = np.stack([np.ravel(self.projector(state[k])) for k in keys])
+        return vecs, projected
+
+    @staticmethod
+    def phi_from_vectors(rows: Tuple[np.ndarray, np.ndarray] | None) -> float:
+        """Φ^(l) from the output of `level_vectors` (NumPy only)."""
+        if rows is None:
+            return 0.0
+        vecs, projected = rows
+        gram = np.real(np.conj(vecs) @ projected.T)
+        np.fill_diagonal(gram, 0.0)
+        return float(np.sum(gram * gram))
 
 
 class MultiverseFunctional:
@@ -90,13 +109,27 @@ class MultiverseFunctional:
         lambda0: float = 1.0,
         alpha: float = 0.8,
         index_dim_fn: Callable[[Tuple[int, ...]], int] | None = None,
+        n_workers: int = 1,
+        blas_threads: int | None = None,
     ):
+        """
+        n_workers > 1 evaluates the level terms of J_multiverse concurrently
+        in a thread pool; the sum is always taken in level order, so results
+        do not depend on the worker count. Only the NumPy part of a level
+        runs in the workers; key filtering and stacking stay in the calling
+        thread. With n_workers <= 1 the levels are evaluated inline.
+        blas_threads limits BLAS threads inside `parallel_section()`, which
+        `MultiverseOptimizer.run_to_convergence` enters once per run
+        (default: cpu_count // n_workers; requires the optional threadpoolctl
+        package).
+        """
         self.levels = levels
         self.goals = goals
         self.lambda0 = lambda0
         self.alpha = alpha
         self.index_dim_fn = index_dim_fn if index_dim_fn is not None else (lambda a: len(a) - 1)
         self.foam = FoamFunctional()
+        self.pool = WorkerPool(n_workers, blas_threads)
 
     def lambda_l(self, l: int) -> float:
         return self.lambda0 * (self.alpha ** l)
@@ -109,19 +142,58 @@ class MultiverseFunctional:
         """
         return 0.5 * float(np.vdot(psi, psi).real)
 
+    def level_term(self, state: MultiverseState, level: Level) -> float:
+        """Λ_l-weighted contribution of one level to J_multiverse."""
+        lam = self.lambda_l(level.index)
+        # local contributions J^(0) ~ J_loc
+        if level.index == 0:
+            total = 0.0
+            for k in state.keys():
+                if self.index_dim_fn(k) != 0:
+                    continue
+                total += lam * self.J_loc(state[k])
+            return total
+        # For prototype: add Φ^(l) only (no explicit recursion of J^(l-1))
+        return lam * self.foam.phi_level(state, level, self.index_dim_fn)
+
+    def _level_job(self, state: MultiverseState, level: Level) -> Callable[[], float]:
+        """
+        Split `level_term` for the pool: the Python-side work (key filtering,
+        stacking) runs here, in the calling thread; the returned job only
+        does NumPy work.
+        """
+        if level.index == 0:
+            # O(n) vdots, cheap next to the foam levels: evaluated here as well
+            term = self.level_term(state, level)
+            return lambda: term
+        lam = self.lambda_l(level.index)
+        rows = self.foam.level_vectors(state, level, self.index_dim_fn)
+        return lambda: lam * self.foam.phi_from_vectors(rows)
+
+    def level_terms(self, state: MultiverseState) -> List[float]:
+        """`level_term` of every level, in the order of `self.levels`."""
+        if self.pool.n_workers <= 1:
+            return [self.level_term(state, level) for level in self.levels]
+        # jobs are prepared lazily in this thread while earlier levels run in the pool
+        jobs = (self._level_job(state, level) for level in self.levels)
+        return list(self.pool.map(lambda job: job(), jobs))
+
+    def parallel_section(self):
+        """Context manager limiting BLAS threads while level workers run (no-op when serial)."""
+        return self.pool.section()
+
     def J_multiverse(self, state: MultiverseState) -> float:
         """Compute scalar J_multiverse(Ψ) for current state."""
         total = 0.0
-        # level-wise
-        for level in self.levels:
-            lam = self.lambda_l(level.index)
-            # local contributions J^(0) ~ J_loc
-            if level.index == 0:
-                for k in state.keys():
-                    if self.index_dim_fn(k) != 0:
-                        continue
-                    total += lam * self.J_loc(state[k])
-            else:
-                # For prototype: add Φ^(l) only (no explicit recursion of J^(l-1))
-                total += lam * self.foam.phi_level(state, level, self.index_dim_fn)
+        if self.pool.n_workers <= 1:
+            for level in self.levels:
+                total += self.level_term(state, level)
+            return total
+        # level-wise, reduced in level order
+        for term in self.level_terms(state):
+            total += term
         return total
+
+    def close(self) -> None:
+        """Shut down the worker pool (if any)."""
+        self.pool.close()
@@ -1,9 +0,0 @@
-from .state import MultiverseState
-from .functional import J_multiverse
-from .optimizer import MultiverseOptimizer
-
-__all__ = [
-    "MultiverseState",
-    "J_multiverse",
-    "MultiverseOptimizer",
-]
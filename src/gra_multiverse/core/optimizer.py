@@ -1,12 +0,0 @@
-class MultiverseOptimizer:
-    def __init__(self, lambda_levels=None, lr=0.01):
-        self.lambda_levels = lambda_levels or {}
-        self.lr = lr
-
-    def step(self, state):
-        """
-        One optimization step over the multiverse state.
-        For now this can be a simple heuristic update.
-        """
-        # твоя текущая логика оптимизации / градиентного шага
-        return state
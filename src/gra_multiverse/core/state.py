@@ -1,5 +0,0 @@
-class MultiverseState(dict):
-    """Minimal container for multiverse states indexed by multi-indices."""
-
-    # твоя текущая реализация, перенесённая сюда
-    ...
@@ -1,3 +1,19 @@
-from .ensemble import optimize_answers
+from .ensemble import optimize_answers, optimize_answers_many
+from .context_index import ContextIndex
+from .markers import MarkerLexicon
+from .pipeline import AnswerFeatures, MetricPipeline, register_level, default_pipeline
+from .rag_consistency import DocumentMatrix, RagConsistencyEngine, check_consistency_with_docs
 
-__all__ = ["optimize_answers"]
+__all__ = [
+    "optimize_answers",
+    "optimize_answers_many",
+    "ContextIndex",
+    "MarkerLexicon",
+    "AnswerFeatures",
+    "MetricPipeline",
+    "register_level",
+    "default_pipeline",
+    "DocumentMatrix",
+    "RagConsistencyEngine",
+    "check_consistency_with_docs",
+]
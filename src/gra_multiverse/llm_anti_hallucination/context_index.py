@@ -0,0 +1,159 @@
+"""
+Reusable inverted index over context documents with BM25 grounding scores.
+
+A `ContextIndex` is built once per corpus (or loaded from disk with
+memory-mapped postings) and can be passed to `foam_level2`,
+`aggregate_scores` and `optimize_answers` in place of a raw document list.
+Scoring an answer touches only the postings of its tokens, not the corpus.
+"""
+
+import json
+import os
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+def tokenize(text: str) -> List[str]:
+    """Same naive tokenization as `foam_level2`: lowercase + whitespace split."""
+    return text.lower().split()
+
+
+class ContextIndex:
+    """
+    Inverted index in CSR layout.
+
+    For term id t, its postings are the slice indptr[t]:indptr[t + 1] of
+    `post_docs` (document ids) and `post_tf` (term frequencies).
+    """
+
+    _ARRAYS = ("doc_freq", "indptr", "post_docs", "post_tf", "doc_len")
+
+    def __init__(
+        self,
+        vocab: Dict[str, int],
+        doc_freq: np.ndarray,
+        indptr: np.ndarray,
+        post_docs: np.ndarray,
+        post_tf: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocab = vocab
+        self.doc_freq = doc_freq
+        self.indptr = indptr
+        self.post_docs = post_docs
+        self.post_tf = post_tf
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+
+        n = self.n_docs
+        self.avgdl = float(np.mean(doc_len)) if n else 0.0
+        df = np.asarray(doc_freq, dtype=np.float64)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5))
+
+    @property
+    def n_docs(self) -> int:
+        return int(self.doc_len.shape[0])
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    # ---- construction / persistence ----
+
+    @classmethod
+    def build(cls, documents: List[str], k1: float = 1.5, b: float = 0.75) -> "ContextIndex":
+        """Tokenize `documents` and build the index."""
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_len = np.zeros(len(documents), dtype=np.int32)
+
+        for d, doc in enumerate(documents):
+            tokens = tokenize(doc)
+            doc_len[d] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(terms, kind="stable")  # keeps doc ids sorted within a term
+        doc_freq = np.bincount(terms, minlength=len(vocab)).astype(np.int32)
+        indptr = np.concatenate([[0], np.cumsum(doc_freq, dtype=np.int64)])
+
+        return cls(
+            vocab=vocab,
+            doc_freq=doc_freq,
+            indptr=indptr,
+            post_docs=np.asarray(doc_ids, dtype=np.int32)[order],
+            post_tf=np.asarray(tfs, dtype=np.int32)[order],
+            doc_len=doc_len,
+            k1=k1,
+            b=b,
+        )
+
+    def save(self, path: str) -> None:
+        """Write the index into directory `path` (one .npy per array + vocab.json)."""
+        os.makedirs(path, exist_ok=True)
+        terms = [""] * len(self.vocab)
+        for term, t in self.vocab.items():
+            terms[t] = term
+        with open(os.path.join(path, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"terms": terms, "k1": self.k1, "b": self.b}, f, ensure_ascii=False)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ContextIndex":
+        """Load an index saved by `save`; postings are memory-mapped if `mmap`."""
+        with open(os.path.join(path, "vocab.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in cls._ARRAYS
+        }
+        vocab = {term: t for t, term in enumerate(meta["terms"])}
+        return cls(vocab=vocab, k1=meta["k1"], b=meta["b"], **arrays)
+
+    # ---- scoring ----
+
+    def bm25(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 scores of `text` (as a query) against the documents it touches.
+
+        Returns:
+            (doc_ids, scores) for documents sharing at least one token.
+        """
+        ids = sorted({self.vocab[t] for t in tokenize(text) if t in self.vocab})
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        docs_parts = []
+        score_parts = []
+        for t in ids:
+            lo, hi = int(self.indptr[t]), int(self.indptr[t + 1])
+            docs = np.asarray(self.post_docs[lo:hi], dtype=np.int64)
+            tf = np.asarray(self.post_tf[lo:hi], dtype=np.float64)
+            dl = self.doc_len[docs].astype(np.float64)
+            norm = self.k1 * (1.0 - self.b + self.b * dl / (self.avgdl or 1.0))
+            docs_parts.append(docs)
+            score_parts.append(self.idf[t] * tf * (self.k1 + 1.0) / (tf + norm))
+
+        docs = np.concatenate(docs_parts)
+        uniq, inv = np.unique(docs, return_inverse=True)
+        return uniq, np.bincount(inv, weights=np.concatenate(score_parts))
+
+    def grounding(self, text: str) -> float:
+        """Best BM25 score of `text` over all documents (0.0 if no overlap)."""
+        _, scores = self.bm25(text)
+        return float(scores.max()) if scores.size else 0.0
+
+    def foam(self, answers: List[str]) -> List[float]:
+        """Context foam per answer: 1 / (1 + grounding), as in `foam_level2`."""
+        return [1.0 / (1.0 + self.grounding(a)) for a in answers]
@@ -2,25 +2,39 @@
 High-level ensemble / anti-hallucination API for LLM answers.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 
-from .metrics import aggregate_scores
+from .context_index import ContextIndex
+from .metrics import aggregate_scores, aggregate_scores_many
+from .pipeline import MetricPipeline
+from .rag_consistency import RagConsistencyEngine
 
 
 def optimize_answers(
     answers: List[str],
-    context_documents: Optional[List[str]] = None,
+    context_documents: Optional[List[str] | ContextIndex] = None,
     lambda_levels: Optional[Dict[int, float]] = None,
     return_all_scores: bool = True,
+    graded_level1: bool = False,
+    rag_engine: Optional[RagConsistencyEngine] = None,
+    pipeline: Optional[MetricPipeline] = None,
 ) -> Dict[str, Any]:
     """
     Select a more consistent answer from a list of LLM outputs.
 
     Args:
         answers: list of candidate answers.
-        context_documents: optional list of context documents (RAG, KB, etc.).
+        context_documents: optional list of context documents (RAG, KB, etc.)
+            or a prebuilt `ContextIndex` (BM25 grounding, no per-call rebuild).
         lambda_levels: dict[level -> weight], e.g. {0: 0.5, 1: 1.0, 2: 2.0}.
         return_all_scores: if True, include per-level foam scores.
+        graded_level1: if True, level-1 foam uses MinHash-graded disagreement
+            instead of exact string inequality.
+        rag_engine: optional `RagConsistencyEngine`; adds embedding-based
+            RAG foam as level 3 (weight `lambda_levels[3]`, default
+            `DEFAULT_RAG_LAMBDA` if the key is missing).
+        pipeline: optional custom `MetricPipeline` (any number of levels);
+            replaces the default levels 0-3.
 
     Returns:
         {
@@ -34,7 +48,9 @@ def optimize_answers(
 
     lambda_levels = lambda_levels or {0: 0.5, 1: 1.0, 2: 2.0}
 
-    scores = aggregate_scores(answers, context_documents, lambda_levels)
+    scores = aggregate_scores(
+        answers, context_documents, lambda_levels, graded_level1, rag_engine, pipeline
+    )
     total = scores["total"]
 
     # выбираем индекс с минимальным total
@@ -50,3 +66,53 @@ def optimize_answers(
         result["scores"] = scores
 
     return result
+
+
+def optimize_answers_many(
+    answer_lists: Sequence[List[str]],
+    context_documents: Optional[
+        Sequence[Optional[List[str] | ContextIndex]] | List[str] | ContextIndex
+    ] = None,
+    lambda_levels: Optional[Dict[int, float]] = None,
+    return_all_scores: bool = True,
+    graded_level1: bool = False,
+    rag_engine: Optional[RagConsistencyEngine] = None,
+    pipeline: Optional[MetricPipeline] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Batch version of `optimize_answers` for many prompts in one call.
+
+    Args:
+        answer_lists: one list of candidate answers per prompt.
+        context_documents: one context list / `ContextIndex` shared by all
+            prompts, or a sequence with one list / index (or None) per prompt.
+        lambda_levels: dict[level -> weight], as in `optimize_answers`.
+        return_all_scores: if True, include per-level foam scores.
+        graded_level1, rag_engine, pipeline: see `optimize_answers`.
+
+    Returns:
+        list with one `optimize_answers`-style result per prompt.
+    """
+    for p, answers in enumerate(answer_lists):
+        if not answers:
+            raise ValueError(f"answers list for prompt {p} must not be empty")
+
+    lambda_levels = lambda_levels or {0: 0.5, 1: 1.0, 2: 2.0}
+
+    all_scores = aggregate_scores_many(
+        answer_lists, context_documents, lambda_levels, graded_level1, rag_engine, pipeline
+    )
+
+    results: List[Dict[str, Any]] = []
+    for answers, scores in zip(answer_lists, all_scores):
+        total = scores["total"]
+        chosen_index = min(range(len(total)), key=lambda i: total[i])
+        result: Dict[str, Any] = {
+            "answer": answers[chosen_index],
+            "chosen_index": chosen_index,
+        }
+        if return_all_scores:
+            result["scores"] = scores
+        results.append(result)
+
+    return results
@@ -0,0 +1,428 @@
+"""
+Uncertainty-marker lexicon compiled into an Aho-Corasick automaton.
+
+A `MarkerLexicon` is compiled once into an Aho-Corasick automaton with
+per-state outputs, so every answer is scanned in one pass whose cost does
+not depend on the number of markers. Matching is by substring, as in the
+original `marker in text` checks.
+
+The automaton is stored sparsely (sorted trie edges plus failure links,
+O(total marker length)). For small alphabets a dense transition table
+(state x character class -> state) is derived as well, which saves the
+failure-link walks; it is skipped when it would exceed `dense_limit`
+cells, as for multilingual / CJK lexicons with thousands of distinct
+characters.
+
+Single texts are scanned with `scan` (positions) and `counts`; batches with
+`scan_many`, which advances all texts one character per step as a NumPy
+gather. Compiled lexicons are saved as .npy arrays plus a JSON sidecar and
+can be loaded from a content-addressed cache directory with `cached`.
+"""
+
+import hashlib
+import json
+import os
+from collections import deque
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class MarkerLexicon:
+    """
+    Compiled marker automaton.
+
+    Arrays:
+        edge_keys, edge_next: trie edges sorted by key
+            state * n_classes + class, and their target states. Class 0
+            stands for every character that does not occur in any marker.
+        fail: failure (suffix) link of every state.
+        delta: optional dense (n_states, n_classes) int32 transitions
+            (None for large alphabets).
+        char_codes: code point of character class c + 1.
+        out_indptr, out_ids: CSR lists of marker ids matched when a state is
+            entered (own marker plus those reached through suffix links).
+        out_weight, out_count: per-state sum of marker weights / matches.
+    """
+
+    _ARRAYS = (
+        "edge_keys", "edge_next", "fail", "char_codes",
+        "out_indptr", "out_ids", "out_weight", "out_count", "weights",
+    )
+
+    def __init__(
+        self,
+        markers: List[str],
+        weights: np.ndarray,
+        edge_keys: np.ndarray,
+        edge_next: np.ndarray,
+        fail: np.ndarray,
+        char_codes: np.ndarray,
+        out_indptr: np.ndarray,
+        out_ids: np.ndarray,
+        out_weight: np.ndarray,
+        out_count: np.ndarray,
+        max_penalty: float | None = None,
+        case_insensitive: bool = True,
+        delta: np.ndarray | None = None,
+    ):
+        self.markers = markers
+        self.weights = weights
+        self.edge_keys = edge_keys
+        self.edge_next = edge_next
+        self.fail = fail
+        self.delta = delta
+        self.char_codes = char_codes
+        self.out_indptr = out_indptr
+        self.out_ids = out_ids
+        self.out_weight = out_weight
+        self.out_count = out_count
+        self.max_penalty = max_penalty
+        self.case_insensitive = case_insensitive
+
+        # code point -> character class lookup (class 0 for everything else)
+        size = int(char_codes.max()) + 1 if char_codes.size else 1
+        self._class_of = np.zeros(size, dtype=np.int32)
+        self._class_of[np.asarray(char_codes, dtype=np.int64)] = np.arange(1, char_codes.size + 1)
+        self._class_map = {chr(int(c)): k + 1 for k, c in enumerate(char_codes)}
+        self._lengths = np.array([len(m) for m in markers], dtype=np.int64)
+        self._n_classes = char_codes.size + 1
+        self._goto: List[Dict[int, int]] | None = None  # per-state edges for scalar scans
+
+    @property
+    def n_states(self) -> int:
+        return int(self.fail.size)
+
+    @property
+    def dense(self) -> bool:
+        return self.delta is not None
+
+    def __len__(self) -> int:
+        return len(self.markers)
+
+    # ---- construction / persistence ----
+
+    @classmethod
+    def build(
+        cls,
+        markers: Sequence[str] | Dict[str, float],
+        default_weight: float = 1.0,
+        max_penalty: float | None = None,
+        case_insensitive: bool = True,
+        dense_limit: int = 1 << 22,
+    ) -> "MarkerLexicon":
+        """
+        Compile `markers` (a list, or a dict marker -> weight).
+
+        The hedging penalty of a text is the sum of the weights of all
+        matches, capped at `max_penalty` if given. A dense transition table
+        is built only if it has at most `dense_limit` cells (16 MiB by
+        default).
+        """
+        if isinstance(markers, dict):
+            items = list(markers.items())
+        else:
+            items = [(m, default_weight) for m in markers]
+        norm: Dict[str, float] = {}
+        for m, w in items:
+            m = m.lower() if case_insensitive else m
+            if m:
+                norm[m] = float(w)
+        patterns = list(norm)
+        weights = np.array([norm[m] for m in patterns], dtype=np.float64)
+
+        chars = sorted({ch for m in patterns for ch in m})
+        class_map = {ch: k + 1 for k, ch in enumerate(chars)}
+        n_classes = len(chars) + 1
+
+        # trie
+        goto: List[Dict[int, int]] = [{}]
+        own: List[List[int]] = [[]]
+        for pid, m in enumerate(patterns):
+            s = 0
+            for ch in m:
+                c = class_map[ch]
+                nxt = goto[s].get(c)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[s][c] = nxt
+                    goto.append({})
+                    own.append([])
+                s = nxt
+            own[s].append(pid)
+
+        # BFS: suffix links and accumulated outputs (sparse, O(total length))
+        n_states = len(goto)
+        fail = np.zeros(n_states, dtype=np.int32)
+        outputs: List[List[int]] = [[] for _ in range(n_states)]
+        bfs: List[int] = []
+        queue: deque = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            bfs.append(s)
+            outputs[s] = own[s] + outputs[fail[s]]
+            for c, t in goto[s].items():
+                if s:
+                    f = int(fail[s])
+                    while f and c not in goto[f]:
+                        f = int(fail[f])
+                    fail[t] = goto[f].get(c, 0)
+                queue.append(t)
+
+        edges = sorted((s * n_classes + c, t) for s, g in enumerate(goto) for c, t in g.items())
+        edge_keys = np.array([k for k, _ in edges], dtype=np.int64)
+        edge_next = np.array([t for _, t in edges], dtype=np.int32)
+
+        # dense transitions for small alphabets (states in BFS order, so
+        # the row of a failure link is always complete before it is copied)
+        delta = None
+        if n_states * n_classes <= dense_limit:
+            delta = np.zeros((n_states, n_classes), dtype=np.int32)
+            for c, t in goto[0].items():
+                delta[0, c] = t
+            for s in bfs:
+                delta[s] = delta[fail[s]]
+                for c, t in goto[s].items():
+                    delta[s, c] = t
+
+        out_count = np.array([len(o) for o in outputs], dtype=np.int32)
+        out_indptr = np.concatenate([[0], np.cumsum(out_count, dtype=np.int64)])
+        out_ids = np.array([p for o in outputs for p in o], dtype=np.int32)
+        out_weight = np.array([weights[o].sum() if o else 0.0 for o in outputs], dtype=np.float64)
+
+        return cls(
+            markers=patterns,
+            weights=weights,
+            edge_keys=edge_keys,
+            edge_next=edge_next,
+            fail=fail,
+            delta=delta,
+            char_codes=np.array([ord(ch) for ch in chars], dtype=np.int64),
+            out_indptr=out_indptr,
+            out_ids=out_ids,
+            out_weight=out_weight,
+            out_count=out_count,
+            max_penalty=max_penalty,
+            case_insensitive=case_insensitive,
+        )
+
+    def save(self, path: str) -> None:
+        """Write the compiled lexicon into directory `path` (.npy arrays + lexicon.json)."""
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "lexicon.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "markers": self.markers,
+                    "max_penalty": self.max_penalty,
+                    "case_insensitive": self.case_insensitive,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), np.asarray(getattr(self, name)))
+        if self.delta is not None:
+            np.save(os.path.join(path, "delta.npy"), np.asarray(self.delta))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "MarkerLexicon":
+        """Load a lexicon saved by `save`; the arrays are memory-mapped if `mmap`."""
+        with open(os.path.join(path, "lexicon.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in cls._ARRAYS}
+        delta_path = os.path.join(path, "delta.npy")
+        arrays["delta"] = np.load(delta_path, mmap_mode=mode) if os.path.exists(delta_path) else None
+        return cls(
+            markers=meta["markers"],
+            max_penalty=meta["max_penalty"],
+            case_insensitive=meta["case_insensitive"],
+            **arrays,
+        )
+
+    @classmethod
+    def cached(
+        cls,
+        markers: Sequence[str] | Dict[str, float],
+        cache_dir: str,
+        default_weight: float = 1.0,
+        max_penalty: float | None = None,
+        case_insensitive: bool = True,
+    ) -> "MarkerLexicon":
+        """
+        Load the compiled lexicon for these arguments from `cache_dir`,
+        building and saving it on the first call. The cache entry is keyed by
+        a digest of the markers, weights and options.
+        """
+        items = sorted(markers.items()) if isinstance(markers, dict) else sorted(markers)
+        key = json.dumps(
+            [items, default_weight, max_penalty, case_insensitive], ensure_ascii=False
+        ).encode("utf-8")
+        path = os.path.join(cache_dir, hashlib.blake2b(key, digest_size=16).hexdigest())
+        if os.path.exists(os.path.join(path, "lexicon.json")):
+            return cls.load(path)
+        lexicon = cls.build(markers, default_weight, max_penalty, case_insensitive)
+        lexicon.save(path)
+        return lexicon
+
+    # ---- scanning ----
+
+    def _prepare(self, text: str) -> str:
+        return text.lower() if self.case_insensitive else text
+
+    def _next(self, state: np.ndarray, cls: np.ndarray) -> np.ndarray:
+        """Vectorized transition of many (state, class) pairs."""
+        if self.delta is not None:
+            return self.delta[state, cls]
+        state = np.array(state, dtype=np.int64)
+        out = np.zeros_like(state)
+        todo = np.flatnonzero(cls)  # class 0 always leads back to the root
+        keys = self.edge_keys
+        while todo.size:
+            key = state[todo] * self._n_classes + cls[todo]
+            pos = np.minimum(np.searchsorted(keys, key), keys.size - 1)
+            found = keys[pos] == key
+            out[todo[found]] = self.edge_next[pos[found]]
+            todo = todo[~found]
+            at_root = state[todo] == 0
+            todo = todo[~at_root]
+            state[todo] = self.fail[state[todo]]
+        return out
+
+    def _stepper(self):
+        """Scalar transition function (state, class) -> state."""
+        if self.delta is not None:
+            delta = self.delta
+            return lambda s, c: delta[s, c]
+        if self._goto is None:
+            self._goto = [{} for _ in range(self.n_states)]
+            for key, t in zip(self.edge_keys.tolist(), self.edge_next.tolist()):
+                self._goto[key // self._n_classes][key % self._n_classes] = t
+        goto, fail = self._goto, self.fail.tolist()
+
+        def step(s: int, c: int) -> int:
+            if c == 0:
+                return 0
+            while True:
+                t = goto[s].get(c)
+                if t is not None:
+                    return t
+                if s == 0:
+                    return 0
+                s = fail[s]
+
+        return step
+
+    def scan(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        All matches as (start, end, marker), end exclusive, in order of end
+        position. Positions refer to the lowercased text if case-insensitive.
+        """
+        text = self._prepare(text)
+        step, class_map = self._stepper(), self._class_map
+        out_count, out_indptr, out_ids = self.out_count, self.out_indptr, self.out_ids
+        matches: List[Tuple[int, int, str]] = []
+        s = 0
+        for i, ch in enumerate(text):
+            s = step(s, class_map.get(ch, 0))
+            if out_count[s]:
+                for pid in out_ids[out_indptr[s]:out_indptr[s + 1]]:
+                    matches.append((i + 1 - int(self._lengths[pid]), i + 1, self.markers[pid]))
+        return matches
+
+    def counts(self, text: str) -> Dict[str, int]:
+        """Number of matches per marker (markers without matches are omitted)."""
+        result: Dict[str, int] = {}
+        for _, _, marker in self.scan(text):
+            result[marker] = result.get(marker, 0) + 1
+        return result
+
+    def scan_many(self, texts: Sequence[str], max_cells: int = 1 << 18) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Total match count and summed marker weight per text, shape (n,) each.
+
+        Texts are sorted by length and processed in chunks of at most
+        `max_cells` padded characters; each step advances all texts of a
+        chunk by one character with one table gather.
+        """
+        n = len(texts)
+        counts = np.zeros(n, dtype=np.int64)
+        weights = np.zeros(n, dtype=np.float64)
+        if n == 0 or not self.markers:
+            return counts, weights
+
+        prepared = [self._prepare(t) for t in texts]
+        lengths = np.fromiter((len(t) for t in prepared), dtype=np.int64, count=n)
+        order = np.argsort(lengths, kind="stable")
+        sorted_len = lengths[order]
+        table_size = self._class_of.size
+        start = int(np.searchsorted(sorted_len, 1))  # empty texts have no matches
+        while start < n:
+            # largest chunk [start, stop) with (stop - start) * width <= max_cells
+            lo, hi = start + 1, n
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if (mid - start) * int(sorted_len[mid - 1]) <= max_cells:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            idx = order[start:lo]
+            width = int(sorted_len[lo - 1])
+            start = lo
+            if idx.size < 64:
+                # few long texts: a per-text loop beats width-many tiny gathers
+                for i in idx:
+                    counts[i], weights[i] = self._scan_totals(prepared[i])
+                continue
+            # one UTF-32 buffer per chunk, scattered into a padded matrix;
+            # padding uses class 0, which never produces a match
+            row_len = lengths[idx]
+            flat = np.frombuffer("".join(prepared[i] for i in idx).encode("utf-32-le"), dtype=np.uint32)
+            flat_cls = np.where(flat < table_size, self._class_of[np.minimum(flat, table_size - 1)], 0)
+            rows = np.repeat(np.arange(idx.size), row_len)
+            cols = np.arange(flat.size) - np.repeat(np.cumsum(row_len) - row_len, row_len)
+            classes = np.zeros((idx.size, width), dtype=np.int64)
+            classes[rows, cols] = flat_cls
+            state = np.zeros(idx.size, dtype=np.int64)
+            c_sum = np.zeros(idx.size, dtype=np.int64)
+            w_sum = np.zeros(idx.size, dtype=np.float64)
+            for k in range(width):
+                state = self._next(state, classes[:, k])
+                c_sum += self.out_count[state]
+                w_sum += self.out_weight[state]
+            counts[idx] = c_sum
+            weights[idx] = w_sum
+        return counts, weights
+
+    def _scan_totals(self, prepared: str) -> Tuple[int, float]:
+        """(match count, summed weight) of an already prepared text."""
+        s = 0
+        count = 0
+        total = 0.0
+        class_map = self._class_map
+        out_count, out_weight = self.out_count, self.out_weight
+        if self.delta is not None:
+            delta = self.delta  # inline table lookup: this is the per-answer hot path
+            for ch in prepared:
+                s = delta[s, class_map.get(ch, 0)]
+                if out_count[s]:
+                    count += int(out_count[s])
+                    total += float(out_weight[s])
+            return count, total
+        step = self._stepper()
+        for ch in prepared:
+            s = step(s, class_map.get(ch, 0))
+            if out_count[s]:
+                count += int(out_count[s])
+                total += float(out_weight[s])
+        return count, total
+
+    def penalty(self, text: str) -> float:
+        """Hedging penalty of one text: summed weights, capped at `max_penalty`."""
+        _, total = self._scan_totals(self._prepare(text))
+        return total if self.max_penalty is None else min(total, self.max_penalty)
+
+    def penalties(self, texts: Sequence[str]) -> np.ndarray:
+        """Vectorized `penalty` over many texts."""
+        _, weights = self.scan_many(texts)
+        return weights if self.max_penalty is None else np.minimum(weights, self.max_penalty)
@@ -4,49 +4,99 @@ Basic foam / risk metrics for LLM answers.
 This is a simple, heuristic implementation intended as a research prototype.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence, TYPE_CHECKING
 
+import numpy as np
 
-def foam_level0(answer: str) -> float:
+from .minhash import minhash_signatures, agreement_credit
+from .context_index import ContextIndex
+from .markers import MarkerLexicon
+from .rag_consistency import RagConsistencyEngine
+
+if TYPE_CHECKING:
+    from .pipeline import MetricPipeline
+
+
+UNCERTAINTY_MARKERS = ["maybe", "perhaps", "i guess", "возможно", "кажется"]
+
+# Built-in lexicon: any marker adds 0.5 (weights are capped at 0.5).
+DEFAULT_LEXICON = MarkerLexicon.build(UNCERTAINTY_MARKERS, default_weight=0.5, max_penalty=0.5)
+
+# Weight of level 3 (RAG foam) when a rag_engine is given but lambda_levels
+# has no entry for it; same as the default weight of context foam (level 2).
+DEFAULT_RAG_LAMBDA = 2.0
+
+
+def foam_level0(answer: str, lexicon: MarkerLexicon | None = None) -> float:
     """
     Local foam: very simple heuristic based on length and presence of obvious uncertainty markers.
+
+    Markers are matched by `lexicon` (default: `UNCERTAINTY_MARKERS`, flat
+    penalty 0.5). A custom `MarkerLexicon` with per-marker weights turns the
+    penalty into weighted hedging: the sum of the weights of all matches,
+    capped at the lexicon's `max_penalty`.
     """
-    text = answer.lower()
     base = len(answer) * 0.001  # длина как лёгкий штраф
 
-    uncertainty_markers = ["maybe", "perhaps", "i guess", "возможно", "кажется"]
-    penalty_uncertainty = any(m in text for m in uncertainty_markers)
-
-    return base + (0.5 if penalty_uncertainty else 0.0)
+    lexicon = lexicon if lexicon is not None else DEFAULT_LEXICON
+    return base + lexicon.penalty(answer)
 
 
-def foam_level1(answers: List[str]) -> List[float]:
+def foam_level1(
+    answers: List[str],
+    graded: bool = False,
+    num_perm: int = 64,
+    bands: int = 16,
+    shingle_size: int = 3,
+) -> List[float]:
     """
-    Cross-answer foam: simple pairwise disagreement heuristic.
-
-    For now: for each answer we count how many others are 'very different' in a naive way
-    (string inequality), which is obviously simplistic but enough for a toy prototype.
+    Cross-answer foam: pairwise disagreement with the other answers.
+
+    Each answer is normalized once and exact duplicates are grouped by hash,
+    so the default (exact) mode is O(n): the score is the number of other
+    answers with a different normalized text.
+
+    With `graded=True`, disagreement between two different answers is
+    1 - (estimated Jaccard similarity of their character shingles). The
+    similarities are MinHash estimates summed per signature bucket
+    (`minhash.agreement_credit`), so no pairs are listed and the cost stays
+    near-linear even when all samples are near-duplicates. `bands` is
+    accepted for compatibility and no longer used.
     """
     n = len(answers)
-    scores = [0.0] * n
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            if answers[i].strip().lower() != answers[j].strip().lower():
-                scores[i] += 1.0
-    return scores
-
-
-def foam_level2(answers: List[str], context_documents: List[str]) -> List[float]:
+    group_of: Dict[str, int] = {}
+    group_ids = np.fromiter(
+        (group_of.setdefault(a.strip().lower(), len(group_of)) for a in answers),
+        dtype=np.int64,
+        count=n,
+    )
+    group_size = np.bincount(group_ids, minlength=len(group_of)).astype(np.float64)
+    scores = n - group_size[group_ids]
+
+    if graded and len(group_of) > 1:
+        uniq = list(group_of)
+        sig = minhash_signatures(uniq, num_perm=num_perm, shingle_size=shingle_size)
+        # agreement credit per unique text, weighted by the size of the other group
+        credit = agreement_credit(sig, group_size)
+        scores = scores - credit[group_ids]
+
+    return scores.tolist()
+
+
+def foam_level2(answers: List[str], context_documents: List[str] | ContextIndex) -> List[float]:
     """
     Context foam: penalty if answer does not share tokens with context.
 
     Very naive implementation: we check unigram overlap with concatenated context.
+    If a prebuilt `ContextIndex` is given, BM25 grounding is used instead
+    and the corpus is not re-tokenized.
     """
     if not context_documents:
         return [0.0] * len(answers)
 
+    if isinstance(context_documents, ContextIndex):
+        return context_documents.foam(answers)
+
     ctx = " ".join(context_documents).lower().split()
     ctx_set = set(ctx)
 
@@ -62,38 +112,83 @@ def foam_level2(answers: List[str], context_documents: List[str]) -> List[float]
 
 def aggregate_scores(
     answers: List[str],
-    context_documents: List[str] | None,
+    context_documents: List[str] | ContextIndex | None,
     lambda_levels: Dict[int, float],
+    graded_level1: bool = False,
+    rag_engine: RagConsistencyEngine | None = None,
+    pipeline: "MetricPipeline | None" = None,
 ) -> Dict[str, Any]:
     """
     Compute per-level foam and total scores for each answer.
 
+    `context_documents` may be a raw list or a prebuilt `ContextIndex`.
+    `graded_level1` switches level 1 to MinHash-graded disagreement
+    (see `foam_level1`). If `rag_engine` is given, an extra level 3
+    (embedding RAG foam, 1 - top-k cosine consistency) is added and
+    weighted by `lambda_levels[3]` (`DEFAULT_RAG_LAMBDA` if missing).
+
+    A custom `MetricPipeline` replaces the default levels (and then
+    `graded_level1` / `rag_engine` are ignored); every registered level l
+    is reported as "phi<l>" and weighted by `lambda_levels[l]`.
+
     Returns:
         {
           "phi0": [..],
           "phi1": [..],
           "phi2": [..],
+          "phi3": [..],  # only with rag_engine
           "total": [..],
         }
     """
-    context_documents = context_documents or []
-
-    phi0 = [foam_level0(a) for a in answers]
-    phi1 = foam_level1(answers)
-    phi2 = foam_level2(answers, context_documents)
-
-    lam0 = lambda_levels.get(0, 0.0)
-    lam1 = lambda_levels.get(1, 0.0)
-    lam2 = lambda_levels.get(2, 0.0)
-
-    total = [
-        lam0 * phi0[i] + lam1 * phi1[i] + lam2 * phi2[i]
-        for i in range(len(answers))
-    ]
-
-    return {
-        "phi0": phi0,
-        "phi1": phi1,
-        "phi2": phi2,
-        "total": total,
-    }
+    return aggregate_scores_many(
+        [answers], [context_documents or []], lambda_levels, graded_level1, rag_engine, pipeline
+    )[0]
+
+
+def aggregate_scores_many(
+    answer_lists: Sequence[List[str]],
+    context_documents: Sequence[List[str] | ContextIndex | None] | List[str] | ContextIndex | None,
+    lambda_levels: Dict[int, float],
+    graded_level1: bool = False,
+    rag_engine: RagConsistencyEngine | None = None,
+    pipeline: "MetricPipeline | None" = None,
+) -> List[Dict[str, Any]]:
+    """
+    Batch version of `aggregate_scores` over many prompts.
+
+    All answers are flattened into one `AnswerFeatures` (normalized and
+    tokenized once), every level of the metric pipeline is evaluated on it
+    and the totals are one matrix product over all levels.
+
+    `context_documents` is either one list / `ContextIndex` shared by all
+    prompts or a sequence with one list / index (or None) per prompt.
+    With `rag_engine`, all answers of all prompts are scored against the
+    document matrix in one batch query (level 3).
+
+    Returns:
+        list with one `aggregate_scores`-style dict per prompt.
+    """
+    # pipeline.py imports this module, so import it lazily
+    from .pipeline import default_pipeline
+
+    if pipeline is None:
+        if rag_engine is not None and 3 not in lambda_levels:
+            lambda_levels = {**lambda_levels, 3: DEFAULT_RAG_LAMBDA}
+        pipeline = default_pipeline(graded_level1, rag_engine)
+    return pipeline.score_many(answer_lists, context_documents, lambda_levels)
+
+
+def _per_prompt_contexts(
+    context_documents: Sequence[List[str] | ContextIndex | None] | List[str] | ContextIndex | None,
+    n_prompts: int,
+) -> List[List[str] | ContextIndex | None]:
+    """Expand a shared context list / index (or None) into one entry per prompt."""
+    if context_documents is None or isinstance(context_documents, ContextIndex):
+        return [context_documents] * n_prompts
+    if len(context_documents) == 0:
+        return [None] * n_prompts  # shared empty list: no context
+    if isinstance(context_documents[0], str):
+        return [context_documents] * n_prompts  # type: ignore[list-item]
+    if len(context_documents) != n_prompts:
+        raise ValueError("context_documents must be shared or given once per prompt")
+    return list(context_documents)  # type: ignore[arg-type]
@@ -0,0 +1,169 @@
+"""
+MinHash signatures and locality-sensitive hashing for near-duplicate answers.
+
+Used by `foam_level1` to measure graded disagreement between answers
+without comparing every pair of strings: `agreement_credit` sums estimated
+similarities per signature bucket, so near-duplicate sample sets (where
+banded LSH would put almost every pair into one bucket) stay O(n).
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+_SHINGLE_BASE = np.uint64(1099511628211)  # FNV prime, used as polynomial base
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer (vectorized, wraps modulo 2**64)."""
+    x = x.astype(np.uint64, copy=True)
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def shingle_hashes(texts: List[str], k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hash all character k-shingles of all texts.
+
+    Returns:
+        (hashes, owner): flat uint64 shingle hashes and the index of the text
+        each shingle belongs to. Texts shorter than k contribute one shingle
+        for the whole text.
+    """
+    n = len(texts)
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=n)
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if n else np.zeros(0, dtype=np.int64)
+
+    # polynomial rolling hash of every window of k code points
+    windows = np.maximum(lengths - k + 1, 1)
+    owner = np.repeat(np.arange(n, dtype=np.int64), windows)
+    offset = np.arange(owner.size, dtype=np.int64) - np.repeat(np.cumsum(windows) - windows, windows)
+    pos = starts[owner] + offset
+    span = np.minimum(lengths[owner], k)
+
+    hashes = np.zeros(owner.size, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(k):
+            valid = j < span
+            idx = np.where(valid, pos + j, 0)
+            c = codes[idx] if codes.size else np.zeros(idx.size, dtype=np.uint64)
+            hashes = np.where(valid, hashes * _SHINGLE_BASE + c + np.uint64(1), hashes)
+        hashes ^= span.astype(np.uint64)
+    return _mix64(hashes), owner
+
+
+def minhash_signatures(
+    texts: List[str],
+    num_perm: int = 64,
+    shingle_size: int = 3,
+    seed: int = 0,
+    chunk: int = 16,
+) -> np.ndarray:
+    """
+    Compute MinHash signatures, shape (n, num_perm), dtype uint64.
+
+    Each "permutation" is a seeded 64-bit mix of the shingle hash; the
+    signature entry is its minimum over the text's shingles.
+    """
+    n = len(texts)
+    sig = np.full((n, num_perm), _MASK64, dtype=np.uint64)
+    if n == 0:
+        return sig
+
+    hashes, owner = shingle_hashes(texts, shingle_size)
+    if hashes.size == 0:
+        return sig
+
+    rng = np.random.default_rng(seed)
+    salts = rng.integers(0, 2**63, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    # shingles are grouped by owner, so per-text minima are segment reductions
+    counts = np.bincount(owner, minlength=n)
+    has = counts > 0
+    starts = (np.cumsum(counts) - counts)[has]
+    for p0 in range(0, num_perm, chunk):
+        s = salts[p0:p0 + chunk]
+        mixed = _mix64(hashes[:, None] ^ s[None, :])
+        sig[has, p0:p0 + s.size] = np.minimum.reduceat(mixed, starts, axis=0)
+    return sig
+
+
+def lsh_candidate_pairs(signatures: np.ndarray, bands: int = 16) -> np.ndarray:
+    """
+    Banded LSH over MinHash signatures.
+
+    Rows that agree on all entries of at least one band become candidates.
+
+    Returns:
+        int64 array of shape (m, 2) with unique pairs (i, j), i < j.
+    """
+    n, num_perm = signatures.shape
+    if n < 2:
+        return np.zeros((0, 2), dtype=np.int64)
+    if num_perm % bands != 0:
+        raise ValueError("num_perm must be divisible by bands")
+    rows = num_perm // bands
+
+    codes = []
+    for b in range(bands):
+        key = np.zeros(n, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for r in range(rows):
+                key = _mix64(key ^ signatures[:, b * rows + r])
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        # runs of equal keys = buckets; only buckets with 2+ rows matter
+        run_starts = np.concatenate([[0], np.flatnonzero(np.diff(sorted_key)) + 1])
+        run_lens = np.diff(np.concatenate([run_starts, [n]]))
+        for start, length in zip(run_starts[run_lens > 1], run_lens[run_lens > 1]):
+            bucket = order[start:start + length]
+            i, j = np.triu_indices(length, k=1)
+            a = np.minimum(bucket[i], bucket[j])
+            c = np.maximum(bucket[i], bucket[j])
+            codes.append(a * n + c)
+
+    if not codes:
+        return np.zeros((0, 2), dtype=np.int64)
+    uniq = np.unique(np.concatenate(codes))
+    return np.stack([uniq // n, uniq % n], axis=1)
+
+
+def estimate_similarity(signatures: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity for each (i, j) pair."""
+    if pairs.size == 0:
+        return np.zeros(0)
+    return np.mean(signatures[pairs[:, 0]] == signatures[pairs[:, 1]], axis=1)
+
+
+def agreement_credit(signatures: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    """
+    Weighted sum of estimated Jaccard similarities to all other rows:
+
+        credit[i] = sum_{j != i} weights[j] * mean_p [sig[i, p] == sig[j, p]]
+
+    computed per bucket instead of per pair. At every signature position the
+    rows sharing a value form a bucket, and each member is credited with the
+    bucket's total weight (minus its own). Cost O(n * num_perm * log n)
+    regardless of how many pairs collide.
+    """
+    n, num_perm = signatures.shape
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+    if n == 0 or num_perm == 0:
+        return np.zeros(n)
+    order = np.argsort(signatures, axis=0, kind="stable")  # (n, num_perm)
+    ordered = np.take_along_axis(signatures, order, axis=0)
+    new_bucket = np.ones((n, num_perm), dtype=bool)
+    new_bucket[1:] = ordered[1:] != ordered[:-1]
+    # column-major flattening: every column starts a new bucket
+    bucket = np.cumsum(new_bucket.T.ravel()) - 1
+    rows = order.T.ravel()
+    bucket_weight = np.bincount(bucket, weights=weights[rows])
+    total = np.bincount(rows, weights=bucket_weight[bucket], minlength=n)
+    return total / num_perm - weights
@@ -0,0 +1,339 @@
+"""
+Pluggable multi-level metric pipeline.
+
+A `MetricPipeline` maps level indices to metric plugins. Every plugin
+receives the same `AnswerFeatures`: all answers of all prompts, flattened,
+normalized, tokenized and hashed exactly once. The plugin returns one foam
+value per answer. Totals are computed as a single matrix product
+`lambda @ phi` over all registered levels.
+
+Custom levels are plain callables `features -> np.ndarray`, or classes
+registered by name with `register_level`:
+
+    @register_level("length")
+    class LengthFoam:
+        def __call__(self, features):
+            return features.n_tokens * 0.01
+
+    pipeline = default_pipeline().with_level(4, LengthFoam())
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .context_index import ContextIndex
+from .minhash import minhash_signatures, agreement_credit
+from .rag_consistency import RagConsistencyEngine
+from .markers import MarkerLexicon
+from .metrics import DEFAULT_LEXICON, _per_prompt_contexts
+
+
+Context = List[str] | ContextIndex | None
+LevelMetric = Callable[["AnswerFeatures"], np.ndarray]
+
+
+@dataclass
+class AnswerFeatures:
+    """
+    Per-answer features shared by all levels (flat over all prompts).
+
+    Attributes:
+        answers: raw answers; prompt p owns answers[offsets[p]:offsets[p + 1]].
+        offsets: prompt offsets, shape (n_prompts + 1,).
+        prompt_of: prompt index of every answer.
+        contexts: context list / `ContextIndex` / None per prompt.
+        lowered: lowercased answers.
+        text_ids: id of the normalized (stripped, lowercased) text; equal
+            ids mean exact duplicates. `texts[text_ids[i]]` is the text.
+        token_ids: whitespace tokens of all lowered answers as ids into
+            `vocab`; answer i owns token_ids[token_offsets[i]:token_offsets[i + 1]].
+        char_len, n_tokens: float64 / int64 per answer.
+        cache: scratch space for plugins that derive further shared data
+            (e.g. MinHash signatures), keyed by plugin-chosen names.
+    """
+    answers: List[str]
+    offsets: np.ndarray
+    prompt_of: np.ndarray
+    contexts: List[Context]
+    lowered: List[str]
+    texts: List[str]
+    text_ids: np.ndarray
+    vocab: Dict[str, int]
+    token_ids: np.ndarray
+    token_offsets: np.ndarray
+    char_len: np.ndarray
+    n_tokens: np.ndarray
+    cache: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls,
+        answer_lists: Sequence[List[str]],
+        context_documents: Sequence[Context] | List[str] | ContextIndex | None = None,
+    ) -> "AnswerFeatures":
+        n_prompts = len(answer_lists)
+        lengths = np.fromiter((len(a) for a in answer_lists), dtype=np.int64, count=n_prompts)
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        answers = [a for group in answer_lists for a in group]
+        n = len(answers)
+
+        lowered = [a.lower() for a in answers]
+        text_of: Dict[str, int] = {}
+        text_ids = np.fromiter(
+            (text_of.setdefault(t.strip(), len(text_of)) for t in lowered), dtype=np.int64, count=n
+        )
+
+        vocab: Dict[str, int] = {}
+        token_lists = [t.split() for t in lowered]
+        n_tokens = np.fromiter((len(t) for t in token_lists), dtype=np.int64, count=n)
+        token_offsets = np.concatenate([[0], np.cumsum(n_tokens)]).astype(np.int64)
+        token_ids = np.fromiter(
+            (vocab.setdefault(tok, len(vocab)) for toks in token_lists for tok in toks),
+            dtype=np.int64,
+            count=int(token_offsets[-1]),
+        )
+
+        return cls(
+            answers=answers,
+            offsets=offsets,
+            prompt_of=np.repeat(np.arange(n_prompts), lengths),
+            contexts=_per_prompt_contexts(context_documents, n_prompts),
+            lowered=lowered,
+            texts=list(text_of),
+            text_ids=text_ids,
+            vocab=vocab,
+            token_ids=token_ids,
+            token_offsets=token_offsets,
+            char_len=np.fromiter((len(a) for a in answers), dtype=np.float64, count=n),
+            n_tokens=n_tokens,
+        )
+
+    @property
+    def n_prompts(self) -> int:
+        return int(self.offsets.size - 1)
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def per_answer_sum(self, token_values: np.ndarray) -> np.ndarray:
+        """Sum a per-token array (aligned with `token_ids`) over each answer's tokens."""
+        csum = np.concatenate([[0], np.cumsum(token_values, dtype=np.float64)])
+        return csum[self.token_offsets[1:]] - csum[self.token_offsets[:-1]]
+
+
+# ---- registry ----
+
+LEVEL_PLUGINS: Dict[str, Callable[..., LevelMetric]] = {}
+
+
+def register_level(name: str):
+    """Class decorator registering a level plugin under `name`."""
+    def decorator(factory: Callable[..., LevelMetric]) -> Callable[..., LevelMetric]:
+        LEVEL_PLUGINS[name] = factory
+        return factory
+    return decorator
+
+
+# ---- built-in levels ----
+
+@register_level("uncertainty")
+class UncertaintyFoam:
+    """
+    Level 0: length penalty plus hedging penalty from a `MarkerLexicon`
+    (see `foam_level0`); all answers are scanned in one vectorized pass.
+    """
+
+    def __init__(self, lexicon: MarkerLexicon | None = None):
+        self.lexicon = lexicon if lexicon is not None else DEFAULT_LEXICON
+
+    def __call__(self, features: AnswerFeatures) -> np.ndarray:
+        return features.char_len * 0.001 + self.lexicon.penalties(features.lowered)
+
+
+@register_level("cross_answer")
+class CrossAnswerFoam:
+    """
+    Level 1: disagreement with the other answers of the same prompt
+    (see `foam_level1`). Exact mode is fully vectorized over all prompts;
+    graded mode computes MinHash signatures once per distinct text and sums
+    similarities per signature bucket (`bands` is no longer used).
+    """
+
+    def __init__(self, graded: bool = False, num_perm: int = 64, bands: int = 16, shingle_size: int = 3):
+        self.graded = graded
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+
+    def __call__(self, features: AnswerFeatures) -> np.ndarray:
+        n = len(features)
+        if n == 0:
+            return np.zeros(0)
+        # (prompt, text) groups: answers with equal normalized text in one prompt
+        pair_key = features.prompt_of * len(features.texts) + features.text_ids
+        uniq, group, group_size = np.unique(pair_key, return_inverse=True, return_counts=True)
+        prompt_len = np.diff(features.offsets)
+        scores = (prompt_len[features.prompt_of] - group_size[group]).astype(np.float64)
+
+        if not self.graded:
+            return scores
+
+        key = f"minhash:{self.num_perm}:{self.shingle_size}"
+        sig_all = features.cache.get(key)
+        if sig_all is None:
+            sig_all = minhash_signatures(features.texts, num_perm=self.num_perm, shingle_size=self.shingle_size)
+            features.cache[key] = sig_all
+
+        group_prompt = uniq // len(features.texts)
+        group_text = uniq % len(features.texts)
+        bounds = np.searchsorted(group_prompt, np.arange(features.n_prompts + 1))
+        credit = np.zeros(uniq.size)
+        for p in range(features.n_prompts):
+            lo, hi = bounds[p], bounds[p + 1]
+            if hi - lo < 2:
+                continue
+            credit[lo:hi] = agreement_credit(sig_all[group_text[lo:hi]], group_size[lo:hi])
+        return scores - credit[group]
+
+
+@register_level("context")
+class ContextFoam:
+    """
+    Level 2: 1 / (1 + number of answer tokens found in the prompt's context)
+    (see `foam_level2`). A `ContextIndex` context uses BM25 grounding, one
+    query per distinct index. For raw lists, every distinct context is mapped
+    onto the shared vocabulary once and all answers are matched in one pass
+    over (context, token) keys.
+    """
+
+    def __call__(self, features: AnswerFeatures) -> np.ndarray:
+        n = len(features)
+        phi = np.zeros(n)
+        n_vocab = max(len(features.vocab), 1)
+
+        ctx_of_prompt = np.full(features.n_prompts, -1, dtype=np.int64)
+        ctx_keys: List[np.ndarray] = []
+        list_ids: Dict[int, int] = {}
+        index_prompts: Dict[int, List[int]] = {}
+        indexes: Dict[int, ContextIndex] = {}
+        for p, docs in enumerate(features.contexts):
+            if not docs:
+                continue
+            if isinstance(docs, ContextIndex):
+                indexes[id(docs)] = docs
+                index_prompts.setdefault(id(docs), []).append(p)
+                continue
+            c = list_ids.get(id(docs))
+            if c is None:
+                c = list_ids[id(docs)] = len(list_ids)
+                ids = [features.vocab[t] for t in set(" ".join(docs).lower().split()) if t in features.vocab]
+                ctx_keys.append(c * n_vocab + np.asarray(ids, dtype=np.int64))
+            ctx_of_prompt[p] = c
+
+        if list_ids:
+            ctx_of_answer = ctx_of_prompt[features.prompt_of]
+            ctx_of_token = np.repeat(ctx_of_answer, features.n_tokens)
+            token_keys = ctx_of_token * n_vocab + features.token_ids
+            hits = np.isin(token_keys, np.concatenate(ctx_keys)) & (ctx_of_token >= 0)
+            grounded = ctx_of_answer >= 0
+            phi[grounded] = 1.0 / (1.0 + features.per_answer_sum(hits)[grounded])
+
+        for key, prompts in index_prompts.items():
+            rows = np.concatenate([np.arange(features.offsets[p], features.offsets[p + 1]) for p in prompts])
+            phi[rows] = indexes[key].foam([features.answers[i] for i in rows])
+        return phi
+
+
+@register_level("rag")
+class RagFoam:
+    """Embedding RAG foam: 1 - top-k cosine consistency, all answers in one query."""
+
+    def __init__(self, engine: RagConsistencyEngine):
+        self.engine = engine
+
+    def __call__(self, features: AnswerFeatures) -> np.ndarray:
+        return np.asarray(self.engine.foam(features.answers), dtype=np.float64)
+
+
+# ---- pipeline ----
+
+class MetricPipeline:
+    """
+    Ordered mapping level index -> metric plugin.
+
+    `score_many` builds `AnswerFeatures` once, evaluates every level on it
+    and returns, per prompt, {"phi<l>": [...] for each level, "total": [...]}
+    with total = Σ_l lambda_levels[l] · phi_l (missing weights count as 0).
+    """
+
+    def __init__(self, levels: Dict[int, LevelMetric] | None = None):
+        self.levels: Dict[int, LevelMetric] = dict(sorted((levels or {}).items()))
+
+    @classmethod
+    def from_config(cls, config: Dict[int, str | Tuple[str, Dict[str, Any]]]) -> "MetricPipeline":
+        """Build from registered names: {0: "uncertainty", 1: ("cross_answer", {"graded": True})}."""
+        levels: Dict[int, LevelMetric] = {}
+        for level, spec in config.items():
+            name, kwargs = (spec, {}) if isinstance(spec, str) else spec
+            if name not in LEVEL_PLUGINS:
+                raise KeyError(f"unknown level plugin: {name!r}")
+            levels[level] = LEVEL_PLUGINS[name](**kwargs)
+        return cls(levels)
+
+    def with_level(self, level: int, metric: LevelMetric) -> "MetricPipeline":
+        """Copy of the pipeline with `metric` at `level` (added or replaced)."""
+        levels = dict(self.levels)
+        levels[level] = metric
+        return MetricPipeline(levels)
+
+    def evaluate(self, features: AnswerFeatures) -> Tuple[List[int], np.ndarray]:
+        """(level indices, phi matrix of shape (n_levels, n_answers))."""
+        ids = list(self.levels)
+        phi = np.zeros((len(ids), len(features)))
+        for row, level in enumerate(ids):
+            phi[row] = self.levels[level](features)
+        return ids, phi
+
+    def score_many(
+        self,
+        answer_lists: Sequence[List[str]],
+        context_documents: Sequence[Context] | List[str] | ContextIndex | None,
+        lambda_levels: Dict[int, float],
+    ) -> List[Dict[str, Any]]:
+        features = AnswerFeatures.build(answer_lists, context_documents)
+        ids, phi = self.evaluate(features)
+        lam = np.array([lambda_levels.get(l, 0.0) for l in ids])
+        total = lam @ phi
+
+        results: List[Dict[str, Any]] = []
+        for p in range(features.n_prompts):
+            sl = slice(features.offsets[p], features.offsets[p + 1])
+            scores: Dict[str, Any] = {f"phi{l}": phi[row, sl].tolist() for row, l in enumerate(ids)}
+            scores["total"] = total[sl].tolist()
+            results.append(scores)
+        return results
+
+    def score(
+        self,
+        answers: List[str],
+        context_documents: Context,
+        lambda_levels: Dict[int, float],
+    ) -> Dict[str, Any]:
+        return self.score_many([answers], [context_documents], lambda_levels)[0]
+
+
+def default_pipeline(
+    graded_level1: bool = False,
+    rag_engine: RagConsistencyEngine | None = None,
+) -> MetricPipeline:
+    """Levels 0-2 as in `aggregate_scores`, plus level 3 (RAG) if `rag_engine` is given."""
+    levels: Dict[int, LevelMetric] = {
+        0: UncertaintyFoam(),
+        1: CrossAnswerFoam(graded=graded_level1),
+        2: ContextFoam(),
+    }
+    if rag_engine is not None:
+        levels[3] = RagFoam(rag_engine)
+    return MetricPipeline(levels)
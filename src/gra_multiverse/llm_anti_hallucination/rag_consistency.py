@@ -1,13 +1,206 @@
 """
-Placeholders for more advanced RAG consistency checks (future work).
+Embedding-based RAG consistency checks.
+
+Document chunks are embedded once into a row-normalized matrix that is
+persisted as a memory-mapped `.npy` file with a JSON metadata sidecar.
+Answers are scored by their top-k cosine similarities to the chunks,
+computed with blocked matrix products so the matrix never has to be
+loaded into RAM as a whole.
 """
 
+import json
+import os
+import zlib
+from typing import Callable, Dict, Any, List, Sequence, Tuple
+
+import numpy as np
+
+
+Embedder = Callable[[List[str]], np.ndarray]
+
+
+def hashing_embed(texts: List[str], dim: int = 256) -> np.ndarray:
+    """
+    Default embedder: hashed bag of words, L2-normalized, float32 (n, dim).
+
+    Token buckets use crc32, so embeddings are stable across processes
+    (required for matrices persisted on disk).
+    """
+    mat = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for tok in text.lower().split():
+            mat[i, zlib.crc32(tok.encode("utf-8")) % dim] += 1.0
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True) + 1e-9
+    return mat
+
+
+def _normalize_rows(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-9)
+
+
+def _sidecar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".meta.json"
+
+
+class DocumentMatrix:
+    """
+    Row-normalized chunk embeddings, shape (n_chunks, dim), float32.
+
+    `matrix` is usually a read-only memmap returned by `load`.
+    """
+
+    def __init__(self, matrix: np.ndarray, meta: Dict[str, Any] | None = None):
+        self.matrix = matrix
+        self.meta = meta or {"n_chunks": int(matrix.shape[0]), "dim": int(matrix.shape[1])}
+
+    @property
+    def n_chunks(self) -> int:
+        return int(self.matrix.shape[0])
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1])
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[str], embedder: Embedder = hashing_embed) -> "DocumentMatrix":
+        """Embed `chunks` in memory (small corpora, tests)."""
+        return cls(_normalize_rows(embedder(list(chunks))))
+
+    @classmethod
+    def build(
+        cls,
+        chunks: Sequence[str],
+        path: str,
+        embedder: Embedder = hashing_embed,
+        batch_size: int = 4096,
+        embedder_name: str | None = None,
+    ) -> "DocumentMatrix":
+        """
+        Embed `chunks` batch by batch straight into `path` (.npy) and write
+        the metadata sidecar next to it. Only one batch is held in RAM.
+        """
+        n = len(chunks)
+        out = None
+        dim = 0
+        for start in range(0, max(n, 1), batch_size):
+            batch = _normalize_rows(embedder(list(chunks[start:start + batch_size])))
+            if out is None:
+                dim = int(batch.shape[1])
+                out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(n, dim))
+            out[start:start + batch.shape[0]] = batch
+        out.flush()
+        del out
+
+        meta = {
+            "n_chunks": n,
+            "dim": dim,
+            "dtype": "float32",
+            "normalized": True,
+            "embedder": embedder_name or getattr(embedder, "__name__", repr(embedder)),
+        }
+        with open(_sidecar_path(path), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "DocumentMatrix":
+        """Memory-map a matrix written by `build` (read-only)."""
+        matrix = np.load(path, mmap_mode="r")
+        meta: Dict[str, Any] | None = None
+        if os.path.exists(_sidecar_path(path)):
+            with open(_sidecar_path(path), encoding="utf-8") as f:
+                meta = json.load(f)
+        return cls(matrix, meta)
+
+
+class RagConsistencyEngine:
+    """
+    Scores answers against a `DocumentMatrix` by top-k cosine similarity.
+
+    The document matrix is processed in row blocks of `block_rows`; per block
+    one (n_answers x block_rows) product is computed and merged into the
+    running top-k, so memory stays O(n_answers * (block_rows + k)).
+    """
+
+    def __init__(
+        self,
+        documents: DocumentMatrix,
+        embedder: Embedder = hashing_embed,
+        top_k: int = 3,
+        block_rows: int = 65536,
+    ):
+        self.documents = documents
+        self.embedder = embedder
+        self.top_k = top_k
+        self.block_rows = block_rows
+
+    def embed(self, answers: List[str]) -> np.ndarray:
+        q = _normalize_rows(self.embedder(list(answers)))
+        if q.shape[1] != self.documents.dim:
+            raise ValueError(
+                f"embedder dimension {q.shape[1]} != document matrix dimension {self.documents.dim}"
+            )
+        return q
+
+    def search(self, answers: List[str], k: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k most similar chunks for every answer.
+
+        Returns:
+            (scores, chunk_ids), both shape (n_answers, k'), sorted by
+            decreasing score, with k' = min(k, n_chunks).
+        """
+        k = self.top_k if k is None else k
+        q = self.embed(answers)
+        n_q = q.shape[0]
+        n_docs = self.documents.n_chunks
+        k = min(k, n_docs)
+
+        best_s = np.full((n_q, 0), -np.inf, dtype=np.float32)
+        best_i = np.zeros((n_q, 0), dtype=np.int64)
+        for start in range(0, n_docs, self.block_rows):
+            block = np.asarray(self.documents.matrix[start:start + self.block_rows])
+            sims = q @ block.T
+            cand_s = np.concatenate([best_s, sims], axis=1)
+            cand_i = np.concatenate(
+                [best_i, np.broadcast_to(np.arange(start, start + block.shape[0]), sims.shape)],
+                axis=1,
+            )
+            if cand_s.shape[1] > k:
+                part = np.argpartition(-cand_s, k - 1, axis=1)[:, :k]
+                cand_s = np.take_along_axis(cand_s, part, axis=1)
+                cand_i = np.take_along_axis(cand_i, part, axis=1)
+            best_s, best_i = cand_s, cand_i
+
+        order = np.argsort(-best_s, axis=1, kind="stable")
+        return np.take_along_axis(best_s, order, axis=1), np.take_along_axis(best_i, order, axis=1)
+
+    def consistency(self, answers: List[str]) -> np.ndarray:
+        """Mean of the top-k cosine similarities per answer (0.0 for an empty corpus)."""
+        if self.documents.n_chunks == 0 or len(answers) == 0:
+            return np.zeros(len(answers))
+        scores, _ = self.search(answers)
+        return scores.mean(axis=1).astype(np.float64)
+
+    def foam(self, answers: List[str]) -> List[float]:
+        """RAG foam per answer: 1 - consistency."""
+        return (1.0 - self.consistency(answers)).tolist()
+
 
-def check_consistency_with_docs(answer: str, documents: list[str]) -> float:
+def check_consistency_with_docs(
+    answer: str,
+    documents: list[str],
+    embedder: Embedder = hashing_embed,
+    top_k: int = 1,
+) -> float:
     """
-    Placeholder for a more advanced RAG consistency metric.
+    Embedding-based RAG consistency of a single answer with `documents`.
 
-    For now, this can be kept as a stub or simple wrapper over foam_level2-like logic.
+    Convenience wrapper that embeds the documents in memory; for reused or
+    large corpora build a `DocumentMatrix` once and use `RagConsistencyEngine`.
     """
-    # TODO: implement advanced RAG consistency (e.g. using embeddings, NER, etc.)
-    return 0.0
+    if not documents:
+        return 0.0
+    engine = RagConsistencyEngine(DocumentMatrix.from_chunks(documents, embedder), embedder, top_k=top_k)
+    return float(engine.consistency([answer])[0])
@@ -27,18 +27,27 @@ import numpy as np
 
 from .core import Level, Goal, MultiverseState, MultiverseFunctional
 from .optimizer import MultiverseOptimizer
+from .cache import ResultCache, fingerprint_items, embedder_key
+from .selection import cosine_similarities, top_k as select_top_k
 
 
 # --- Простая текстовая "эмбеддер-функция" по умолчанию --- #
 
+# Fixed alphabet for toy example
+_ALPHABET = "abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+# Lookup table: unicode code point -> alphabet position (-1 = not in alphabet)
+_CHAR_TABLE = np.full(max(ord(ch) for ch in _ALPHABET) + 1, -1, dtype=np.int64)
+_CHAR_TABLE[[ord(ch) for ch in _ALPHABET]] = np.arange(len(_ALPHABET))
+
+
 def default_embed(text: str) -> np.ndarray:
     """
     EN: Very simple bag-of-chars embedding (placeholder).
     RU: Очень простое bag-of-chars представление (заглушка).
     Замените на нормальные эмбеддинги (sentence-transformers и т.п.).
     """
-    # Fixed alphabet for toy example
-    alphabet = "abcdefghijklmnopqrstuvwxyzабвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+    alphabet = _ALPHABET
     vec = np.zeros(len(alphabet), dtype=np.float32)
     text = text.lower()
     for ch in text:
@@ -50,6 +59,34 @@ def default_embed(text: str) -> np.ndarray:
     return (vec / norm).astype(np.complex128)
 
 
+def default_embed_many(texts: List[str]) -> np.ndarray:
+    """
+    EN: Vectorized batch version of `default_embed`: returns an (n, d) matrix,
+        one row per text, computed without a Python loop over characters.
+    RU: Векторизованная пакетная версия `default_embed`: матрица (n, d),
+        по строке на текст, без Python-цикла по символам.
+    """
+    n = len(texts)
+    d = len(_ALPHABET)
+    if n == 0:
+        return np.zeros((0, d), dtype=np.complex128)
+
+    lowered = [t.lower() for t in texts]
+    lengths = np.fromiter((len(t) for t in lowered), dtype=np.int64, count=n)
+    codes = np.frombuffer("".join(lowered).encode("utf-32-le"), dtype=np.uint32)
+    rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+
+    cols = np.full(codes.shape, -1, dtype=np.int64)
+    known = codes < _CHAR_TABLE.size
+    cols[known] = _CHAR_TABLE[codes[known]]
+    hit = cols >= 0
+
+    counts = np.bincount(rows[hit] * d + cols[hit], minlength=n * d)
+    mat = counts.reshape(n, d).astype(np.float32)
+    norm = np.linalg.norm(mat, axis=1, keepdims=True) + 1e-9
+    return (mat / norm).astype(np.complex128)
+
+
 # --- Вспомогательная функция для длины мультииндекса --- #
 
 def default_index_dim_fn(a: Tuple[int, ...]) -> int:
@@ -71,6 +108,8 @@ def optimize_answers(
     alpha: float = 0.8,
     step_size: float = 1e-2,
     max_steps: int = 50,
+    cache: ResultCache | None = None,
+    top_k: int = 1,
 ) -> Dict[str, str]:
     """
     EN:
@@ -87,16 +126,44 @@ def optimize_answers(
         embed_fn: function text -> np.ndarray embedding.
         lambda0, alpha: hyperparameters Λ_l.
         step_size, max_steps: параметры оптимизатора.
+        cache: optional `ResultCache`; repeated answer sets (in any order)
+            with the same hyperparameters are answered from the cache,
+            near hits warm-start from the cached meta-node.
+        top_k: number of ranked candidates; with top_k > 1 the result also
+            contains "candidates" (best first) as fallbacks.
 
     Returns / Возвращает:
         dict c ключами:
             "chosen"  – выбранный ответ,
             "index"   – его индекс,
-            "debug"   – текстовое описание / служебная информация.
+            "debug"   – текстовое описание / служебная информация,
+            "candidates" – только при top_k > 1: список
+                {"index", "answer", "similarity"} по убыванию сходства.
     """
     if len(answers) == 0:
         return {"chosen": "", "index": -1, "debug": "no answers provided"}
 
+    # 0. Result cache: exact hits (possibly permuted) need no optimization at all
+    hit = None
+    if cache is not None:
+        digests = fingerprint_items(answers)
+        cache_params = _cache_params(meta_goal, embed_fn, lambda0, alpha, step_size, max_steps)
+        hit = cache.lookup(digests, cache_params)
+        if hit is not None and hit.exact:
+            result = {
+                "chosen": answers[hit.index],
+                "index": hit.index,
+                "debug": (
+                    f"best_cosine_similarity={hit.entry.similarity:.4f}, "
+                    f"n_answers={len(answers)}, cache=hit"
+                ),
+            }
+            if top_k > 1:
+                cached = np.stack([hit.entry.embeds[d] for d in digests], axis=0)
+                ranked, sims = select_top_k(cosine_similarities(cached, hit.entry.meta), top_k)
+                result["candidates"] = _candidates(answers, ranked, sims)
+            return result
+
     # 1. Define levels and goals
     level0 = Level(index=0, name="local_answers")
     level1 = Level(index=1, name="meta_consistency")
@@ -111,14 +178,27 @@ def optimize_answers(
     # Use indices (i, 0) for individual answers at level 0,
     # and a single meta-node (0, 1) for level 1.
     states: Dict[Tuple[int, ...], np.ndarray] = {}
+    active_keys = None
 
-    embeds = [embed_fn(a) for a in answers]
-    for i, e in enumerate(embeds):
-        states[(i, 0)] = e.copy()
+    if hit is not None:
+        # Near hit: reuse cached embeddings and embed only the new answers.
+        # The meta-node is warm-started from the cached one; cached level-0
+        # nodes are held fixed, so only the meta-node is optimized.
+        added = set(hit.added)
+        embeds = [
+            embed_fn(a) if i in added else hit.entry.embeds[digests[i]]
+            for i, a in enumerate(answers)
+        ]
+        states[(0, 1)] = hit.warm_meta(digests, embeds).astype(np.complex128)
+        active_keys = [(0, 1)]
+    else:
+        embeds = [embed_fn(a) for a in answers]
+        for i, e in enumerate(embeds):
+            states[(i, 0)] = e.copy()
 
-    # Meta node: average of all embeddings as initial "consensus"
-    meta_vec = np.mean(np.stack(embeds, axis=0), axis=0)
-    states[(0, 1)] = meta_vec.astype(np.complex128)
+        # Meta node: average of all embeddings as initial "consensus"
+        meta_vec = np.mean(np.stack(embeds, axis=0), axis=0)
+        states[(0, 1)] = meta_vec.astype(np.complex128)
 
     psi = MultiverseState(states)
 
@@ -142,24 +222,189 @@ def optimize_answers(
         max_steps=max_steps,
         tol=1e-6,
         callback=None,
+        active_keys=active_keys,
     )
 
     # 5. Choose answer closest to optimized meta-node
     meta_opt = psi_opt[(0, 1)]
-    best_idx = 0
-    best_sim = -1.0
-
-    for i, e in enumerate(embeds):
-        # cosine similarity
-        num = float(np.real(np.vdot(e, meta_opt)))
-        denom = (np.linalg.norm(e) * np.linalg.norm(meta_opt) + 1e-9)
-        sim = num / denom
-        if sim > best_sim:
-            best_sim = sim
-            best_idx = i
-
-    return {
+    embed_matrix = np.stack(embeds, axis=0)
+    ranked, sims = select_top_k(cosine_similarities(embed_matrix, meta_opt), top_k)
+    best_idx = int(ranked[0])
+    best_sim = float(sims[0])
+
+    if cache is not None:
+        cache.store(digests, cache_params, best_idx, best_sim, meta_opt, embed_matrix)
+
+    result = {
         "chosen": answers[best_idx],
         "index": best_idx,
         "debug": f"best_cosine_similarity={best_sim:.4f}, n_answers={len(answers)}",
     }
+    if top_k > 1:
+        result["candidates"] = _candidates(answers, ranked, sims)
+    return result
+
+
+def _cache_params(
+    meta_goal: str,
+    embed_fn: Callable[[str], np.ndarray],
+    lambda0: float,
+    alpha: float,
+    step_size: float,
+    max_steps: int,
+) -> Tuple:
+    """Cache parameters shared by `optimize_answers` and `optimize_answers_many`."""
+    return (
+        "llm_module.optimize_answers", meta_goal, embedder_key(embed_fn),
+        lambda0, alpha, step_size, max_steps,
+    )
+
+
+def _candidates(answers: List[str], ranked: np.ndarray, sims: np.ndarray) -> List[Dict[str, object]]:
+    """Ranked fallbacks: [{"index", "answer", "similarity"}, ...], best first."""
+    return [
+        {"index": int(i), "answer": answers[int(i)], "similarity": float(s)}
+        for i, s in zip(ranked, sims)
+    ]
+
+
+# --- Пакетная версия для многих промптов --- #
+
+def optimize_answers_many(
+    answer_lists: List[List[str]],
+    meta_goal: str = "max_consistency",
+    embed_fn: Callable[[str], np.ndarray] = default_embed,
+    embed_many_fn: Callable[[List[str]], np.ndarray] | None = None,
+    lambda0: float = 1.0,
+    alpha: float = 0.8,
+    step_size: float = 1e-2,
+    max_steps: int = 50,
+    cache: ResultCache | None = None,
+) -> List[Dict[str, str]]:
+    """
+    EN:
+    Batch version of `optimize_answers` for many prompts at once.
+    All answers of all prompts are embedded in one batch, the (ragged)
+    per-prompt groups are addressed through an offsets array, and the
+    meta-node and cosine selection are computed in vectorized form.
+
+    In the two-level layout used by `optimize_answers` the single meta-node
+    (0, 1) is a stationary point of J_multiverse: Φ^(1) over one node is zero
+    and J_loc acts only on level 0. The optimized meta-node therefore equals
+    the initial mean embedding, so the optimizer loop is not needed here and
+    the result matches `optimize_answers` for any lambda0/alpha/step_size.
+
+    RU:
+    Пакетная версия `optimize_answers` для многих промптов сразу.
+    Все ответы всех промптов эмбеддятся одним батчем, группы разной длины
+    адресуются через массив смещений, мета-узел и косинусный выбор
+    считаются векторно. Мета-узел (0, 1) — стационарная точка J_multiverse,
+    поэтому результат совпадает с `optimize_answers`.
+
+    Parameters / Параметры:
+        answer_lists: list of answer lists, one list per prompt.
+        meta_goal: currently unused string, placeholder for future goal logic.
+        embed_fn: function text -> np.ndarray embedding (used per text
+            if `embed_many_fn` is not given).
+        embed_many_fn: optional batch embedder list[str] -> (n, d) array.
+            Defaults to `default_embed_many` when `embed_fn` is `default_embed`.
+        lambda0, alpha, step_size, max_steps: accepted for drop-in
+            compatibility with `optimize_answers`. The meta-node is
+            stationary, so the result does not depend on them.
+        cache: optional `ResultCache`, shared with `optimize_answers`. Exact
+            hits are answered from it; the remaining prompts are embedded
+            and solved in one batch and stored.
+
+    Returns / Возвращает:
+        list of dicts (one per prompt) with the same keys as `optimize_answers`.
+    """
+    results: List[Dict[str, str] | None] = [None] * len(answer_lists)
+    todo = list(range(len(answer_lists)))
+    if cache is not None:
+        cache_params = _cache_params(meta_goal, embed_fn, lambda0, alpha, step_size, max_steps)
+        digests = [fingerprint_items(answers) for answers in answer_lists]
+        todo = []
+        for p, answers in enumerate(answer_lists):
+            hit = cache.lookup(digests[p], cache_params) if answers else None
+            if hit is not None and hit.exact:
+                results[p] = {
+                    "chosen": answers[hit.index],
+                    "index": hit.index,
+                    "debug": (
+                        f"best_cosine_similarity={hit.entry.similarity:.4f}, "
+                        f"n_answers={len(answers)}, cache=hit"
+                    ),
+                }
+            else:
+                todo.append(p)
+
+    misses = [answer_lists[p] for p in todo]
+    lengths = np.fromiter((len(a) for a in misses), dtype=np.int64, count=len(misses))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    flat = [a for answers in misses for a in answers]
+
+    if embed_many_fn is None and embed_fn is default_embed:
+        embed_many_fn = default_embed_many
+
+    if not flat:
+        embeds = np.zeros((0, 0), dtype=np.complex128)
+    elif embed_many_fn is not None:
+        embeds = np.asarray(embed_many_fn(flat), dtype=np.complex128)
+    else:
+        embeds = np.stack([np.asarray(embed_fn(a), dtype=np.complex128) for a in flat], axis=0)
+
+    best_idx, best_sim = _select_many(embeds, offsets)
+
+    for q, p in enumerate(todo):
+        answers = answer_lists[p]
+        if len(answers) == 0:
+            results[p] = {"chosen": "", "index": -1, "debug": "no answers provided"}
+            continue
+        idx = int(best_idx[q])
+        results[p] = {
+            "chosen": answers[idx],
+            "index": idx,
+            "debug": f"best_cosine_similarity={best_sim[q]:.4f}, n_answers={len(answers)}",
+        }
+        if cache is not None:
+            rows = embeds[offsets[q]:offsets[q + 1]]
+            cache.store(digests[p], cache_params, idx, float(best_sim[q]), rows.mean(axis=0), rows)
+    return results
+
+
+def _select_many(embeds: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    EN: For each segment [offsets[p], offsets[p+1]) of `embeds` pick the row
+        closest (cosine) to the segment mean. Returns (local index, similarity)
+        per segment; empty segments get (-1, -1.0).
+    RU: Для каждого сегмента выбирает строку, ближайшую к среднему сегмента.
+    """
+    n_prompts = offsets.size - 1
+    lengths = np.diff(offsets)
+    best_idx = np.full(n_prompts, -1, dtype=np.int64)
+    best_sim = np.full(n_prompts, -1.0)
+
+    nonempty = np.flatnonzero(lengths > 0)
+    if nonempty.size == 0:
+        return best_idx, best_sim
+
+    starts = offsets[nonempty]
+    seg_len = lengths[nonempty]
+    # segment id (among non-empty prompts) for every answer row
+    seg = np.repeat(np.arange(nonempty.size), seg_len)
+
+    meta = np.add.reduceat(embeds, starts, axis=0) / seg_len[:, None]
+
+    num = np.real(np.sum(np.conj(embeds) * meta[seg], axis=1))
+    denom = np.linalg.norm(embeds, axis=1) * np.linalg.norm(meta, axis=1)[seg] + 1e-9
+    sims = num / denom
+
+    seg_max = np.maximum.reduceat(sims, starts)
+    # first row attaining the maximum within each segment
+    hits = np.flatnonzero(sims == seg_max[seg])
+    _, first = np.unique(seg[hits], return_index=True)
+    rows = hits[first]
+
+    best_idx[nonempty] = rows - starts
+    best_sim[nonempty] = sims[rows]
+    return best_idx, best_sim
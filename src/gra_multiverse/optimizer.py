@@ -1,10 +1,13 @@
 # src/gra_multiverse/optimizer.py
 
-from typing import Callable, Dict, Tuple
+from typing import Callable, Dict, Iterable, Tuple, TYPE_CHECKING
 import numpy as np
 
 from .core import MultiverseState, MultiverseFunctional, Level
 
+if TYPE_CHECKING:
+    from .trace import TraceRecorder
+
 
 class MultiverseOptimizer:
     """
@@ -22,14 +25,20 @@ class MultiverseOptimizer:
         self.step_size = step_size
         self.fd_eps = fd_eps
 
-    def _finite_diff_grad(self, state: MultiverseState) -> Dict[Tuple[int, ...], np.ndarray]:
+    def _finite_diff_grad(
+        self,
+        state: MultiverseState,
+        active_keys: Iterable[Tuple[int, ...]] | None = None,
+    ) -> Dict[Tuple[int, ...], np.ndarray]:
         """
         Naive finite-difference gradient:
         ∂J/∂ψ ≈ (J(ψ+εe_i) - J(ψ-εe_i)) / (2ε).
+        If `active_keys` is given, only those components are differentiated
+        (all other components are held fixed).
         """
         grads: Dict[Tuple[int, ...], np.ndarray] = {}
-        base_val = self.functional.J_multiverse(state)
-        for k in state.keys():
+        keys = list(state.keys()) if active_keys is None else list(active_keys)
+        for k in keys:
             psi = state[k]
             grad = np.zeros_like(psi, dtype=np.complex128)
             for i in range(psi.size):
@@ -47,13 +56,24 @@ class MultiverseOptimizer:
             grads[k] = grad
         return grads
 
-    def step(self, state: MultiverseState) -> MultiverseState:
-        """One gradient-descent step: Ψ <- Ψ - η ∇J."""
-        grads = self._finite_diff_grad(state)
+    def step(
+        self,
+        state: MultiverseState,
+        active_keys: Iterable[Tuple[int, ...]] | None = None,
+    ) -> MultiverseState:
+        """One gradient-descent step: Ψ <- Ψ - η ∇J (over `active_keys` if given)."""
+        return self._step(state, active_keys)[0]
+
+    def _step(
+        self,
+        state: MultiverseState,
+        active_keys: Iterable[Tuple[int, ...]] | None = None,
+    ) -> Tuple[MultiverseState, Dict[Tuple[int, ...], np.ndarray]]:
+        grads = self._finite_diff_grad(state, active_keys)
         new_state = state.copy()
         for k, g in grads.items():
             new_state[k] = state[k] - self.step_size * g
-        return new_state
+        return new_state, grads
 
     def run_to_convergence(
         self,
@@ -61,14 +81,44 @@ class MultiverseOptimizer:
         max_steps: int = 100,
         tol: float = 1e-6,
         callback: Callable[[int, float], None] | None = None,
+        active_keys: Iterable[Tuple[int, ...]] | None = None,
+        trace: "TraceRecorder | None" = None,
     ) -> MultiverseState:
         """
         Run gradient descent until ||ΔΨ|| < tol or max_steps reached.
+        If `active_keys` is given, only those components are optimized.
+        If `trace` is given, per-step J, level terms, gradient norm and step
+        size are recorded into it (and snapshots are spilled as configured).
         """
+        if active_keys is not None:
+            active_keys = list(active_keys)
+        with self.functional.parallel_section():  # BLAS limit entered once per run
+            return self._run(state, max_steps, tol, callback, active_keys, trace)
+
+    def _run(
+        self,
+        state: MultiverseState,
+        max_steps: int,
+        tol: float,
+        callback: Callable[[int, float], None] | None,
+        active_keys: Iterable[Tuple[int, ...]] | None,
+        trace: "TraceRecorder | None",
+    ) -> MultiverseState:
         prev_val = self.functional.J_multiverse(state)
         for t in range(max_steps):
-            new_state = self.step(state)
-            val = self.functional.J_multiverse(new_state)
+            if trace is None:
+                new_state = self.step(state, active_keys)
+                val = self.functional.J_multiverse(new_state)
+            else:
+                new_state, grads = self._step(state, active_keys)
+                terms = self.functional.level_terms(new_state)
+                val = 0.0
+                for term in terms:  # same reduction order as J_multiverse
+                    val += term
+                grad_norm = float(np.sqrt(sum(np.vdot(g, g).real for g in grads.values())))
+                step = trace.record(val, terms, grad_norm, self.step_size)
+                if trace.wants_snapshot(step):
+                    trace.snapshot(step, new_state, self.functional.index_dim_fn)
             if callback is not None:
                 callback(t, val)
             # simple stopping criterion
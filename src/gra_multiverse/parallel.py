@@ -0,0 +1,121 @@
+# src/gra_multiverse/parallel.py
+
+"""
+EN:
+Thread-pool helpers shared by `MultiverseFunctional` and `TiledFoamEvaluator`.
+
+Work items are submitted in a fixed order and their results are consumed
+in that same order, so reductions over them are bitwise reproducible for
+any worker count. The heavy lifting happens in NumPy/BLAS calls that
+release the GIL.
+
+To avoid oversubscription (n_workers x BLAS threads > cores), BLAS threads
+are limited while a parallel section runs. This uses the optional
+`threadpoolctl` package (`pip install gra-multiverse-optimizer[parallel]`)
+and is a no-op without it.
+
+RU:
+Вспомогательные функции пула потоков.
+
+Задачи отправляются и собираются в фиксированном порядке, поэтому
+редукции воспроизводимы побитово при любом числе потоков. Число потоков
+BLAS ограничивается через необязательный пакет `threadpoolctl`.
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, TypeVar
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # optional dependency
+    threadpool_limits = None
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def default_blas_threads(n_workers: int) -> int:
+    """BLAS threads per worker so that n_workers x threads ≈ cpu count."""
+    return max(1, (os.cpu_count() or 1) // max(1, n_workers))
+
+
+def blas_limit(n_threads: int | None):
+    """Context manager limiting BLAS threads (no-op without threadpoolctl or for None)."""
+    if n_threads is None or threadpool_limits is None:
+        return nullcontext()
+    return threadpool_limits(limits=n_threads, user_api="blas")
+
+
+def ordered_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    executor: ThreadPoolExecutor | None,
+    window: int | None = None,
+) -> Iterator[R]:
+    """
+    Yield fn(item) for every item, in input order.
+
+    With an executor at most `window` items are in flight at once, which
+    bounds memory for large streams of tiles. Without an executor items are
+    evaluated inline.
+    """
+    if executor is None:
+        for item in items:
+            yield fn(item)
+        return
+
+    window = window if window is not None else 2 * executor._max_workers
+    pending: Deque[Future] = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+
+class WorkerPool:
+    """
+    Lazily created thread pool owned by a long-lived object.
+
+    `n_workers <= 1` means serial execution (no threads are created).
+    """
+
+    def __init__(self, n_workers: int = 1, blas_threads: int | None = None):
+        self.n_workers = n_workers
+        self.blas_threads = blas_threads
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor | None:
+        if self.n_workers <= 1:
+            return None
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.n_workers, thread_name_prefix="gra")
+        return self._executor
+
+    @contextmanager
+    def section(self):
+        """Parallel section: limits BLAS threads while workers run."""
+        if self.n_workers <= 1:
+            yield
+            return
+        limit = self.blas_threads if self.blas_threads is not None else default_blas_threads(self.n_workers)
+        with blas_limit(limit):
+            yield
+
+    def map(self, fn: Callable[[T], R], items: Iterable[T], window: int | None = None) -> Iterator[R]:
+        return ordered_map(fn, items, self.executor, window)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
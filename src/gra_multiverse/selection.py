@@ -0,0 +1,210 @@
+# src/gra_multiverse/selection.py
+
+"""
+EN:
+Selection of the candidates closest to the meta-node.
+
+All selection helpers use the cosine convention of `optimize_answers`:
+
+    sim(e, m) = Re <e|m> / (||e|| · ||m|| + 1e-9)
+
+- `cosine_similarities`: all similarities in one matrix-vector product;
+- `top_k`: the k best candidates, ranked, ties broken by lower index
+  (so `top_k(s, 1)` equals `argmax`);
+- `ExactIndex` / `LSHIndex`: reusable indexes over an embedding matrix for
+  repeated queries (e.g. a long-lived VPN selector). `LSHIndex` hashes rows
+  with random hyperplanes (sign random projections) and re-ranks the
+  colliding candidates exactly, so the scan is sub-linear for large pools.
+
+RU:
+Выбор кандидатов, ближайших к мета-узлу: все косинусы одним
+матрично-векторным произведением, ранжированный top-k и индексы для
+повторных запросов (точный и приближённый LSH на случайных проекциях).
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+
+def cosine_similarities(
+    embeds: np.ndarray,
+    query: np.ndarray,
+    norms: np.ndarray | None = None,
+) -> np.ndarray:
+    """Cosine similarity of every row of `embeds` (n, d) to `query` (d,)."""
+    if norms is None:
+        norms = np.linalg.norm(embeds, axis=1)
+    num = np.real(np.conj(embeds) @ query)
+    return num / (norms * np.linalg.norm(query) + 1e-9)
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and scores of the k largest entries, in decreasing order;
+    equal scores are ranked by lower index. O(n + k log k).
+    """
+    scores = np.asarray(scores)
+    n = scores.size
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=scores.dtype)
+    if k == 1:
+        i = int(np.argmax(scores))
+        return np.array([i], dtype=np.int64), scores[[i]]
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - above.size]
+        cand = np.concatenate([above, ties])
+    else:
+        cand = np.arange(n)
+    order = cand[np.lexsort((cand, -scores[cand]))]
+    return order.astype(np.int64), scores[order]
+
+
+class ExactIndex:
+    """
+    EN:
+    Exact search over an embedding matrix (one matrix-vector product).
+
+    The matrix is held by reference; after changing rows in place call
+    `update(rows)` so that derived data (norms) is refreshed.
+
+    RU:
+    Точный поиск по матрице эмбеддингов.
+    """
+
+    def __init__(self, embeds: np.ndarray):
+        self.embeds = embeds
+        self.norms = np.linalg.norm(embeds, axis=1)
+
+    def __len__(self) -> int:
+        return int(self.embeds.shape[0])
+
+    def update(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        self.norms[rows] = np.linalg.norm(self.embeds[rows], axis=1)
+
+    def similarities(self, query: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        if rows is None:
+            return cosine_similarities(self.embeds, query, self.norms)
+        return cosine_similarities(self.embeds[rows], query, self.norms[rows])
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """(indices, similarities) of the k best rows, ranked."""
+        return top_k(self.similarities(query), k)
+
+
+class LSHIndex(ExactIndex):
+    """
+    EN:
+    Approximate search with random-hyperplane LSH.
+
+    A complex embedding e is viewed as the real vector [Re e, Im e]; the
+    cosine convention above is the ordinary cosine in that space. Each of
+    `n_tables` tables hashes a row to the signs of `n_bits` random
+    projections. A query collects the rows sharing its bucket in any table
+    (and, with `multiprobe`, buckets at Hamming distance 1), then re-ranks
+    them exactly. If fewer than k rows collide, it falls back to an exact
+    scan, so results are always complete. It also falls back when the
+    buckets hold more than `max_candidates` (a fraction of the rows) entries:
+    on poorly spread embeddings (e.g. non-negative features, which all fall
+    on the same side of most hyperplanes) the index then costs about as
+    much as the scan instead of more.
+
+    Buckets are sorted code arrays built once. `update(rows)` re-hashes only
+    the changed rows and keeps them in a small overlay that queries check
+    directly; stale entries in the sorted arrays only add candidates, which
+    the exact re-ranking discards. The arrays are re-sorted once the overlay
+    exceeds `rebuild_fraction` of the rows, so an update costs O(rows) plus
+    an amortized O(log n).
+
+    RU:
+    Приближённый поиск через LSH на случайных гиперплоскостях с точным
+    переранжированием кандидатов.
+    """
+
+    def __init__(
+        self,
+        embeds: np.ndarray,
+        n_bits: int = 12,
+        n_tables: int = 8,
+        multiprobe: bool = True,
+        seed: int = 0,
+        rebuild_fraction: float = 1 / 64,
+        max_candidates: float = 0.25,
+    ):
+        if not 1 <= n_bits <= 62:
+            raise ValueError("n_bits must be in [1, 62]")
+        super().__init__(embeds)
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        self.multiprobe = multiprobe
+        self.rebuild_fraction = rebuild_fraction
+        self.max_candidates = max_candidates
+        dim = 2 * embeds.shape[1]
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, n_bits, dim))
+        self._weights = np.int64(1) << np.arange(n_bits, dtype=np.int64)
+        self.codes = self._hash(embeds)
+        self._sorted: Tuple[np.ndarray, np.ndarray] | None = None
+        self._dirty = np.zeros(0, dtype=np.int64)  # rows re-hashed since the last sort
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        """Bucket codes, shape (n_tables, n)."""
+        real = np.concatenate([np.real(vectors), np.imag(vectors)], axis=-1)
+        proj = real @ self.planes.reshape(-1, real.shape[1]).T  # (n, tables * bits)
+        bits = (proj > 0).reshape(len(real), self.n_tables, self.n_bits)
+        codes = np.zeros((self.n_tables, len(real)), dtype=np.int64)
+        for b in range(self.n_bits):  # integer matmul has no BLAS path; shifts are much faster
+            codes |= bits[:, :, b].T.astype(np.int64) << b
+        return codes
+
+    def _buckets(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._sorted is None:
+            order = np.argsort(self.codes, axis=1, kind="stable")
+            self._sorted = (order, np.take_along_axis(self.codes, order, axis=1))
+            self._dirty = np.zeros(0, dtype=np.int64)
+        return self._sorted
+
+    def update(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        super().update(rows)
+        if rows.size:
+            self.codes[:, rows] = self._hash(self.embeds[rows])
+            if self._sorted is not None:
+                self._dirty = np.union1d(self._dirty, rows)
+                if self._dirty.size > self.rebuild_fraction * len(self):
+                    self._sorted = None  # re-sorted lazily on the next query
+
+    def candidates(self, query: np.ndarray, limit: int | None = None) -> np.ndarray | None:
+        """
+        Row ids colliding with `query` in at least one table (sorted, unique),
+        or None if the buckets hold more than `limit` entries.
+        """
+        order, sorted_codes = self._buckets()
+        q = self._hash(query[None, :])[:, 0]
+        probes = q[:, None]
+        if self.multiprobe:
+            probes = np.concatenate([probes, q[:, None] ^ self._weights[None, :]], axis=1)
+        lo = np.stack([np.searchsorted(sorted_codes[t], probes[t], side="left") for t in range(self.n_tables)])
+        hi = np.stack([np.searchsorted(sorted_codes[t], probes[t], side="right") for t in range(self.n_tables)])
+        if limit is not None and int((hi - lo).sum()) > limit:
+            return None
+        parts = [order[t, a:b] for t in range(self.n_tables) for a, b in zip(lo[t], hi[t]) if b > a]
+        if self._dirty.size:
+            # updated rows are matched by their current codes
+            dirty_codes = self.codes[:, self._dirty]  # (tables, m)
+            hit = (dirty_codes[:, :, None] == probes[:, None, :]).any(axis=(0, 2))
+            parts.append(self._dirty[hit])
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        cand = self.candidates(query, limit=int(self.max_candidates * len(self)))
+        if cand is None or cand.size < min(k, len(self)):
+            return super().search(query, k)
+        idx, sims = top_k(self.similarities(query, cand), k)
+        return cand[idx], sims
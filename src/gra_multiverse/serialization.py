@@ -0,0 +1,200 @@
+# src/gra_multiverse/serialization.py
+
+"""
+EN:
+Compact binary format for MultiverseState with zero-copy loading.
+
+Layout (offsets in bytes from the start of the file):
+
+    magic       8 bytes   b"GRAMVS01"
+    header_len  uint64    little-endian length of the JSON header
+    header      JSON      levels, dtypes, shapes and block offsets
+    key_len     int32[n_keys]              length of every multi-index
+    keys        int64[n_keys, key_width]   multi-indices, padded with -1
+    blocks      one contiguous (count, *shape) block per level
+
+Keys are grouped by level: row r of a level block belongs to the key at
+position level["first_key"] + r. Every section starts on a 64-byte
+boundary, so `load_state` can memory-map the file and expose the vectors
+as read-only views, and load only the levels it needs.
+
+RU:
+Компактный бинарный формат для MultiverseState с загрузкой без копирования.
+
+Ключи сгруппированы по уровням, векторы каждого уровня лежат одним
+непрерывным блоком, выровненным на 64 байта. `load_state` отображает файл
+в память (mmap) и возвращает векторы как представления только для чтения;
+можно загрузить лишь часть уровней.
+"""
+
+import json
+import struct
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .core import MultiverseState
+
+
+MAGIC = b"GRAMVS01"
+ALIGN = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_state(
+    state: MultiverseState,
+    path: str,
+    index_dim_fn: Callable[[Tuple[int, ...]], int] | None = None,
+) -> None:
+    """
+    Write `state` to `path`.
+
+    Vectors are grouped by level (`index_dim_fn`, default: len(a) - 1 as in
+    MultiverseFunctional); all vectors of one level must share a shape.
+    """
+    index_dim_fn = index_dim_fn if index_dim_fn is not None else (lambda a: len(a) - 1)
+
+    by_level: Dict[int, List[Tuple[int, ...]]] = {}
+    for k in state.keys():
+        by_level.setdefault(int(index_dim_fn(k)), []).append(k)
+    level_ids = sorted(by_level)
+
+    ordered = [k for l in level_ids for k in by_level[l]]
+    n_keys = len(ordered)
+    key_width = max((len(k) for k in ordered), default=0)
+    key_len = np.array([len(k) for k in ordered], dtype="<i4")
+    keys = np.full((n_keys, key_width), -1, dtype="<i8")
+    for i, k in enumerate(ordered):
+        keys[i, :len(k)] = k
+
+    levels_meta = []
+    blocks = []
+    first_key = 0
+    for l in level_ids:
+        vecs = [np.asarray(state[k]) for k in by_level[l]]
+        shape = vecs[0].shape
+        if any(v.shape != shape for v in vecs):
+            raise ValueError(f"level {l}: all vectors must have the same shape")
+        dtype = np.result_type(*vecs).newbyteorder("<")
+        block = np.empty((len(vecs),) + shape, dtype=dtype)
+        for r, v in enumerate(vecs):
+            block[r] = v
+        blocks.append(block)
+        levels_meta.append({
+            "level": l,
+            "count": len(vecs),
+            "shape": list(shape),
+            "dtype": dtype.str,
+            "first_key": first_key,
+        })
+        first_key += len(vecs)
+
+    # Offsets depend on the header length, which depends on the offsets:
+    # reserve room for the offsets first, then fill them in.
+    header = {"version": 1, "n_keys": n_keys, "key_width": key_width, "levels": levels_meta}
+    for meta in levels_meta:
+        meta["offset"] = 0
+    header["key_len_offset"] = header["keys_offset"] = 0
+    while True:
+        raw = json.dumps(header).encode("utf-8")
+        pos = _align(len(MAGIC) + 8 + len(raw))
+        changed = header["key_len_offset"] != pos
+        header["key_len_offset"] = pos
+        pos = _align(pos + key_len.nbytes)
+        changed |= header["keys_offset"] != pos
+        header["keys_offset"] = pos
+        pos = _align(pos + keys.nbytes)
+        for meta, block in zip(levels_meta, blocks):
+            changed |= meta["offset"] != pos
+            meta["offset"] = pos
+            pos = _align(pos + block.nbytes)
+        if not changed:
+            break
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for offset, arr in [(header["key_len_offset"], key_len), (header["keys_offset"], keys)] + [
+            (meta["offset"], block) for meta, block in zip(levels_meta, blocks)
+        ]:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(np.ascontiguousarray(arr).tobytes())
+
+
+def read_header(path: str) -> Dict:
+    """Read and return the JSON header of a state file."""
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a MultiverseState file")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(header_len).decode("utf-8"))
+
+
+def _open(path: str, mmap: bool) -> np.ndarray:
+    if mmap:
+        return np.memmap(path, dtype=np.uint8, mode="r")
+    buf = np.fromfile(path, dtype=np.uint8)
+    buf.flags.writeable = False
+    return buf
+
+
+def _keys(buf: np.ndarray, header: Dict, meta: Dict) -> List[Tuple[int, ...]]:
+    """Decode only the keys of one level (rows first_key .. first_key + count)."""
+    n, w = header["n_keys"], header["key_width"]
+    key_len = np.frombuffer(buf, dtype="<i4", count=n, offset=header["key_len_offset"])
+    keys = np.frombuffer(buf, dtype="<i8", count=n * w, offset=header["keys_offset"]).reshape(n, w)
+    rows = slice(meta["first_key"], meta["first_key"] + meta["count"])
+    return [tuple(row[:m].tolist()) for row, m in zip(keys[rows], key_len[rows].tolist())]
+
+
+def _block(buf: np.ndarray, meta: Dict) -> np.ndarray:
+    shape = tuple(meta["shape"])
+    size = int(np.prod(shape)) if shape else 1
+    block = np.frombuffer(buf, dtype=np.dtype(meta["dtype"]), count=meta["count"] * size, offset=meta["offset"])
+    return block.reshape((meta["count"],) + shape)
+
+
+def load_state(
+    path: str,
+    levels: Sequence[int] | None = None,
+    mmap: bool = True,
+) -> MultiverseState:
+    """
+    Load a state written by `save_state`.
+
+    With `mmap=True` the file is memory-mapped and every vector is a
+    read-only view into it (no copy). `levels` restricts loading to the
+    given levels. Use `MultiverseState.copy()` to obtain writable arrays.
+    """
+    header = read_header(path)
+    buf = _open(path, mmap)
+    states: Dict[Tuple[int, ...], np.ndarray] = {}
+    for meta in header["levels"]:
+        if levels is not None and meta["level"] not in levels:
+            continue
+        block = _block(buf, meta)
+        for r, key in enumerate(_keys(buf, header, meta)):
+            states[key] = block[r]
+    return MultiverseState(states)
+
+
+def load_level_block(
+    path: str,
+    level: int,
+    mmap: bool = True,
+) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """
+    Return (keys, block) for one level, where block[r] is the vector of
+    keys[r]. The block is a read-only (count, *shape) view of the file.
+    """
+    header = read_header(path)
+    for meta in header["levels"]:
+        if meta["level"] == level:
+            buf = _open(path, mmap)
+            return _keys(buf, header, meta), _block(buf, meta)
+    raise KeyError(f"level {level} not found in {path}")
@@ -0,0 +1,330 @@
+# src/gra_multiverse/server.py
+
+"""
+EN:
+Long-lived local scoring server (`gra-multiverse serve`).
+
+Short-lived processes pay the import cost and rebuild embedders, context
+indexes and caches on every call. `ScoringServer` keeps them warm in one
+process and answers JSON-lines requests over stdin/stdout or a Unix socket:
+
+    {"id": 1, "method": "optimize_answers", "params": {"answers": [...]}}
+    {"id": 1, "result": {"chosen": "...", "index": 0, "debug": "..."}}
+
+Methods: `optimize_answers` (llm_module), `optimize_answers_grounded`
+(llm_anti_hallucination; `use_context_index` / `use_rag` select the loaded
+index / RAG engine), `select_best_vpn_config`, `stats`, `ping`. Requests
+may carry a `timeout` in seconds. Concurrent requests are coalesced into
+batches (see `aio.RequestCoalescer`); responses may arrive out of order and
+are matched by `id`.
+
+RU:
+Долгоживущий локальный сервер оценки (`gra-multiverse serve`).
+
+Держит эмбеддеры, индексы контекста и кэши «тёплыми» и отвечает на
+запросы JSON-lines через stdin/stdout или Unix-сокет; одновременные
+запросы склеиваются в батчи, `stats` возвращает глубину очереди и
+статистику задержек.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, List
+
+import numpy as np
+
+from .aio import AsyncAnswerOptimizer, RequestCoalescer
+from .cache import ResultCache
+from .vpn_module import select_best_vpn_config
+from .llm_anti_hallucination.context_index import ContextIndex
+from .llm_anti_hallucination.rag_consistency import RagConsistencyEngine
+
+
+def _to_json(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=_to_json)
+
+
+class _LineQueue:
+    """Bounded line buffer filled by a thread, read like a `StreamReader`."""
+
+    def __init__(self, maxsize: int = 64):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def put(self, raw: bytes) -> None:
+        await self._queue.put(raw)
+
+    async def readline(self) -> bytes:
+        """Next line, or b"" at EOF."""
+        return await self._queue.get()
+
+
+class ScoringServer:
+    """
+    EN:
+    Request dispatcher with warm state and latency / queue statistics.
+
+    Args:
+        context_index: `ContextIndex` used when a grounded request sets
+            `use_context_index`.
+        rag_engine: `RagConsistencyEngine` used when a request sets `use_rag`.
+        cache: `ResultCache` shared by all `optimize_answers` and
+            `select_best_vpn_config` calls.
+        batch_window, max_batch: coalescing parameters.
+        max_workers: threads for CPU work.
+        max_in_flight: requests running at once over all streams; readers
+            stop consuming input while this many are pending.
+        latency_window: number of recent requests kept for latency percentiles.
+
+    RU:
+    Диспетчер запросов с «тёплым» состоянием и статистикой.
+    """
+
+    def __init__(
+        self,
+        context_index: ContextIndex | None = None,
+        rag_engine: RagConsistencyEngine | None = None,
+        cache: ResultCache | None = None,
+        batch_window: float = 0.002,
+        max_batch: int = 256,
+        max_workers: int | None = None,
+        latency_window: int = 1024,
+        max_in_flight: int = 1024,
+    ):
+        self.context_index = context_index
+        self.rag_engine = rag_engine
+        self.cache = cache if cache is not None else ResultCache()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gra-serve")
+        self.answers = AsyncAnswerOptimizer(
+            executor=self.executor, batch_window=batch_window, max_batch=max_batch, cache=self.cache
+        )
+        self.vpn = RequestCoalescer(self._run_vpn, batch_window, max_batch)
+
+        self.started = time.monotonic()
+        self.in_flight = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.counts: Counter = Counter()
+        self.errors = 0
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.methods: Dict[str, Callable[[Dict[str, Any], float | None], Any]] = {
+            "optimize_answers": self._optimize_answers,
+            "optimize_answers_grounded": self._optimize_answers_grounded,
+            "select_best_vpn_config": self._select_best_vpn_config,
+            "stats": self._stats,
+            "ping": self._ping,
+        }
+
+    # ---- methods ----
+
+    async def _optimize_answers(self, params: Dict[str, Any], timeout: float | None) -> Any:
+        return await self.answers.optimize_answers(params["answers"], timeout=timeout)
+
+    async def _optimize_answers_grounded(self, params: Dict[str, Any], timeout: float | None) -> Any:
+        context = params.get("context_documents")
+        if params.get("use_context_index"):
+            if self.context_index is None:
+                raise ValueError("server was started without a context index")
+            context = self.context_index
+        rag_engine = None
+        if params.get("use_rag"):
+            if self.rag_engine is None:
+                raise ValueError("server was started without a document matrix")
+            rag_engine = self.rag_engine
+        lambda_levels = params.get("lambda_levels")
+        if lambda_levels is not None:
+            # JSON object keys are strings
+            lambda_levels = {int(k): float(v) for k, v in lambda_levels.items()}
+        return await self.answers.optimize_answers_grounded(
+            params["answers"],
+            context_documents=context,
+            lambda_levels=lambda_levels,
+            return_all_scores=params.get("return_all_scores", True),
+            graded_level1=params.get("graded_level1", False),
+            rag_engine=rag_engine,
+            timeout=timeout,
+        )
+
+    async def _run_vpn(self, key: Hashable, payloads: List[Any]) -> List[Any]:
+        """
+        Coalesced VPN requests with the same options. Unlike the answer
+        batches this is not vectorized: every fleet needs its own meta-node
+        optimization, so the batch is a sequential loop over the payloads in
+        one executor job (saving only the per-request executor hop), and
+        repeated fleets are served by the shared `ResultCache`. A failing
+        fleet yields its exception in place of a result, so only that
+        request fails.
+        """
+        options = dict(key[1])
+
+        def one(configs: Any) -> Any:
+            try:
+                return select_best_vpn_config(configs, cache=self.cache, **options)
+            except Exception as exc:
+                return exc
+
+        def run() -> List[Any]:
+            return [one(configs) for configs in payloads]
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    async def _select_best_vpn_config(self, params: Dict[str, Any], timeout: float | None) -> Any:
+        options = tuple(sorted(
+            (k, params[k]) for k in ("meta_goal", "lambda0", "alpha", "step_size", "max_steps", "top_k") if k in params
+        ))
+        fut = self.vpn.submit(("vpn", options), params["configs"])
+        return await (asyncio.wait_for(fut, timeout) if timeout is not None else fut)
+
+    async def _stats(self, params: Dict[str, Any], timeout: float | None) -> Any:
+        return self.stats()
+
+    async def _ping(self, params: Dict[str, Any], timeout: float | None) -> Any:
+        return "pong"
+
+    # ---- dispatch ----
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, request / batch counters and latency percentiles (ms)."""
+        lat = np.asarray(self.latencies) * 1000.0
+        coalescers = (self.answers.coalescer, self.vpn)
+        stats: Dict[str, Any] = {
+            "uptime_s": time.monotonic() - self.started,
+            "queue_depth": self.in_flight,
+            "requests": dict(self.counts),
+            "errors": self.errors,
+            "batches": sum(c.n_batches for c in coalescers),
+            "batched_requests": sum(c.n_requests for c in coalescers),
+            "cache": {"hits": self.cache.hits, "near_hits": self.cache.near_hits, "misses": self.cache.misses},
+        }
+        if lat.size:
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            stats["latency_ms"] = {"p50": p50, "p95": p95, "p99": p99, "max": lat.max(), "n": int(lat.size)}
+        return stats
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one request dict and build its response dict."""
+        req_id = request.get("id")
+        method = request.get("method")
+        start = time.perf_counter()
+        self.in_flight += 1
+        try:
+            if method not in self.methods:
+                raise ValueError(f"unknown method: {method!r}")
+            self.counts[method] += 1
+            result = await self.methods[method](request.get("params") or {}, request.get("timeout"))
+            return {"id": req_id, "result": result}
+        except Exception as exc:
+            self.errors += 1
+            return {"id": req_id, "error": {"type": type(exc).__name__, "message": str(exc)}}
+        finally:
+            self.in_flight -= 1
+            self.latencies.append(time.perf_counter() - start)
+
+    async def handle_line(self, line: str) -> str:
+        """Decode one JSON line, run it and encode the response."""
+        try:
+            request = json.loads(line)
+        except ValueError as exc:
+            self.errors += 1
+            return dumps({"id": None, "error": {"type": "JSONDecodeError", "message": str(exc)}})
+        if not isinstance(request, dict):
+            self.errors += 1
+            return dumps({"id": None, "error": {"type": "ValueError", "message": "request must be an object"}})
+        return dumps(await self.handle(request))
+
+    async def serve_stream(
+        self,
+        reader: asyncio.StreamReader,
+        write: Callable[[str], Any],
+    ) -> None:
+        """
+        Read JSON lines from `reader` until EOF; every request runs as its own
+        task, so slow requests do not block later ones. At most
+        `max_in_flight` requests run at once: beyond that the next line is
+        not read until one finishes, which pushes back on the client.
+        `write` receives one encoded response line (may be a coroutine
+        function).
+        """
+        tasks = set()
+
+        async def run(line: str) -> None:
+            out = await self.handle_line(line)
+            res = write(out + "\n")
+            if asyncio.iscoroutine(res):
+                await res
+
+        while True:
+            raw = await reader.readline()
+            if not raw:
+                break
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            await self._slots.acquire()
+            task = asyncio.ensure_future(run(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: self._slots.release())
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def serve_stdio(self) -> None:
+        """
+        Serve JSON lines on stdin / stdout until stdin is closed. Pipes and
+        terminals are read by the event loop; a regular file on stdin
+        (`gra-multiverse serve < requests.jsonl`) is read by a thread through
+        a bounded queue, so a large file is not loaded into memory at once.
+        """
+        loop = asyncio.get_running_loop()
+        reader: Any = asyncio.StreamReader()
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except (ValueError, OSError):
+            # connect_read_pipe only accepts pipes, sockets and character devices
+            reader = _LineQueue()
+
+            def pump() -> None:
+                for raw in sys.stdin.buffer:
+                    asyncio.run_coroutine_threadsafe(reader.put(raw), loop).result()
+                asyncio.run_coroutine_threadsafe(reader.put(b""), loop).result()
+
+            threading.Thread(target=pump, name="gra-stdin", daemon=True).start()
+
+        def write(line: str) -> None:
+            sys.stdout.write(line)
+            sys.stdout.flush()
+
+        await self.serve_stream(reader, write)
+
+    async def start_unix(self, path: str) -> asyncio.AbstractServer:
+        """Start serving on a Unix socket; one JSON-lines stream per connection."""
+
+        async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            async def write(line: str) -> None:
+                writer.write(line.encode("utf-8"))
+                await writer.drain()
+
+            try:
+                await self.serve_stream(reader, write)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        return await asyncio.start_unix_server(on_connect, path=path)
+
+    async def aclose(self) -> None:
+        await self.vpn.aclose()
+        await self.answers.aclose()
+        self.executor.shutdown(wait=False)
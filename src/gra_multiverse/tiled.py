@@ -0,0 +1,206 @@
+# src/gra_multiverse/tiled.py
+
+"""
+EN:
+Out-of-core tiled evaluation of the foam Φ^(l) and its gradient.
+
+`FoamFunctional.phi_level` needs all vectors of a level in RAM and loops
+over pairs in Python. `TiledFoamEvaluator` reads the level as a 2D row
+source (usually a read-only memmap from `serialization.load_level_block`)
+in row tiles and evaluates the Gram matrix tile pair by tile pair. Only
+tiles with I <= J are computed; off-diagonal tiles are counted twice by
+symmetry. The tile size is derived from a memory budget, and the next tile
+is read in a background thread while the current one is being processed.
+
+Φ matches `phi_level` with the identity projector:
+
+    Φ = Σ_{a≠b} (Re <ψ_a|ψ_b>)²
+
+and the gradient is ∂Φ/∂Re ψ + i ∂Φ/∂Im ψ = 4 Σ_{b≠a} Re<ψ_a|ψ_b> ψ_b.
+
+RU:
+Вычисление пены Φ^(l) и её градиента по тайлам без загрузки уровня в память.
+
+Векторы уровня читаются блоками строк из memmap-источника, матрица Грама
+считается попарно по тайлам (только I <= J, симметрия), размер тайла
+подбирается под бюджет памяти, следующий тайл подгружается в фоновом потоке.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from .parallel import WorkerPool
+from .serialization import load_level_block
+
+
+def _as_rows(source: np.ndarray) -> np.ndarray:
+    """View a (count, *shape) source as (count, size) without copying."""
+    return source.reshape(source.shape[0], -1) if source.ndim != 2 else source
+
+
+class TiledFoamEvaluator:
+    """
+    EN:
+    Tiled Φ^(l) evaluator for levels that do not fit in RAM.
+
+    Args:
+        tile_rows: rows per tile; if None it is derived from `memory_budget`.
+        memory_budget: approximate working-set size in bytes (tiles being
+            processed, the prefetched tile, the Gram tile and the gradient
+            accumulator), shared by all workers.
+        prefetch: read the next tile in a background thread (serial mode).
+        n_workers: evaluate tile pairs concurrently in a thread pool. Partial
+            results are reduced in schedule order, so Φ and the gradient are
+            bitwise identical for every worker count.
+        blas_threads: BLAS threads during parallel evaluation
+            (see `parallel.WorkerPool`).
+
+    RU:
+    Вычислитель Φ^(l) по тайлам для уровней, не помещающихся в память.
+    При n_workers > 1 пары тайлов считаются параллельно, а редукция идёт
+    в фиксированном порядке (результат не зависит от числа потоков).
+    """
+
+    def __init__(
+        self,
+        tile_rows: int | None = None,
+        memory_budget: int = 256 * 2**20,
+        prefetch: bool = True,
+        n_workers: int = 1,
+        blas_threads: int | None = None,
+    ):
+        self.tile_rows = tile_rows
+        self.memory_budget = memory_budget
+        self.prefetch = prefetch
+        self.pool = WorkerPool(n_workers, blas_threads)
+
+    def rows_per_tile(self, n: int, d: int) -> int:
+        """
+        Tile size for an (n, d) level: the largest b with
+        (4·b·d) complex128 vectors + one (b, b) float64 Gram tile per
+        in-flight tile pair <= budget.
+        """
+        if self.tile_rows is not None:
+            return max(1, min(self.tile_rows, n))
+        in_flight = 1 if self.pool.n_workers <= 1 else 2 * self.pool.n_workers
+        budget = self.memory_budget / in_flight
+        # 64·b·d + 8·b² <= budget
+        b = (-64.0 * d + np.sqrt((64.0 * d) ** 2 + 32.0 * budget)) / 16.0
+        return max(1, min(int(b), n))
+
+    @staticmethod
+    def schedule(n: int, b: int) -> List[Tuple[int, int]]:
+        """Upper-triangular tile pairs (I, J), I <= J, in row-major order."""
+        n_tiles = (n + b - 1) // b
+        return [(i, j) for i in range(n_tiles) for j in range(i, n_tiles)]
+
+    def _tiles(self, rows: np.ndarray, b: int, pairs: Sequence[Tuple[int, int]]):
+        """Yield (I, J, V_I, V_J) with V_J read ahead in a background thread."""
+        n = rows.shape[0]
+
+        def load(t: int) -> np.ndarray:
+            return np.array(rows[t * b:min((t + 1) * b, n)], dtype=np.complex128)
+
+        pool = ThreadPoolExecutor(max_workers=1) if self.prefetch and len(pairs) > 1 else None
+        try:
+            pending: Future | None = None
+            v_i = None
+            for p, (i, j) in enumerate(pairs):
+                v_j = pending.result() if pending is not None else load(j)
+                pending = None
+                if pool is not None and p + 1 < len(pairs):
+                    pending = pool.submit(load, pairs[p + 1][1])
+                if i == j:
+                    v_i = v_j
+                yield i, j, v_i, v_j
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    @staticmethod
+    def _pair(i: int, j: int, v_i: np.ndarray, v_j: np.ndarray, with_grad: bool):
+        """Φ contribution of tile pair (I, J) and its gradient blocks for I and J."""
+        gram = np.real(np.conj(v_i) @ v_j.T)
+        if i == j:
+            np.fill_diagonal(gram, 0.0)
+            phi = float(np.sum(gram * gram))
+        else:
+            phi = 2.0 * float(np.sum(gram * gram))
+        if not with_grad:
+            return phi, None, None
+        g_i = 4.0 * (gram @ v_j)
+        g_j = None if i == j else 4.0 * (gram.T @ v_i)
+        return phi, g_i, g_j
+
+    def _pairs(self, rows: np.ndarray, b: int, with_grad: bool):
+        """Yield (I, J, phi, g_I, g_J) in schedule order."""
+        pairs = self.schedule(rows.shape[0], b)
+        if self.pool.n_workers <= 1:
+            for i, j, v_i, v_j in self._tiles(rows, b, pairs):
+                yield (i, j) + self._pair(i, j, v_i, v_j, with_grad)
+            return
+
+        n = rows.shape[0]
+
+        def task(pair: Tuple[int, int]):
+            i, j = pair
+            v_i = np.array(rows[i * b:min((i + 1) * b, n)], dtype=np.complex128)
+            v_j = v_i if i == j else np.array(rows[j * b:min((j + 1) * b, n)], dtype=np.complex128)
+            return (i, j) + self._pair(i, j, v_i, v_j, with_grad)
+
+        with self.pool.section():
+            yield from self.pool.map(task, pairs)
+
+    def _run(self, source: np.ndarray, grad_out: np.ndarray | None, with_grad: bool):
+        rows = _as_rows(source)
+        n, d = rows.shape
+        if n == 0:
+            return 0.0, (np.zeros((0, d), dtype=np.complex128) if with_grad else None)
+        b = self.rows_per_tile(n, d)
+        last = (n - 1) // b
+
+        grad = None
+        if with_grad:
+            grad = grad_out if grad_out is not None else np.zeros((n, d), dtype=np.complex128)
+            if grad_out is not None:
+                grad[...] = 0.0
+
+        phi = 0.0
+        acc_i = None
+        for i, j, part, g_i, g_j in self._pairs(rows, b, with_grad):
+            phi += part
+            if not with_grad:
+                continue
+            acc_i = g_i if i == j else acc_i + g_i
+            if g_j is not None:
+                grad[j * b:j * b + g_j.shape[0]] += g_j
+            if j == last:
+                # last tile of row I: the accumulator for I is complete
+                grad[i * b:i * b + acc_i.shape[0]] += acc_i
+        return phi, grad
+
+    def phi(self, source: np.ndarray) -> float:
+        """Φ over the rows of `source` (shape (count, *shape))."""
+        return self._run(source, None, with_grad=False)[0]
+
+    def phi_and_grad(
+        self,
+        source: np.ndarray,
+        grad_out: np.ndarray | None = None,
+    ) -> Tuple[float, np.ndarray]:
+        """
+        Φ and its gradient, shape (count, size). Pass a writable memmap as
+        `grad_out` to keep the gradient out of core as well.
+        """
+        return self._run(source, grad_out, with_grad=True)
+
+    def phi_file(self, path: str, level: int) -> float:
+        """Φ^(level) of a state file written by `serialization.save_state`."""
+        _, block = load_level_block(path, level)
+        return self.phi(block)
+
+    def close(self) -> None:
+        """Shut down the worker pool (if any)."""
+        self.pool.close()
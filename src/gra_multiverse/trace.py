@@ -0,0 +1,210 @@
+# src/gra_multiverse/trace.py
+
+"""
+EN:
+Optimizer run traces with bounded memory.
+
+`TraceRecorder` is passed to `MultiverseOptimizer.run_to_convergence(trace=...)`
+and keeps, per step, J_multiverse, the Λ_l-weighted term of every level,
+the gradient norm, the step size η and the update norm ||ΔΨ||. Records go
+into preallocated arrays used as a ring buffer of `capacity` steps, so a
+long run costs O(capacity) memory and a few array writes per step; the
+level terms are the ones J_multiverse is computed from anyway.
+
+Optionally every `snapshot_every` steps the full state is spilled to
+`snapshot_dir` in the binary format of `serialization.save_state`
+(keeping at most `max_snapshots` files). `replay` restarts an
+optimization from any snapshot, e.g. with different `step_size`, `alpha`
+or `lambda0`.
+
+RU:
+Трассировка запусков оптимизатора с ограниченной памятью.
+
+`TraceRecorder` хранит по шагам J, вклады уровней, норму градиента, шаг η
+и норму обновления в кольцевом буфере фиксированного размера; по желанию
+периодически сбрасывает полное состояние на диск (`save_state`).
+`replay` перезапускает оптимизацию с любого снимка.
+"""
+
+import os
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .core import MultiverseState
+from .optimizer import MultiverseOptimizer
+from .serialization import load_state, save_state
+
+
+class TraceRecorder:
+    """
+    EN:
+    Fixed-size ring buffer of per-step optimizer metrics.
+
+    `arrays()` returns the retained steps in chronological order:
+    "step", "J", "levels" (steps x n_levels), "grad_norm", "step_size",
+    "update_norm". Steps are numbered globally across runs (`next_step`),
+    so one recorder can follow successive warm-started runs; `replay`
+    continues numbering from the snapshot's step.
+
+    RU:
+    Кольцевой буфер метрик оптимизатора фиксированного размера.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        snapshot_every: int | None = None,
+        snapshot_dir: str | None = None,
+        max_snapshots: int | None = None,
+    ):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if snapshot_every is not None and snapshot_dir is None:
+            raise ValueError("snapshot_every requires snapshot_dir")
+        self.capacity = capacity
+        self.snapshot_every = snapshot_every
+        self.snapshot_dir = snapshot_dir
+        self.max_snapshots = max_snapshots
+        self.next_step = 0
+        self.snapshots: List[Tuple[int, str]] = []  # (step, path), oldest first
+
+        self._step = np.zeros(capacity, dtype=np.int64)
+        self._J = np.zeros(capacity, dtype=np.float64)
+        self._grad_norm = np.zeros(capacity, dtype=np.float64)
+        self._step_size = np.zeros(capacity, dtype=np.float64)
+        self._update_norm = np.zeros(capacity, dtype=np.float64)
+        self._levels: np.ndarray | None = None  # (capacity, n_levels), sized on first record
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def n_recorded(self) -> int:
+        """Number of steps recorded so far, including overwritten ones."""
+        return self._count
+
+    # ---- recording (called from the optimizer loop) ----
+
+    def record(
+        self,
+        J: float,
+        level_terms: List[float],
+        grad_norm: float,
+        step_size: float,
+    ) -> int:
+        """
+        Store one step at the ring position (overwriting the oldest step when
+        full) and return its global step number.
+        """
+        if self._levels is None:
+            self._levels = np.zeros((self.capacity, len(level_terms)), dtype=np.float64)
+        step = self.next_step
+        self.next_step += 1
+        pos = self._count % self.capacity
+        self._step[pos] = step
+        self._J[pos] = J
+        self._levels[pos] = level_terms
+        self._grad_norm[pos] = grad_norm
+        self._step_size[pos] = step_size
+        self._update_norm[pos] = step_size * grad_norm
+        self._count += 1
+        return step
+
+    def wants_snapshot(self, step: int) -> bool:
+        return self.snapshot_every is not None and (step + 1) % self.snapshot_every == 0
+
+    def snapshot(
+        self,
+        step: int,
+        state: MultiverseState,
+        index_dim_fn: Callable[[Tuple[int, ...]], int] | None = None,
+    ) -> str:
+        """Spill the state after `step` to disk; returns the file path."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        path = os.path.join(self.snapshot_dir, f"step_{step:08d}.gramvs")
+        save_state(state, path, index_dim_fn)
+        self.snapshots.append((step, path))
+        if self.max_snapshots is not None:
+            while len(self.snapshots) > self.max_snapshots:
+                _, old = self.snapshots.pop(0)
+                if os.path.exists(old):
+                    os.remove(old)
+        return path
+
+    # ---- export ----
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Retained steps in chronological order (copies)."""
+        n = len(self)
+        order = (np.arange(n) + self._count - n) % self.capacity
+        levels = self._levels[order] if self._levels is not None else np.zeros((0, 0))
+        return {
+            "step": self._step[order],
+            "J": self._J[order],
+            "levels": levels,
+            "grad_norm": self._grad_norm[order],
+            "step_size": self._step_size[order],
+            "update_norm": self._update_norm[order],
+        }
+
+    def save(self, path: str) -> None:
+        """Export the trace (and the snapshot table) to a .npz file."""
+        data = self.arrays()
+        data["snapshot_steps"] = np.array([s for s, _ in self.snapshots], dtype=np.int64)
+        data["snapshot_paths"] = np.array([p for _, p in self.snapshots], dtype=str)
+        np.savez(path, **data)
+
+    @staticmethod
+    def load(path: str) -> Dict[str, np.ndarray]:
+        """Read a trace written by `save`."""
+        with np.load(path) as f:
+            return {k: f[k] for k in f.files}
+
+    def snapshot_at(self, step: int) -> Tuple[int, str]:
+        """The latest retained snapshot taken at or before `step`."""
+        best = None
+        for s, p in self.snapshots:
+            if s <= step:
+                best = (s, p)
+        if best is None:
+            raise KeyError(f"no snapshot at or before step {step}")
+        return best
+
+
+def replay(
+    optimizer: MultiverseOptimizer,
+    snapshot: str,
+    max_steps: int = 100,
+    tol: float = 1e-6,
+    callback: Callable[[int, float], None] | None = None,
+    active_keys: Iterable[Tuple[int, ...]] | None = None,
+    trace: TraceRecorder | None = None,
+    start_step: int | None = None,
+) -> MultiverseState:
+    """
+    EN:
+    Restart optimization from a snapshot file written by `TraceRecorder`.
+
+    `optimizer` may use other hyperparameters than the recorded run. If
+    `trace` is given, its steps continue from `start_step` (default: parsed
+    from the snapshot file name, + 1).
+
+    RU:
+    Перезапуск оптимизации со снимка состояния.
+    """
+    state = load_state(snapshot, mmap=False).copy()
+    if trace is not None:
+        if start_step is None:
+            name = os.path.splitext(os.path.basename(snapshot))[0]
+            start_step = int(name.rsplit("_", 1)[-1]) + 1 if name.startswith("step_") else 0
+        trace.next_step = start_step
+    return optimizer.run_to_convergence(
+        state=state,
+        max_steps=max_steps,
+        tol=tol,
+        callback=callback,
+        active_keys=active_keys,
+        trace=trace,
+    )
@@ -0,0 +1,209 @@
+# src/gra_multiverse/vpn_io.py
+
+"""
+EN:
+Streaming loaders for large VPN fleets (JSONL / CSV).
+
+Configs are read in fixed-size chunks straight into structured arrays with
+`VPN_FEATURE_DTYPE`, so a fleet of 100k+ configs never exists as a list of
+Python dicts. The chunks feed `default_vpn_embed_batch` and
+`select_best_vpn_config` directly.
+
+RU:
+Потоковые загрузчики больших наборов VPN-конфигов (JSONL / CSV).
+Конфиги читаются чанками сразу в структурированные массивы
+`VPN_FEATURE_DTYPE`, без списка Python-словарей на весь парк.
+"""
+
+import csv
+import json
+from array import array
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from .vpn_module import (
+    PROTOCOL_MAP,
+    VPN_FEATURE_DTYPE,
+    VPN_FEATURE_DEFAULTS,
+    select_best_vpn_config,
+)
+
+
+_TRUE_STRINGS = {"1", "true", "yes", "y", "on"}
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt is not None:
+        return fmt.lower()
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _iter_lines(f: Any, fmt: str) -> Iterator[Tuple[int, str]]:
+    """
+    (byte offset, text) of every record of a binary file object. A CSV
+    record spans several lines while a quoted field is open.
+    """
+    offset = f.tell()
+    pending, start = b"", offset
+    for raw in f:
+        if not pending:
+            start = offset
+        offset += len(raw)
+        pending += raw
+        if fmt == "csv" and pending.count(b'"') % 2:
+            continue  # quoted field continues on the next line
+        yield start, pending.decode("utf-8")
+        pending = b""
+    if pending:
+        yield start, pending.decode("utf-8")
+
+
+def _iter_records(path: str, fmt: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(byte offset, record) of every record in the file, in one pass."""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"unsupported config format: {fmt!r}")
+    with open(path, "rb") as f:
+        if fmt == "csv":
+            header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        for offset, text in _iter_lines(f, fmt):
+            if fmt == "jsonl":
+                text = text.strip()
+                if text:
+                    yield offset, json.loads(text)
+            else:
+                row = next(csv.reader([text]), [])
+                if row:
+                    yield offset, dict(zip(header, row))
+
+
+def _record_at_offset(path: str, fmt: str, offset: int) -> Dict[str, Any]:
+    """Parse the single record starting at byte `offset`."""
+    with open(path, "rb") as f:
+        if fmt == "csv":
+            header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        f.seek(offset)
+        _, text = next(_iter_lines(f, fmt))
+    if fmt == "jsonl":
+        return json.loads(text)
+    return dict(zip(header, next(csv.reader([text]))))
+
+
+def _parse_bools(values: np.ndarray) -> np.ndarray:
+    """Vectorized `bool` for an object column: strings via `_TRUE_STRINGS`."""
+    is_str = np.frompyfunc(lambda v: isinstance(v, str), 1, 1)(values).astype(bool)
+    out = np.zeros(values.size, dtype=bool)
+    if is_str.any():
+        text = np.char.lower(np.char.strip(values[is_str].astype(str)))
+        out[is_str] = np.isin(text, list(_TRUE_STRINGS))
+    if not is_str.all():
+        out[~is_str] = values[~is_str].astype(bool)
+    return out
+
+
+def _fill_chunk(records: List[Dict[str, Any]]) -> np.ndarray:
+    """Convert a list of records to a `VPN_FEATURE_DTYPE` array, one column at a time."""
+    chunk = np.zeros(len(records), dtype=VPN_FEATURE_DTYPE)
+    for name in VPN_FEATURE_DTYPE.names:
+        values = np.empty(len(records), dtype=object)
+        values[:] = [rec.get(name) for rec in records]
+        missing = np.equal(values, None) | np.equal(values, "")
+        values[missing] = VPN_FEATURE_DEFAULTS[name]
+        if name == "protocol":
+            names, inverse = np.unique(np.char.lower(np.char.strip(values.astype(str))), return_inverse=True)
+            codes = np.array([PROTOCOL_MAP.get(str(p), 0) for p in names], dtype=chunk.dtype[name])
+            chunk[name] = codes[inverse]
+        elif VPN_FEATURE_DTYPE[name] == np.bool_:
+            chunk[name] = _parse_bools(values)
+        else:
+            chunk[name] = values.astype(np.float64)
+    return chunk
+
+
+def _config_chunks(
+    path: str,
+    chunk_size: int,
+    fmt: str | None,
+    offsets: "array | None" = None,
+) -> Iterator[np.ndarray]:
+    fmt = _detect_format(path, fmt)
+    records = _iter_records(path, fmt)
+    while True:
+        batch = list(islice(records, chunk_size))
+        if not batch:
+            return
+        if offsets is not None:
+            offsets.extend(offset for offset, _ in batch)
+        yield _fill_chunk([rec for _, rec in batch])
+
+
+def iter_config_chunks(
+    path: str,
+    chunk_size: int = 65536,
+    fmt: str | None = None,
+) -> Iterator[np.ndarray]:
+    """
+    EN:
+    Yield structured arrays (`VPN_FEATURE_DTYPE`) of at most `chunk_size`
+    configs from a JSONL or CSV file. `fmt` is "jsonl" or "csv"; by default
+    it is taken from the file extension. Missing fields get the defaults of
+    `default_vpn_embed`. Each chunk is converted column by column with
+    vectorized assignments.
+
+    RU:
+    Возвращает структурированные массивы до `chunk_size` конфигов из JSONL / CSV.
+    """
+    return _config_chunks(path, chunk_size, fmt)
+
+
+def load_config_columns(path: str, chunk_size: int = 65536, fmt: str | None = None) -> np.ndarray:
+    """
+    EN: Read a whole fleet file into one structured array.
+    RU: Читает весь файл конфигов в один структурированный массив.
+    """
+    return _concat(list(iter_config_chunks(path, chunk_size, fmt)))
+
+
+def _concat(chunks: List[np.ndarray]) -> np.ndarray:
+    if not chunks:
+        return np.zeros(0, dtype=VPN_FEATURE_DTYPE)
+    return np.concatenate(chunks)
+
+
+def read_config_at(path: str, index: int, fmt: str | None = None) -> Dict[str, Any]:
+    """
+    EN: Return the original record number `index` (0-based) from the file.
+    RU: Возвращает исходную запись с номером `index` из файла.
+    """
+    for i, (_, rec) in enumerate(_iter_records(path, _detect_format(path, fmt))):
+        if i == index:
+            return dict(rec)
+    raise IndexError(f"config index {index} out of range")
+
+
+def select_best_vpn_config_from_file(
+    path: str,
+    fmt: str | None = None,
+    chunk_size: int = 65536,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    EN:
+    Streaming variant of `select_best_vpn_config` for a JSONL / CSV fleet file.
+    The fleet is loaded as columns in a single pass that also records the
+    byte offset of every record (8 bytes per config); it is embedded in one
+    vectorized pass and the selected config is returned as the original
+    record, read back from its offset. `kwargs` are passed to
+    `select_best_vpn_config`.
+
+    RU:
+    Потоковый вариант `select_best_vpn_config` для файла JSONL / CSV: один
+    проход по файлу; выбранный конфиг читается по сохранённому смещению.
+    """
+    offsets = array("q")
+    columns = _concat(list(_config_chunks(path, chunk_size, fmt, offsets)))
+    result = select_best_vpn_config(columns, **kwargs)
+    if result["index"] >= 0:
+        result["config"] = _record_at_offset(path, _detect_format(path, fmt), offsets[result["index"]])
+    return result
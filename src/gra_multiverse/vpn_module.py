@@ -18,15 +18,44 @@ RU:
 соответствует мета-цели (например, стабильность / незаметность).
 """
 
-from typing import List, Dict, Any, Callable, Tuple
+from typing import List, Dict, Any, Callable, Iterable, Tuple
 import numpy as np
 
 from .core import Level, Goal, MultiverseState, MultiverseFunctional
 from .optimizer import MultiverseOptimizer
+from .cache import ResultCache, fingerprint_items, embedder_key
+from .selection import cosine_similarities, top_k as select_top_k
 
 
 # --- Простейший "эмбеддер" конфигов --- #
 
+PROTOCOL_MAP = {"tcp": 0, "udp": 1, "tls": 2, "grpc": 3, "ws": 4}
+
+# Columnar (structured array) layout of the features used by the embedder.
+# Колоночное представление признаков, используемых эмбеддером.
+VPN_FEATURE_DTYPE = np.dtype([
+    ("protocol", np.int8),  # code from PROTOCOL_MAP
+    ("port", np.float64),
+    ("obfuscation", np.bool_),
+    ("latency_ms", np.float64),
+    ("jitter_ms", np.float64),
+    ("packet_loss", np.float64),
+    ("rkn_blocked", np.bool_),
+    ("uptime_score", np.float64),
+])
+
+VPN_FEATURE_DEFAULTS: Dict[str, Any] = {
+    "protocol": "tcp",
+    "port": 443,
+    "obfuscation": False,
+    "latency_ms": 100.0,
+    "jitter_ms": 10.0,
+    "packet_loss": 0.01,
+    "rkn_blocked": False,
+    "uptime_score": 0.5,
+}
+
+
 def default_vpn_embed(cfg: Dict[str, Any]) -> np.ndarray:
     """
     EN:
@@ -40,7 +69,7 @@ def default_vpn_embed(cfg: Dict[str, Any]) -> np.ndarray:
     (one-hot для протокола, нормализованные задержки и т.п.).
     """
     # Define some toy features
-    protocol_map = {"tcp": 0, "udp": 1, "tls": 2, "grpc": 3, "ws": 4}
+    protocol_map = PROTOCOL_MAP
     # Fixed vector length (for prototype)
     vec = np.zeros(8, dtype=np.float32)
 
@@ -78,6 +107,67 @@ def default_vpn_embed(cfg: Dict[str, Any]) -> np.ndarray:
     return (vec / norm).astype(np.complex128)
 
 
+def configs_to_columns(configs: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """
+    EN: Convert config dicts into a structured array with `VPN_FEATURE_DTYPE`.
+    RU: Преобразует список конфигов в структурированный массив `VPN_FEATURE_DTYPE`.
+    """
+    configs = list(configs)
+    cols = np.zeros(len(configs), dtype=VPN_FEATURE_DTYPE)
+    for name in VPN_FEATURE_DTYPE.names:
+        default = VPN_FEATURE_DEFAULTS[name]
+        if name == "protocol":
+            values = [PROTOCOL_MAP.get(str(c.get(name, default)).lower(), 0) for c in configs]
+        elif VPN_FEATURE_DTYPE[name] == np.bool_:
+            values = [bool(c.get(name, default)) for c in configs]
+        else:
+            values = [float(c.get(name, default)) for c in configs]
+        cols[name] = values
+    return cols
+
+
+def columns_row_to_config(columns: np.ndarray, i: int) -> Dict[str, Any]:
+    """
+    EN: Rebuild a config dict (embedder features only) from row `i` of `columns`.
+    RU: Восстанавливает dict конфига (только признаки эмбеддера) из строки `i`.
+    """
+    row = columns[i]
+    codes = {v: k for k, v in PROTOCOL_MAP.items()}
+    cfg: Dict[str, Any] = {}
+    for name in VPN_FEATURE_DTYPE.names:
+        value = row[name].item()
+        cfg[name] = codes.get(value, "tcp") if name == "protocol" else value
+    return cfg
+
+
+def default_vpn_embed_batch(columns: np.ndarray) -> np.ndarray:
+    """
+    EN:
+    Vectorized version of `default_vpn_embed` for a whole fleet.
+    Takes a structured array with `VPN_FEATURE_DTYPE` (see `configs_to_columns`
+    and `vpn_io.iter_config_chunks`) and returns an (n, 8) complex matrix
+    whose rows equal `default_vpn_embed` of the corresponding configs.
+
+    RU:
+    Векторизованная версия `default_vpn_embed` для всего парка конфигов:
+    структурированный массив -> матрица (n, 8).
+    """
+    n = columns.shape[0]
+    feats = np.empty((n, 8), dtype=np.float64)
+    feats[:, 0] = np.maximum(columns["protocol"], 0)
+    feats[:, 1] = columns["port"] / 65535.0
+    feats[:, 2] = columns["obfuscation"]
+    feats[:, 3] = columns["latency_ms"] / 1000.0
+    feats[:, 4] = columns["jitter_ms"] / 500.0
+    feats[:, 5] = columns["packet_loss"]
+    feats[:, 6] = columns["rkn_blocked"]
+    feats[:, 7] = columns["uptime_score"]
+
+    mat = feats.astype(np.float32)
+    norm = np.linalg.norm(mat, axis=1, keepdims=True) + 1e-9
+    return (mat / norm).astype(np.complex128)
+
+
 def default_index_dim_fn(a: Tuple[int, ...]) -> int:
     """
     EN: Use last index as level indicator.
@@ -89,42 +179,159 @@ def default_index_dim_fn(a: Tuple[int, ...]) -> int:
 # --- Основная функция выбора конфигурации --- #
 
 def select_best_vpn_config(
-    configs: List[Dict[str, Any]],
+    configs: List[Dict[str, Any]] | np.ndarray,
     meta_goal: str = "max_stability_and_stealth",
     embed_fn: Callable[[Dict[str, Any]], np.ndarray] = default_vpn_embed,
     lambda0: float = 1.0,
     alpha: float = 0.8,
     step_size: float = 1e-2,
     max_steps: int = 50,
+    cache: ResultCache | None = None,
+    top_k: int = 1,
 ) -> Dict[str, Any]:
     """
     EN:
     Given a list of VPN configuration dictionaries, build a simple multiverse
     (level 0: configs, level 1: meta-node), run multiverse optimization,
     and return the configuration that best matches the optimized meta-state.
+    `configs` may also be a structured array with `VPN_FEATURE_DTYPE`
+    (columnar fleet, embedded in one vectorized pass).
 
     RU:
     По списку конфигураций VPN (dict) строит простой мультиверс
     (уровень 0: конфиги, уровень 1: мета-узел), запускает мультиверсную
     оптимизацию и возвращает конфигурацию, которая лучше всего
     соответствует оптимизированному мета-состоянию.
+    `configs` может быть и структурированным массивом `VPN_FEATURE_DTYPE`.
 
     Parameters / Параметры:
-        configs: список конфигов VPN.
+        configs: список конфигов VPN или структурированный массив.
         meta_goal: строка-описание мета-цели (пока используется только для логики целей).
         embed_fn: функция cfg -> np.ndarray (эмбеддер конфигурации).
         lambda0, alpha: гиперпараметры Λ_l.
         step_size, max_steps: параметры оптимизатора.
+        cache: optional `ResultCache`; repeated config sets (in any order)
+            with the same hyperparameters are answered from the cache,
+            near hits warm-start from the cached meta-node.
+        top_k: number of ranked candidates; with top_k > 1 the result also
+            contains "candidates" (best first) as fallbacks.
 
     Returns / Возвращает:
         dict с полями:
             "config" – выбранная конфигурация,
             "index"  – её индекс,
-            "debug"  – служебная информация.
+            "debug"  – служебная информация,
+            "candidates" – только при top_k > 1: список
+                {"index", "config", "similarity"} по убыванию сходства.
     """
     if len(configs) == 0:
         return {"config": {}, "index": -1, "debug": "no configs provided"}
 
+    columnar = isinstance(configs, np.ndarray)
+    if columnar and embed_fn is not default_vpn_embed:
+        raise ValueError("columnar configs require the default embedder")
+
+    hit = None
+    if cache is not None:
+        digests = fingerprint_items(configs)
+        cache_params = (
+            "vpn_module.select_best_vpn_config", meta_goal, embedder_key(embed_fn),
+            lambda0, alpha, step_size, max_steps,
+        )
+        hit = cache.lookup(digests, cache_params)
+        if hit is not None and hit.exact:
+            idx = hit.index
+            result = {
+                "config": columns_row_to_config(configs, idx) if columnar else configs[idx],
+                "index": idx,
+                "debug": (
+                    f"best_cosine_similarity={hit.entry.similarity:.4f}, "
+                    f"n_configs={len(configs)}, cache=hit"
+                ),
+            }
+            if top_k > 1:
+                cached = np.stack([hit.entry.embeds[d] for d in digests], axis=0)
+                ranked, sims = select_top_k(cosine_similarities(cached, hit.entry.meta), top_k)
+                result["candidates"] = _candidates(configs, columnar, ranked, sims)
+            return result
+
+    meta_init = None
+    if columnar:
+        embeds = default_vpn_embed_batch(configs)
+    elif hit is not None:
+        # near hit: embed only the configs the cached entry does not cover
+        added = set(hit.added)
+        embeds = np.stack([
+            np.asarray(embed_fn(cfg), dtype=np.complex128) if i in added else hit.entry.embeds[digests[i]]
+            for i, cfg in enumerate(configs)
+        ])
+    else:
+        embeds = np.stack([np.asarray(embed_fn(cfg), dtype=np.complex128) for cfg in configs])
+    if hit is not None:
+        meta_init = hit.warm_meta(digests, embeds)
+
+    ranked, sims, meta_opt = _select_from_embeddings(
+        embeds, meta_goal, lambda0, alpha, step_size, max_steps, meta_init, top_k
+    )
+    best_idx = int(ranked[0])
+    best_sim = float(sims[0])
+
+    if cache is not None:
+        cache.store(digests, cache_params, best_idx, best_sim, meta_opt, embeds)
+
+    config = columns_row_to_config(configs, best_idx) if columnar else configs[best_idx]
+    result = {
+        "config": config,
+        "index": best_idx,
+        "debug": f"best_cosine_similarity={best_sim:.4f}, n_configs={len(configs)}",
+    }
+    if top_k > 1:
+        result["candidates"] = _candidates(configs, columnar, ranked, sims)
+    return result
+
+
+def _candidates(
+    configs: List[Dict[str, Any]] | np.ndarray,
+    columnar: bool,
+    ranked: np.ndarray,
+    sims: np.ndarray,
+) -> List[Dict[str, Any]]:
+    """Ranked fallbacks: [{"index", "config", "similarity"}, ...], best first."""
+    return [
+        {
+            "index": int(i),
+            "config": columns_row_to_config(configs, int(i)) if columnar else configs[int(i)],
+            "similarity": float(s),
+        }
+        for i, s in zip(ranked, sims)
+    ]
+
+
+def _select_from_embeddings(
+    embeds: np.ndarray,
+    meta_goal: str,
+    lambda0: float,
+    alpha: float,
+    step_size: float,
+    max_steps: int,
+    meta_init: np.ndarray | None = None,
+    top_k: int = 1,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    EN:
+    Optimize the meta-node for an (n, d) embedding matrix and return the
+    indices and cosine similarities of the `top_k` closest configs (best
+    first) and the optimized meta-node. `meta_init` warm-starts the
+    meta-node (default: mean embedding).
+
+    Level-0 nodes are held fixed: their J_loc terms do not depend on the
+    meta-node, so the optimizer state holds only the meta-node (0, 1).
+    This keeps the cost independent of the fleet size.
+
+    RU:
+    Оптимизирует мета-узел и возвращает индексы и косинусы top_k ближайших
+    конфигов.
+    """
     # 1. Levels & goals
     level0 = Level(index=0, name="vpn_configs")
     level1 = Level(index=1, name="vpn_meta")
@@ -135,19 +342,10 @@ def select_best_vpn_config(
     levels = [level0, level1]
     goals = [goal0, goal1]
 
-    # 2. Initial multiverse state
-    # Use indices (i, 0) for configs and (0, 1) for meta-node.
-    states: Dict[Tuple[int, ...], np.ndarray] = {}
-
-    embeds = [embed_fn(cfg) for cfg in configs]
-    for i, e in enumerate(embeds):
-        states[(i, 0)] = e.copy()
-
-    # Meta-node: average embedding
-    meta_vec = np.mean(np.stack(embeds, axis=0), axis=0)
-    states[(0, 1)] = meta_vec.astype(np.complex128)
-
-    psi = MultiverseState(states)
+    # 2. Meta-node: average embedding (or warm start)
+    meta_vec = embeds.mean(axis=0) if meta_init is None else meta_init
+    meta_vec = np.asarray(meta_vec, dtype=np.complex128)
+    psi = MultiverseState({(0, 1): meta_vec})
 
     # 3. Functional & optimizer
     functional = MultiverseFunctional(
@@ -169,23 +367,11 @@ def select_best_vpn_config(
         max_steps=max_steps,
         tol=1e-6,
         callback=None,
+        active_keys=[(0, 1)],
     )
 
-    # 5. Choose config closest to optimized meta-node
+    # 5. Choose config closest to optimized meta-node (one matrix-vector product)
     meta_opt = psi_opt[(0, 1)]
-    best_idx = 0
-    best_sim = -1.0
-
-    for i, e in enumerate(embeds):
-        num = float(np.real(np.vdot(e, meta_opt)))
-        denom = (np.linalg.norm(e) * np.linalg.norm(meta_opt) + 1e-9)
-        sim = num / denom
-        if sim > best_sim:
-            best_sim = sim
-            best_idx = i
-
-    return {
-        "config": configs[best_idx],
-        "index": best_idx,
-        "debug": f"best_cosine_similarity={best_sim:.4f}, n_configs={len(configs)}",
-    }
+    ranked, sims = select_top_k(cosine_similarities(embeds, meta_opt), top_k)
+    return ranked, sims, meta_opt
+
@@ -0,0 +1,277 @@
+# src/gra_multiverse/vpn_probe.py
+
+"""
+EN:
+Concurrent asyncio probe harness for VPN endpoints.
+
+`select_best_vpn_config` expects `latency_ms`, `jitter_ms`, `packet_loss`
+and `uptime_score` to be filled in. `ProbeHarness` measures them against
+many endpoints concurrently (TCP connect time or UDP handshake round-trip),
+with bounded concurrency and per-probe timeouts, aggregates the results in
+rolling windows and writes the metrics back into the config dicts.
+
+The transport follows the protocol (`PROTOCOL_TRANSPORTS`, e.g. WireGuard
+is UDP-only). UDP VPN servers ignore arbitrary datagrams, so UDP endpoints
+are only probed when a handshake payload is configured for their protocol;
+otherwise their metrics are left as they are.
+
+RU:
+Асинхронный харнесс для параллельного опроса VPN-эндпоинтов.
+
+`ProbeHarness` измеряет задержку, джиттер, потери и аптайм для многих
+эндпоинтов одновременно (время TCP-подключения или RTT UDP-эха), с
+ограничением параллелизма и тайм-аутами, агрегирует результаты в
+скользящих окнах и записывает метрики в словари конфигов.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Tuple
+
+from .vpn_module import PROTOCOL_MAP
+
+
+Endpoint = Tuple[str, int, str]  # (host, port, "tcp" | "udp")
+
+# Transport of each protocol; unknown protocols are probed over TCP.
+PROTOCOL_TRANSPORTS: Dict[str, str] = {
+    **{proto: "tcp" for proto in PROTOCOL_MAP},  # tcp, tls, grpc, ws
+    "udp": "udp",
+    "wireguard": "udp",
+    "quic": "udp",
+    "hysteria": "udp",
+    "openvpn": "udp",  # OpenVPN over TCP: set "transport": "tcp" in the config
+}
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of one probe."""
+    ok: bool
+    latency_ms: float | None = None
+
+
+async def probe_tcp(host: str, port: int, timeout: float = 1.0) -> ProbeResult:
+    """
+    EN: Measure TCP connect latency; failure or timeout counts as a lost probe.
+    RU: Измеряет время TCP-подключения; ошибка или тайм-аут — потерянная проба.
+    """
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return ProbeResult(ok=False)
+    latency = (time.perf_counter() - start) * 1000.0
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return ProbeResult(ok=True, latency_ms=latency)
+
+
+class _UdpProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, reply: asyncio.Future):
+        self.reply = reply
+
+    def datagram_received(self, data: bytes, addr: Any) -> None:
+        if not self.reply.done():
+            self.reply.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.reply.done():
+            self.reply.set_exception(exc)
+
+
+async def probe_udp(
+    host: str,
+    port: int,
+    timeout: float = 1.0,
+    payload: bytes = b"gra-probe",
+) -> ProbeResult:
+    """
+    EN:
+    Send one datagram and wait for any reply (echo / handshake response).
+    No reply within `timeout` counts as a lost probe.
+
+    RU:
+    Отправляет датаграмму и ждёт ответ; отсутствие ответа — потеря.
+    """
+    loop = asyncio.get_running_loop()
+    reply: asyncio.Future = loop.create_future()
+    start = time.perf_counter()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UdpProbeProtocol(reply), remote_addr=(host, port)
+        )
+    except OSError:
+        return ProbeResult(ok=False)
+    try:
+        transport.sendto(payload)
+        await asyncio.wait_for(reply, timeout)
+    except (OSError, asyncio.TimeoutError):
+        return ProbeResult(ok=False)
+    finally:
+        transport.close()
+    return ProbeResult(ok=True, latency_ms=(time.perf_counter() - start) * 1000.0)
+
+
+class ProbeWindow:
+    """
+    EN:
+    Rolling statistics for one endpoint.
+
+    - latency_ms: mean latency of successful probes in the last `size` probes;
+    - jitter_ms: mean absolute difference of consecutive successful latencies;
+    - packet_loss: failed fraction of the last `size` probes;
+    - uptime_score: successful fraction of the last `uptime_size` probes.
+
+    If none of the recent probes succeeded, latency and jitter are set to the
+    pessimistic `failure_latency_ms` (the probe timeout in `ProbeHarness`),
+    so a dead endpoint does not keep its pre-outage latency.
+
+    RU:
+    Скользящая статистика одного эндпоинта.
+    """
+
+    def __init__(self, size: int = 20, uptime_size: int = 300):
+        self.recent: Deque[ProbeResult] = deque(maxlen=size)
+        self.history: Deque[bool] = deque(maxlen=uptime_size)
+
+    def add(self, result: ProbeResult) -> None:
+        self.recent.append(result)
+        self.history.append(result.ok)
+
+    def __len__(self) -> int:
+        return len(self.recent)
+
+    def stats(self, failure_latency_ms: float = 1000.0) -> Dict[str, float]:
+        latencies = [r.latency_ms for r in self.recent if r.ok]
+        stats = {
+            "packet_loss": 1.0 - len(latencies) / len(self.recent),
+            "uptime_score": sum(self.history) / len(self.history),
+        }
+        if latencies:
+            stats["latency_ms"] = sum(latencies) / len(latencies)
+            diffs = [abs(b - a) for a, b in zip(latencies, latencies[1:])]
+            stats["jitter_ms"] = sum(diffs) / len(diffs) if diffs else 0.0
+        else:
+            stats["latency_ms"] = failure_latency_ms
+            stats["jitter_ms"] = failure_latency_ms
+        return stats
+
+
+def _protocol_of(cfg: Dict[str, Any]) -> str:
+    return str(cfg.get("protocol", "tcp")).lower()
+
+
+def endpoint_of(cfg: Dict[str, Any]) -> Endpoint | None:
+    """
+    EN: (host, port, transport) of a config. The transport is the config's
+        "transport" if set, else `PROTOCOL_TRANSPORTS[protocol]`.
+        Configs without a "host" cannot be probed and give None.
+    RU: (хост, порт, транспорт) конфига; без "host" — None.
+    """
+    if "host" not in cfg:
+        return None
+    transport = cfg.get("transport") or PROTOCOL_TRANSPORTS.get(_protocol_of(cfg), "tcp")
+    return str(cfg["host"]), int(cfg.get("port", 443)), str(transport).lower()
+
+
+class ProbeHarness:
+    """
+    EN:
+    Probes many endpoints concurrently and keeps a `ProbeWindow` per endpoint.
+
+    Typical loop:
+
+        harness = ProbeHarness(concurrency=512, timeout=0.5)
+        await harness.refresh(configs)          # probe + write metrics
+        select_best_vpn_config(configs)
+
+    UDP endpoints need a datagram the server answers: `udp_payloads` maps a
+    protocol to its handshake payload (e.g. a WireGuard handshake initiation
+    for "wireguard"), `udp_payload` is the fallback for other UDP protocols
+    (e.g. an echo service). UDP configs without a payload are neither probed
+    nor updated.
+
+    RU:
+    Параллельно опрашивает эндпоинты и хранит `ProbeWindow` для каждого.
+    UDP-эндпоинты опрашиваются только при заданном payload рукопожатия.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 256,
+        timeout: float = 1.0,
+        window: int = 20,
+        uptime_window: int = 300,
+        probes_per_round: int = 1,
+        udp_payload: bytes | None = None,
+        udp_payloads: Dict[str, bytes] | None = None,
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.window = window
+        self.uptime_window = uptime_window
+        self.probes_per_round = probes_per_round
+        self.udp_payload = udp_payload
+        self.udp_payloads = dict(udp_payloads or {})
+        self.windows: Dict[Endpoint, ProbeWindow] = {}
+
+    def _target(self, cfg: Dict[str, Any]) -> Tuple[Endpoint, bytes | None] | None:
+        """(endpoint, UDP payload) to probe for a config, or None if it cannot be probed."""
+        endpoint = endpoint_of(cfg)
+        if endpoint is None:
+            return None
+        if endpoint[2] != "udp":
+            return endpoint, None
+        payload = self.udp_payloads.get(_protocol_of(cfg), self.udp_payload)
+        if payload is None:
+            return None  # the server would not answer: do not record losses
+        return endpoint, payload
+
+    async def _probe(self, endpoint: Endpoint, payload: bytes | None, sem: asyncio.Semaphore) -> None:
+        host, port, transport = endpoint
+        win = self.windows.setdefault(endpoint, ProbeWindow(self.window, self.uptime_window))
+        for _ in range(self.probes_per_round):
+            async with sem:
+                if transport == "udp":
+                    result = await probe_udp(host, port, self.timeout, payload)
+                else:
+                    result = await probe_tcp(host, port, self.timeout)
+            win.add(result)
+
+    async def probe_round(self, configs: List[Dict[str, Any]]) -> None:
+        """
+        Probe every distinct endpoint of `configs` once (x `probes_per_round`);
+        configs without a host or without a UDP payload are skipped.
+        """
+        targets: Dict[Endpoint, bytes | None] = {}
+        for cfg in configs:
+            target = self._target(cfg)
+            if target is not None:
+                targets.setdefault(*target)
+        sem = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._probe(ep, payload, sem) for ep, payload in targets.items()))
+
+    def apply(self, configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Write the current window statistics into the config dicts (in place).
+        Endpoints without a successful recent probe get the probe timeout as
+        latency and jitter.
+        """
+        for cfg in configs:
+            target = self._target(cfg)
+            win = self.windows.get(target[0]) if target is not None else None
+            if win is not None and len(win):
+                cfg.update(win.stats(failure_latency_ms=self.timeout * 1000.0))
+        return configs
+
+    async def refresh(self, configs: List[Dict[str, Any]], rounds: int = 1) -> List[Dict[str, Any]]:
+        """Run `rounds` probe rounds and update `configs` with the metrics."""
+        for _ in range(rounds):
+            await self.probe_round(configs)
+        return self.apply(configs)
@@ -0,0 +1,228 @@
+# src/gra_multiverse/vpn_selector.py
+
+"""
+EN:
+Long-running VPN selector with incremental telemetry updates.
+
+`VpnSelector` keeps the embedding matrix and the optimized meta-node of a
+VPN fleet between re-evaluations. Telemetry deltas (latency, jitter, loss,
+uptime) re-embed only the affected rows, the meta-node is re-optimized with
+a warm start from its previous value, and hysteresis prevents flapping
+between configurations of almost equal quality. For large fleets the
+closest configuration can be looked up in an approximate LSH index
+(`search="lsh"`) instead of scanning all rows.
+
+RU:
+Долгоживущий селектор VPN с инкрементальным обновлением телеметрии.
+
+`VpnSelector` хранит матрицу эмбеддингов и оптимизированный мета-узел
+между переоценками. Изменения телеметрии переэмбеддят только затронутые
+строки, мета-узел переоптимизируется с тёплого старта, а гистерезис
+не даёт выбору «прыгать» между почти равными конфигурациями.
+Для больших парков ближайшая конфигурация может искаться в приближённом
+LSH-индексе (`search="lsh"`).
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+
+from .core import Level, Goal, MultiverseState, MultiverseFunctional
+from .optimizer import MultiverseOptimizer
+from .vpn_module import default_vpn_embed, default_index_dim_fn
+from .selection import ExactIndex, LSHIndex
+
+
+META_KEY: Tuple[int, ...] = (0, 1)
+
+TELEMETRY_FIELDS = ("latency_ms", "jitter_ms", "packet_loss", "uptime_score")
+
+
+class VpnSelector:
+    """
+    EN:
+    Stateful version of `select_best_vpn_config`.
+
+    The first selection equals `select_best_vpn_config(configs)`. After that,
+    `update({index: {"latency_ms": ..., ...}})` applies telemetry deltas and
+    re-selects. Re-embedding and the mean update scale with the number of
+    changed configs, and the meta-node optimization does not depend on the
+    fleet size. The re-selection does: the meta-node moves with every
+    update, so all similarities change, and with the default
+    `search="exact"` each update costs one O(N·d) matrix-vector product
+    over the N configs.
+
+    The running sum of the embeddings is recomputed from scratch every
+    `resum_every` updates to bound floating-point drift in long-running
+    processes.
+
+    A new best configuration replaces the current one only if its cosine
+    similarity to the meta-node exceeds the current one's by `hysteresis`.
+
+    With `search="lsh"` the best row is found through an `LSHIndex`
+    (`lsh_bits` x `lsh_tables` random hyperplanes) that is updated
+    incrementally with the re-embedded rows, so re-selection only re-ranks
+    the colliding rows (the index falls back to the O(N·d) scan when the
+    embeddings do not spread over its buckets); the dense `sims` vector is
+    then only computed when accessed. `candidates(k)` returns ranked fallbacks.
+
+    RU:
+    Версия `select_best_vpn_config` с состоянием. Первый выбор совпадает с
+    `select_best_vpn_config(configs)`; `update` применяет изменения
+    телеметрии и выбирает заново с учётом гистерезиса.
+    """
+
+    def __init__(
+        self,
+        configs: List[Dict[str, Any]],
+        meta_goal: str = "max_stability_and_stealth",
+        embed_fn: Callable[[Dict[str, Any]], np.ndarray] = default_vpn_embed,
+        lambda0: float = 1.0,
+        alpha: float = 0.8,
+        step_size: float = 1e-2,
+        max_steps: int = 50,
+        hysteresis: float = 0.02,
+        tol: float = 1e-6,
+        search: str = "exact",
+        lsh_bits: int = 12,
+        lsh_tables: int = 8,
+        resum_every: int = 1000,
+    ):
+        if len(configs) == 0:
+            raise ValueError("configs must not be empty")
+        if search not in ("exact", "lsh"):
+            raise ValueError(f"unknown search {search!r} (expected 'exact' or 'lsh')")
+
+        self.configs = [dict(cfg) for cfg in configs]
+        self.embed_fn = embed_fn
+        self.hysteresis = hysteresis
+        self.max_steps = max_steps
+        self.tol = tol
+        self.search = search
+        self.resum_every = resum_every
+
+        level0 = Level(index=0, name="vpn_configs")
+        level1 = Level(index=1, name="vpn_meta")
+        goals = [
+            Goal(level=level0, description="local VPN quality (stability, latency, etc.)"),
+            Goal(level=level1, description=f"meta-goal: {meta_goal}"),
+        ]
+        self.functional = MultiverseFunctional(
+            levels=[level0, level1],
+            goals=goals,
+            lambda0=lambda0,
+            alpha=alpha,
+            index_dim_fn=default_index_dim_fn,
+        )
+        self.optimizer = MultiverseOptimizer(
+            functional=self.functional,
+            step_size=step_size,
+        )
+
+        self.embeds = np.stack([np.asarray(embed_fn(cfg), dtype=np.complex128) for cfg in self.configs])
+        if search == "lsh":
+            self.search_index: ExactIndex = LSHIndex(self.embeds, n_bits=lsh_bits, n_tables=lsh_tables)
+        else:
+            self.search_index = ExactIndex(self.embeds)
+        self.norms = self.search_index.norms  # shared, kept current by search_index.update
+        self._sum = self.embeds.sum(axis=0)
+
+        n = len(self.configs)
+        self.meta = self._optimize_meta(self._sum / n)
+        self._sims: np.ndarray | None = None
+        self.index, _ = self._best()
+        self.n_updates = 0
+        self.n_switches = 0
+
+    # ---- internals ----
+
+    def _optimize_meta(self, meta_init: np.ndarray) -> np.ndarray:
+        """
+        Warm-started optimization of the meta-node. The state holds the meta-node
+        only: level-0 rows are held fixed and their J_loc terms are constant
+        w.r.t. the meta-node, so they do not enter its gradient.
+        """
+        psi_opt = self.optimizer.run_to_convergence(
+            state=MultiverseState({META_KEY: meta_init}),
+            max_steps=self.max_steps,
+            tol=self.tol,
+            callback=None,
+            active_keys=[META_KEY],
+        )
+        return psi_opt[META_KEY]
+
+    def _best(self) -> Tuple[int, float]:
+        """(row, similarity) of the config closest to the meta-node."""
+        if self.search == "exact":
+            best = int(np.argmax(self.sims))
+            return best, float(self.sims[best])
+        idx, sims = self.search_index.search(self.meta, 1)
+        return int(idx[0]), float(sims[0])
+
+    def _similarity(self, i: int) -> float:
+        if self._sims is not None:
+            return float(self._sims[i])
+        return float(self.search_index.similarities(self.meta, np.array([i]))[0])
+
+    @property
+    def sims(self) -> np.ndarray:
+        """Cosine similarity of every config to the current meta-node."""
+        if self._sims is None:
+            self._sims = self.search_index.similarities(self.meta)
+        return self._sims
+
+    # ---- public API ----
+
+    def update(self, deltas: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply telemetry deltas {config index -> {field: new value}} and re-select.
+
+        Only `TELEMETRY_FIELDS` are expected to change, but any config field
+        is accepted; affected rows are re-embedded with `embed_fn`.
+        """
+        n = len(self.configs)
+        old_mean = self._sum / n
+        changed: Dict[int, np.ndarray] = {}
+        for i, fields in deltas.items():
+            if not 0 <= i < n:
+                raise IndexError(f"config index {i} out of range")
+            self.configs[i].update(fields)
+            e = np.asarray(self.embed_fn(self.configs[i]), dtype=np.complex128)
+            self._sum += e - self.embeds[i]
+            self.embeds[i] = e
+            changed[i] = e
+        self.search_index.update(np.fromiter(changed, dtype=np.int64, count=len(changed)))
+        if self.resum_every and (self.n_updates + 1) % self.resum_every == 0:
+            self._sum = self.embeds.sum(axis=0)  # drop accumulated rounding error
+
+        # warm start: previous meta-node shifted by the change of the mean
+        meta_init = self.meta + (self._sum / n - old_mean)
+        self.meta = self._optimize_meta(meta_init)
+        self._sims = None
+
+        best, best_sim = self._best()
+        switched = best != self.index and best_sim > self._similarity(self.index) + self.hysteresis
+        if switched:
+            self.index = best
+            self.n_switches += 1
+        self.n_updates += 1
+
+        result = self.result()
+        result["switched"] = bool(switched)
+        return result
+
+    def result(self) -> Dict[str, Any]:
+        """Current selection in the format of `select_best_vpn_config`."""
+        sim = self._similarity(self.index)
+        return {
+            "config": self.configs[self.index],
+            "index": self.index,
+            "debug": f"best_cosine_similarity={sim:.4f}, n_configs={len(self.configs)}",
+        }
+
+    def candidates(self, k: int) -> List[Dict[str, Any]]:
+        """The k configs closest to the meta-node (best first) as ranked fallbacks."""
+        idx, sims = self.search_index.search(self.meta, k)
+        return [
+            {"index": int(i), "config": self.configs[int(i)], "similarity": float(s)}
+            for i, s in zip(idx, sims)
+        ]
@@ -0,0 +1,158 @@
+# tests/test_aio.py
+
+import asyncio
+
+import pytest
+
+from src.gra_multiverse.aio import AsyncAnswerOptimizer, RequestCoalescer, isolate_failures
+from src.gra_multiverse.llm_module import optimize_answers, default_embed, default_embed_many
+from src.gra_multiverse.llm_anti_hallucination import ensemble
+
+
+PROMPTS = [
+    ["Paris is the capital of France.", "Paris, France.", "London is the capital."],
+    ["Water boils at 100 C.", "Water boils at 100 degrees.", "Water freezes at 100."],
+    ["один", "один ответ", "другой"],
+]
+
+
+def test_concurrent_requests_are_coalesced_and_match_sync():
+    async def main():
+        async with AsyncAnswerOptimizer(batch_window=0.05) as opt:
+            results = await asyncio.gather(*(opt.optimize_answers(a) for a in PROMPTS))
+            return results, opt.coalescer.n_batches
+
+    results, n_batches = asyncio.run(main())
+    assert n_batches == 1
+    for answers, res in zip(PROMPTS, results):
+        assert res["index"] == optimize_answers(answers)["index"]
+
+
+def test_async_embedders_are_awaited():
+    calls = []
+
+    async def embed_many(texts):
+        calls.append(len(texts))
+        await asyncio.sleep(0)
+        return default_embed_many(texts)
+
+    async def embed_one(text):
+        await asyncio.sleep(0)
+        return default_embed(text)
+
+    async def main():
+        async with AsyncAnswerOptimizer(embed_many_fn=embed_many) as opt:
+            many = await asyncio.gather(*(opt.optimize_answers(a) for a in PROMPTS))
+        async with AsyncAnswerOptimizer(embed_fn=embed_one) as opt:
+            one = await opt.optimize_answers(PROMPTS[0])
+        return many, one
+
+    many, one = asyncio.run(main())
+    assert calls == [sum(len(a) for a in PROMPTS)]  # один батч эмбеддингов
+    assert [r["index"] for r in many] == [optimize_answers(a)["index"] for a in PROMPTS]
+    assert one["index"] == optimize_answers(PROMPTS[0])["index"]
+
+
+def test_grounded_requests_keep_their_own_context():
+    docs = [["Paris is the capital of France."], ["Water boils at 100 degrees Celsius."]]
+
+    async def main():
+        async with AsyncAnswerOptimizer(batch_window=0.05) as opt:
+            return await asyncio.gather(*(
+                opt.optimize_answers_grounded(a, context_documents=d) for a, d in zip(PROMPTS, docs)
+            ))
+
+    results = asyncio.run(main())
+    for answers, d, res in zip(PROMPTS, docs, results):
+        assert res["chosen_index"] == ensemble.optimize_answers(answers, context_documents=d)["chosen_index"]
+
+
+def test_timeout_and_cancellation_propagate():
+    async def slow_embed(texts):
+        await asyncio.sleep(1.0)
+        return default_embed_many(texts)
+
+    async def main():
+        async with AsyncAnswerOptimizer(embed_many_fn=slow_embed, batch_window=0.5) as opt:
+            with pytest.raises(asyncio.TimeoutError):
+                await opt.optimize_answers(PROMPTS[0], timeout=0.01)
+
+            task = asyncio.ensure_future(opt.optimize_answers(PROMPTS[1]))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return opt.coalescer.n_batches
+
+    # оба запроса отменены до начала батча => батч не выполняется
+    assert asyncio.run(main()) == 0
+
+
+def test_bad_request_does_not_fail_its_batch():
+    docs = ["Paris is the capital of France."]
+
+    async def main():
+        async with AsyncAnswerOptimizer(batch_window=0.05) as opt:
+            with pytest.raises(TypeError):
+                await opt.optimize_answers([None, 1])  # отклоняется до склейки в батч
+            results = await asyncio.gather(
+                opt.optimize_answers_grounded(PROMPTS[0], context_documents=docs),
+                opt.optimize_answers_grounded(PROMPTS[1], context_documents=[123]),  # падает в батче
+                opt.optimize_answers_grounded(PROMPTS[2], context_documents=docs),
+                return_exceptions=True,
+            )
+            return results, opt.coalescer.n_batches
+
+    results, n_batches = asyncio.run(main())
+    assert n_batches == 1
+    assert isinstance(results[1], TypeError)
+    for i in (0, 2):
+        expected = ensemble.optimize_answers(PROMPTS[i], context_documents=docs)
+        assert results[i]["chosen_index"] == expected["chosen_index"]
+
+
+def test_embedder_failure_fails_batch_once():
+    calls = []
+
+    async def flaky_embed(texts):
+        calls.append(len(texts))
+        raise ConnectionError("rate limited")
+
+    async def main():
+        async with AsyncAnswerOptimizer(embed_many_fn=flaky_embed, batch_window=0.05) as opt:
+            return await asyncio.gather(*(opt.optimize_answers(a) for a in PROMPTS), return_exceptions=True)
+
+    results = asyncio.run(main())
+    # один вызов эмбеддера на батч, без повторов по запросам
+    assert calls == [sum(len(a) for a in PROMPTS)]
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+def test_coalescer_sets_per_payload_exceptions():
+    async def run_batch(key, payloads):
+        return [ValueError(p) if p < 0 else p * 2 for p in payloads]
+
+    async def main():
+        coalescer = RequestCoalescer(run_batch, window=0.01)
+        futs = [coalescer.submit("k", p) for p in (1, -1, 3)]
+        return await asyncio.gather(*futs, return_exceptions=True)
+
+    ok1, bad, ok3 = asyncio.run(main())
+    assert (ok1, ok3) == (2, 6)
+    assert isinstance(bad, ValueError)
+
+
+def test_isolate_failures_bisects():
+    calls = []
+
+    def fn(items):
+        calls.append(len(items))
+        if any(i < 0 for i in items):
+            raise ValueError("negative")
+        return [i * 2 for i in items]
+
+    out = isolate_failures(fn, list(range(7)) + [-1])
+    assert out[:7] == [i * 2 for i in range(7)]
+    assert isinstance(out[7], ValueError)
+    # деление пополам: O(log n) вызовов на плохой элемент, а не n
+    assert len(calls) == 7
@@ -0,0 +1,121 @@
+# tests/test_cache.py
+
+from src.gra_multiverse.cache import ResultCache
+from src.gra_multiverse.llm_module import optimize_answers
+from src.gra_multiverse.vpn_module import select_best_vpn_config
+
+
+ANSWERS = [
+    "Paris is the capital of France.",
+    "Marseille is the capital of France.",
+    "The capital of France is Paris.",
+]
+
+
+def test_exact_hit_is_remapped_to_callers_order():
+    cache = ResultCache()
+    first = optimize_answers(ANSWERS, max_steps=5, cache=cache)
+
+    permuted = [ANSWERS[2], ANSWERS[0], ANSWERS[1]]
+    second = optimize_answers(permuted, max_steps=5, cache=cache)
+
+    assert cache.hits == 1
+    assert "cache=hit" in second["debug"]
+    assert second["chosen"] == first["chosen"]
+    assert permuted[second["index"]] == first["chosen"]
+
+    # другие гиперпараметры – другой ключ
+    optimize_answers(ANSWERS, max_steps=6, cache=cache)
+    assert cache.misses == 2
+
+
+def test_ttl_and_size_bound():
+    now = [0.0]
+    cache = ResultCache(maxsize=2, ttl=10.0, clock=lambda: now[0])
+    for k in range(3):
+        optimize_answers(ANSWERS + [f"extra {k}"], max_steps=2, cache=cache)
+    assert len(cache) == 2
+
+    optimize_answers(ANSWERS + ["extra 2"], max_steps=2, cache=cache)
+    assert cache.hits == 1
+    now[0] = 11.0
+    optimize_answers(ANSWERS + ["extra 2"], max_steps=2, cache=cache)
+    assert cache.hits == 1
+
+
+def test_near_hit_warm_start_matches_full_computation():
+    configs = [
+        {"protocol": "udp", "port": 443, "latency_ms": 40, "uptime_score": 0.9},
+        {"protocol": "tcp", "port": 443, "latency_ms": 120, "uptime_score": 0.6},
+        {"protocol": "tls", "port": 443, "latency_ms": 300, "uptime_score": 0.3},
+        {"protocol": "udp", "port": 8443, "latency_ms": 45, "uptime_score": 0.8},
+    ]
+    cache = ResultCache(max_diff=2)
+    select_best_vpn_config(configs[:3], max_steps=5, cache=cache)
+
+    res = select_best_vpn_config(configs[1:], max_steps=5, cache=cache)
+    ref = select_best_vpn_config(configs[1:], max_steps=5)
+    assert cache.near_hits == 1
+    assert res["index"] == ref["index"]
+    assert res["debug"] == ref["debug"]
+
+
+def test_cache_is_safe_under_concurrent_use():
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+
+    cache = ResultCache(maxsize=8, max_diff=1)
+    embeds = np.ones((3, 4), dtype=np.complex128)
+
+    def work(k):
+        for j in range(200):
+            digests = [f"a{k}", f"b{j % 20}", "c"]
+            if cache.lookup(digests, "p") is None:
+                cache.store(digests, "p", 0, 1.0, embeds[0], embeds)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(work, range(8)))
+
+    # каждый lookup учтён ровно один раз, размер не превышает maxsize
+    assert cache.hits + cache.near_hits + cache.misses == 8 * 200
+    assert len(cache) <= 8
+
+
+def test_memory_bound_evicts_by_bytes():
+    import numpy as np
+
+    row = np.ones(4, dtype=np.complex128)  # 64 байта
+    cache = ResultCache(maxsize=100, max_bytes=64 * 10)
+    for k in range(3):
+        digests = [f"x{k}", f"y{k}", f"z{k}"]
+        cache.store(digests, "p", 0, 1.0, row, np.stack([row] * 3))  # 4 строки = 256 байт
+    assert len(cache) == 2 and cache.nbytes == 512
+    assert cache.lookup(["x0", "y0", "z0"], "p") is None
+
+    # запись больше лимита не кэшируется
+    big = [f"w{i}" for i in range(20)]
+    cache.store(big, "p", 0, 1.0, row, np.stack([row] * 20))
+    assert cache.lookup(big, "p") is None and len(cache) == 2
+
+
+def test_distinct_embedders_do_not_share_entries():
+    from src.gra_multiverse.llm_module import default_embed
+
+    def make(w):
+        return lambda text: default_embed(text) * w + (1 - w) * default_embed(text[::-1])
+
+    cache = ResultCache()
+    first = optimize_answers(ANSWERS, max_steps=5, embed_fn=make(0.9), cache=cache)
+    second = optimize_answers(ANSWERS, max_steps=5, embed_fn=make(0.5), cache=cache)
+    # замыкания одной фабрики имеют одинаковый __qualname__, но разные ключи
+    assert cache.hits == 0 and cache.misses == 2
+    assert "cache=hit" not in second["debug"]
+
+    # явный cache_key разделяет записи между эквивалентными эмбеддерами
+    a, b = make(0.9), make(0.9)
+    a.cache_key = b.cache_key = ("mix", 0.9)
+    optimize_answers(ANSWERS, max_steps=5, embed_fn=a, cache=cache)
+    res = optimize_answers(ANSWERS, max_steps=5, embed_fn=b, cache=cache)
+    assert "cache=hit" in res["debug"]
+    assert first["index"] == res["index"]
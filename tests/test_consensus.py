@@ -0,0 +1,66 @@
+# tests/test_consensus.py
+
+import numpy as np
+
+from src.gra_multiverse.consensus import ConsensusSession
+from src.gra_multiverse.llm_module import default_embed, optimize_answers
+
+
+def test_session_matches_batch_optimize_answers():
+    answers = [
+        "Paris is the capital of France.",
+        "Marseille is the capital of France.",
+        "The capital of France is Paris.",
+        "Lyon is the capital of France.",
+        "France's capital city is Paris.",
+    ]
+
+    session = ConsensusSession()
+    for a in answers:
+        res = session.add(a)
+
+    ref = optimize_answers(answers=answers, max_steps=5)
+    assert res["index"] == ref["index"]
+    assert res["chosen"] == answers[res["index"]]
+    assert len(res["scores"]["phi0"]) == len(answers)
+
+
+def test_session_duplicate_foam_and_stability():
+    session = ConsensusSession(expected=3)
+    assert session.result()["index"] == -1
+
+    session.add("Paris.")
+    res = session.add("paris. ")
+    # дубликаты после нормализации не создают пены уровня 1
+    assert res["scores"]["phi1"] == [0.0, 0.0]
+
+    res = session.add("Berlin")
+    # все ответы получены – выбор больше не может измениться
+    assert session.remaining() == 0
+    assert res["stable"]
+
+
+def test_session_not_stable_when_many_answers_pending():
+    session = ConsensusSession(expected=100)
+    session.add("Paris is the capital of France.")
+    res = session.add("Berlin is the capital of Germany.")
+    assert not res["stable"]
+
+
+def test_session_custom_embedder_needs_norm_bound():
+    # ненормированный эмбеддер: будущие ответы могут быть сколь угодно длинными
+    def embed(text):
+        return 10.0 * default_embed(text)
+
+    answers = ["Paris.", "Paris!", "paris", "Berlin"]
+    plain = ConsensusSession(embed_fn=embed, expected=5)
+    bounded = ConsensusSession(embed_fn=embed, expected=5, max_norm=10.0)
+    for a in answers:
+        plain.add(a)
+        bounded.add(a)
+    # без границы нормы ранняя остановка отключена
+    assert plain.stability_margin() == -np.inf and not plain.is_stable()
+    assert bounded.stability_margin() > -np.inf
+    # после всех ожидаемых ответов выбор стабилен в обоих случаях
+    plain.add("Paris")
+    assert plain.is_stable()
@@ -7,6 +7,7 @@ from src.gra_multiverse import (
     Goal,
     MultiverseState,
     MultiverseFunctional,
+    MultiverseOptimizer,
 )
 
 
@@ -87,3 +88,40 @@ def test_J_multiverse_two_levels():
 
     J = functional.J_multiverse(state)
     assert J > 0.0
+
+
+def test_J_multiverse_parallel_levels_match_serial():
+    levels = [Level(index=l, name=f"l{l}") for l in range(3)]
+    goals = [Goal(level=lv, description="g") for lv in levels]
+    rng = np.random.default_rng(0)
+    state = MultiverseState({
+        (i, l): rng.normal(size=3) + 1j * rng.normal(size=3)
+        for i in range(6) for l in range(3)
+    })
+
+    serial = MultiverseFunctional(levels, goals, index_dim_fn=lambda a: a[-1])
+    parallel = MultiverseFunctional(levels, goals, index_dim_fn=lambda a: a[-1], n_workers=3)
+
+    # редукция в порядке уровней => побитовое совпадение
+    assert parallel.J_multiverse(state) == serial.J_multiverse(state)
+    assert parallel.level_terms(state) == serial.level_terms(state)
+    parallel.close()
+
+    # последовательный путь не создаёт пул потоков
+    serial.J_multiverse(state)
+    assert serial.pool._executor is None
+
+
+def test_blas_section_entered_once_per_run():
+    levels = [Level(index=0, name="answers"), Level(index=1, name="meta")]
+    goals = [Goal(level=lv, description="g") for lv in levels]
+    functional = MultiverseFunctional(levels, goals, index_dim_fn=lambda a: a[-1], n_workers=2)
+    entered = []
+    section = functional.pool.section
+    functional.pool.section = lambda: (entered.append(1), section())[1]
+
+    state = MultiverseState({(0, 0): np.ones(3) + 0j, (0, 1): np.ones(3) + 1j, (1, 1): np.zeros(3) + 1j})
+    MultiverseOptimizer(functional).run_to_convergence(state, max_steps=5, tol=0.0)
+    # сотни вычислений J внутри конечных разностей, но одна секция BLAS
+    assert entered == [1]
+    functional.close()
@@ -1,5 +1,7 @@
 # tests/test_llm_anti_hallucination.py
 
+import pytest
+
 from gra_multiverse.llm_module import optimize_answers
 
 
@@ -50,3 +52,286 @@ def test_optimize_answers_returns_scores_dict():
     assert isinstance(scores, dict)
     # ожидаем, что хотя бы один уровень присутствует
     assert len(scores) >= 1
+
+
+def test_optimize_answers_many_matches_single_calls():
+    from gra_multiverse.llm_anti_hallucination import optimize_answers as optimize_one
+    from gra_multiverse.llm_anti_hallucination import optimize_answers_many
+
+    answer_lists = [
+        [
+            "Paris is the capital of France.",
+            "Paris is a large city in Germany.",
+            "paris is the capital of france. ",
+        ],
+        ["Maybe it is blue.", "It is blue."],
+    ]
+    contexts = [["France is a country in Europe. Its capital is Paris."], None]
+
+    batch = optimize_answers_many(answer_lists, contexts, {0: 0.5, 1: 1.0, 2: 2.0})
+
+    for answers, docs, res in zip(answer_lists, contexts, batch):
+        ref = optimize_one(answers, docs, {0: 0.5, 1: 1.0, 2: 2.0})
+        assert res["chosen_index"] == ref["chosen_index"]
+        for key in ("phi0", "phi1", "phi2", "total"):
+            assert res["scores"][key] == pytest.approx(ref["scores"][key])
+
+
+def test_shared_empty_context_list_means_no_context():
+    from gra_multiverse.llm_anti_hallucination.metrics import aggregate_scores, aggregate_scores_many
+
+    answer_lists = [["It is blue.", "Maybe it is red."], ["Yes.", "No."], ["A"]]
+    batch = aggregate_scores_many(answer_lists, [], {0: 0.5, 1: 1.0, 2: 2.0})
+    for answers, res in zip(answer_lists, batch):
+        ref = aggregate_scores(answers, [], {0: 0.5, 1: 1.0, 2: 2.0})
+        assert res["phi2"] == [0.0] * len(answers)
+        assert res["total"] == pytest.approx(ref["total"])
+
+
+def test_foam_level1_exact_mode_counts_different_answers():
+    from gra_multiverse.llm_anti_hallucination.metrics import foam_level1
+
+    answers = ["Paris", " paris ", "Berlin", "PARIS"]
+    # 3 «парижских» ответа совпадают после нормализации, Berlin – нет
+    assert foam_level1(answers) == [1.0, 1.0, 3.0, 1.0]
+
+
+def test_foam_level1_graded_rewards_near_duplicates():
+    from gra_multiverse.llm_anti_hallucination.metrics import foam_level1
+
+    answers = [
+        "The capital of France is Paris, a city on the Seine.",
+        "The capital of France is Paris, a city on the Seine river.",
+        "Bananas are a good source of potassium.",
+    ]
+    exact = foam_level1(answers)
+    graded = foam_level1(answers, graded=True)
+
+    assert exact == [2.0, 2.0, 2.0]
+    # почти совпадающие ответы получают меньше пены, чем несвязанный
+    assert graded[0] < exact[0]
+    assert graded[1] < exact[1]
+    assert graded[2] > graded[0]
+
+
+def test_agreement_credit_matches_pairwise_sum():
+    import numpy as np
+    from gra_multiverse.llm_anti_hallucination import minhash
+    from gra_multiverse.llm_anti_hallucination.metrics import foam_level1
+
+    base = "The capital of France is Paris, which lies on the river Seine"
+    texts = [base + f" ({i % 7})" for i in range(40)] + ["Bananas are yellow.", "Berlin."]
+    sig = minhash.minhash_signatures(texts)
+    weights = np.arange(1, len(texts) + 1, dtype=np.float64)
+
+    i, j = np.triu_indices(len(texts), k=1)
+    sim = minhash.estimate_similarity(sig, np.stack([i, j], axis=1))
+    expected = np.zeros(len(texts))
+    np.add.at(expected, i, sim * weights[j])
+    np.add.at(expected, j, sim * weights[i])
+    assert np.allclose(minhash.agreement_credit(sig, weights), expected)
+
+    # foam_level1 использует ту же оценку: близкие ответы получают меньше пены
+    scores = foam_level1(texts, graded=True)
+    assert scores[0] < scores[-1]
+
+
+def test_context_index_grounding_and_roundtrip(tmp_path):
+    from gra_multiverse.llm_anti_hallucination import ContextIndex
+
+    docs = [
+        "France is a country in Europe. Its capital is Paris.",
+        "Germany is a country in Europe. Its capital is Berlin.",
+        "Bananas are rich in potassium.",
+    ]
+    index = ContextIndex.build(docs)
+    grounded = index.grounding("the capital of france is paris.")
+    assert grounded > index.grounding("bananas taste good") > 0.0
+    assert index.grounding("completely unrelated words") == 0.0
+
+    index.save(str(tmp_path / "idx"))
+    loaded = ContextIndex.load(str(tmp_path / "idx"))
+    assert loaded.n_docs == 3
+    assert loaded.grounding("the capital of france is paris.") == pytest.approx(grounded)
+
+
+def test_optimize_answers_accepts_context_index():
+    from gra_multiverse.llm_anti_hallucination import ContextIndex
+    from gra_multiverse.llm_anti_hallucination import optimize_answers as optimize_one
+
+    index = ContextIndex.build(["France is a country in Europe. Its capital is Paris."])
+    result = optimize_one(
+        ["Paris is the capital of France.", "Bananas are yellow."],
+        context_documents=index,
+        lambda_levels={0: 0.0, 1: 0.0, 2: 1.0},
+    )
+    assert result["chosen_index"] == 0
+    assert result["scores"]["phi2"][0] < result["scores"]["phi2"][1] == 1.0
+
+
+def test_rag_engine_blocked_search_and_persistence(tmp_path):
+    import numpy as np
+    from gra_multiverse.llm_anti_hallucination import DocumentMatrix, RagConsistencyEngine
+
+    chunks = [f"filler chunk number {i} about nothing" for i in range(50)]
+    chunks[37] = "Its capital is Paris. France is a country in Europe."
+
+    path = str(tmp_path / "docs.npy")
+    docs = DocumentMatrix.build(chunks, path, batch_size=16)
+    assert isinstance(docs.matrix, np.memmap)
+    assert DocumentMatrix.load(path).meta["n_chunks"] == 50
+
+    engine = RagConsistencyEngine(docs, top_k=2, block_rows=7)
+    scores, ids = engine.search(["The capital of France is Paris."])
+    assert ids[0, 0] == 37
+    assert scores[0, 0] >= scores[0, 1]
+
+    full = RagConsistencyEngine(DocumentMatrix.from_chunks(chunks), top_k=2)
+    assert np.allclose(engine.consistency(["Paris"]), full.consistency(["Paris"]))
+
+
+def test_rag_engine_adds_level3_to_scores():
+    from gra_multiverse.llm_anti_hallucination import (
+        DocumentMatrix,
+        RagConsistencyEngine,
+        check_consistency_with_docs,
+    )
+    from gra_multiverse.llm_anti_hallucination import optimize_answers as optimize_one
+
+    docs = ["France is a country in Europe. Its capital is Paris."]
+    assert check_consistency_with_docs("its capital is paris.", docs) > 0.5
+    assert check_consistency_with_docs("bananas", docs) == pytest.approx(0.0, abs=1e-6)
+
+    engine = RagConsistencyEngine(DocumentMatrix.from_chunks(docs), top_k=1)
+    result = optimize_one(
+        ["Bananas are yellow.", "Its capital is Paris."],
+        lambda_levels={3: 1.0},
+        rag_engine=engine,
+    )
+    assert "phi3" in result["scores"]
+    assert result["chosen_index"] == 1
+
+    # с весами по умолчанию движок тоже влияет на выбор (уровень 3 не с весом 0)
+    answers = ["Bananas are yellow.", "Its capital is Paris."]
+    assert optimize_one(answers)["chosen_index"] == 0
+    assert optimize_one(answers, rag_engine=engine)["chosen_index"] == 1
+
+
+def test_default_pipeline_matches_level_functions():
+    import numpy as np
+
+    from gra_multiverse.llm_anti_hallucination.metrics import (
+        aggregate_scores,
+        foam_level0,
+        foam_level1,
+        foam_level2,
+    )
+
+    answers = ["Paris is the capital.", "paris is the capital.", "Maybe Lyon?", ""]
+    docs = ["Paris is the capital of France."]
+    scores = aggregate_scores(answers, docs, {0: 0.5, 1: 1.0, 2: 2.0})
+
+    assert np.allclose(scores["phi0"], [foam_level0(a) for a in answers])
+    assert np.allclose(scores["phi1"], foam_level1(answers))
+    assert np.allclose(scores["phi2"], foam_level2(answers, docs))
+    expected = 0.5 * np.array(scores["phi0"]) + np.array(scores["phi1"]) + 2.0 * np.array(scores["phi2"])
+    assert np.allclose(scores["total"], expected)
+
+
+def test_custom_level_plugin_shares_features(monkeypatch):
+    from gra_multiverse.llm_anti_hallucination import (
+        AnswerFeatures,
+        MetricPipeline,
+        default_pipeline,
+        register_level,
+        optimize_answers_many,
+    )
+    from gra_multiverse.llm_anti_hallucination.pipeline import LEVEL_PLUGINS
+
+    # регистрация в глобальном реестре откатывается после теста
+    monkeypatch.setitem(LEVEL_PLUGINS, "token_count", None)
+    seen = []
+
+    @register_level("token_count")
+    class TokenCountFoam:
+        def __call__(self, features):
+            seen.append(features)
+            return features.n_tokens.astype(float)
+
+    pipeline = default_pipeline().with_level(4, TokenCountFoam()).with_level(5, lambda f: f.char_len)
+    # нестандартные уровни > 2 учитываются через lambda_levels
+    results = optimize_answers_many(
+        [["a b c", "a"], ["x y", "x y z w"]],
+        lambda_levels={4: 1.0},
+        pipeline=pipeline,
+    )
+    assert [r["chosen_index"] for r in results] == [1, 0]
+    assert set(results[0]["scores"]) == {"phi0", "phi1", "phi2", "phi4", "phi5", "total"}
+    assert len(seen) == 1 and isinstance(seen[0], AnswerFeatures)
+
+    configured = MetricPipeline.from_config({0: "uncertainty", 1: ("cross_answer", {"graded": True})})
+    assert list(configured.levels) == [0, 1]
+    assert isinstance(MetricPipeline.from_config({4: "token_count"}).levels[4], TokenCountFoam)
+    with pytest.raises(KeyError):
+        MetricPipeline.from_config({0: "no_such_level"})
+
+
+def test_marker_lexicon_counts_positions_and_weights(tmp_path):
+    from gra_multiverse.llm_anti_hallucination import MarkerLexicon
+    from gra_multiverse.llm_anti_hallucination.metrics import foam_level0
+
+    lexicon = MarkerLexicon.build({"maybe": 0.2, "i guess": 0.3, "возможно": 0.4, "be": 0.05})
+    text = "Maybe. I guess maybe, возможно"
+    matches = lexicon.scan(text)
+    assert (0, 5, "maybe") in matches and (3, 5, "be") in matches
+    assert lexicon.counts(text) == {"maybe": 2, "be": 2, "i guess": 1, "возможно": 1}
+
+    counts, weights = lexicon.scan_many([text, "", "nothing here"])
+    assert counts.tolist() == [6, 0, 0]
+    assert weights[0] == pytest.approx(2 * 0.2 + 2 * 0.05 + 0.3 + 0.4)
+
+    # взвешенный штраф вместо булевого
+    assert foam_level0(text, lexicon) == pytest.approx(len(text) * 0.001 + weights[0])
+    assert foam_level0("Maybe maybe") == pytest.approx(0.011 + 0.5)
+
+    cache_dir = str(tmp_path / "lexicons")
+    first = MarkerLexicon.cached({"maybe": 0.2, "i guess": 0.3}, cache_dir)
+    second = MarkerLexicon.cached({"i guess": 0.3, "maybe": 0.2}, cache_dir)
+    assert first.markers == second.markers
+    assert second.scan_many([text])[1][0] == pytest.approx(first.scan_many([text])[1][0])
+
+
+def test_marker_lexicon_sparse_automaton_for_large_alphabets(tmp_path):
+    import random
+
+    from gra_multiverse.llm_anti_hallucination import MarkerLexicon
+
+    # CJK-подобный словарь: тысячи различных символов
+    rng = random.Random(0)
+    alphabet = [chr(0x4E00 + i) for i in range(3000)] + list("ab")
+    markers = {"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))): 1.0 for _ in range(2000)}
+    markers.update({"ab": 1.0, "bab": 1.0, "b": 1.0})
+    sparse = MarkerLexicon.build(markers)
+    assert not sparse.dense
+    assert sparse.edge_keys.nbytes + sparse.fail.nbytes < 1 << 20  # O(длина маркеров), а не states x classes
+
+    texts = ["".join(rng.choice(alphabet[:50] + list("ab ")) for _ in range(rng.randint(0, 60))) for _ in range(100)]
+    texts += [m + "x" + m for m in list(markers)[:30]]
+    expected = [sum(_count_overlapping(t, m) for m in sparse.markers) for t in texts]
+    counts, _ = sparse.scan_many(texts)
+    assert counts.tolist() == expected
+    assert [sum(sparse.counts(t).values()) for t in texts] == expected
+
+    small = MarkerLexicon.build({"ab": 1.0, "bab": 1.0, "b": 1.0})
+    assert small.dense
+    sparse_small = MarkerLexicon.build({"ab": 1.0, "bab": 1.0, "b": 1.0}, dense_limit=0)
+    assert small.scan_many(texts)[0].tolist() == sparse_small.scan_many(texts)[0].tolist()
+
+    sparse.save(str(tmp_path / "cjk"))
+    loaded = MarkerLexicon.load(str(tmp_path / "cjk"))
+    assert not loaded.dense
+    assert loaded.scan_many(texts)[0].tolist() == expected
+
+
+def _count_overlapping(text, marker):
+    return sum(1 for i in range(len(text) - len(marker) + 1) if text.startswith(marker, i))
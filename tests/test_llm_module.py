@@ -48,3 +48,44 @@ def test_optimize_answers_prefers_consistent_fact():
 
     # Ожидаем, что выбран будет один из "парижских" ответов (0 или 2)
     assert result["index"] in (0, 2)
+
+
+def test_optimize_answers_many_matches_single_calls():
+    from src.gra_multiverse.llm_module import optimize_answers_many
+
+    answer_lists = [
+        [
+            "Paris is the capital of France.",
+            "Marseille is the capital of France.",
+            "The capital of France is Paris.",
+        ],
+        [],
+        ["Water boils at 100 C.", "Water boils at 50 C."],
+        ["Единственный ответ."],
+    ]
+
+    batch = optimize_answers_many(answer_lists)
+    single = [optimize_answers(answers=a, max_steps=5) for a in answer_lists]
+
+    assert len(batch) == len(answer_lists)
+    for b, s in zip(batch, single):
+        assert b["index"] == s["index"]
+        assert b["chosen"] == s["chosen"]
+
+    # те же гиперпараметры, что у optimize_answers; мета-узел стационарен
+    kwargs = dict(lambda0=2.0, alpha=0.5, step_size=5e-2, max_steps=3)
+    tuned = optimize_answers_many(answer_lists, **kwargs)
+    assert tuned == batch
+    assert [t["index"] for t in tuned] == [optimize_answers(a, **kwargs)["index"] for a in answer_lists]
+
+
+def test_default_embed_many_matches_default_embed():
+    import numpy as np
+    from src.gra_multiverse.llm_module import default_embed, default_embed_many
+
+    texts = ["Hello, World!", "", "Привет, мир ёж", "123"]
+    mat = default_embed_many(texts)
+
+    assert mat.shape == (len(texts), default_embed("x").size)
+    for row, t in zip(mat, texts):
+        assert np.allclose(row, default_embed(t))
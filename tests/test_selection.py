@@ -0,0 +1,100 @@
+# tests/test_selection.py
+
+import numpy as np
+
+from src.gra_multiverse.selection import ExactIndex, LSHIndex, cosine_similarities, top_k
+from src.gra_multiverse.llm_module import optimize_answers
+from src.gra_multiverse.vpn_selector import VpnSelector
+
+
+def _clustered(n=4000, d=16, n_centers=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_centers, d)) + 1j * rng.normal(size=(n_centers, d))
+    noise = 0.1 * (rng.normal(size=(n, d)) + 1j * rng.normal(size=(n, d)))
+    return centers[rng.integers(n_centers, size=n)] + noise, centers
+
+
+def test_top_k_ranks_and_breaks_ties_by_index():
+    scores = np.array([0.1, 0.9, 0.5, 0.9, 0.5, 0.2])
+    idx, vals = top_k(scores, 4)
+    assert idx.tolist() == [1, 3, 2, 4]
+    assert vals.tolist() == [0.9, 0.9, 0.5, 0.5]
+    # k == 1 совпадает с argmax; k > n возвращает всё
+    assert top_k(scores, 1)[0].tolist() == [int(np.argmax(scores))]
+    assert top_k(scores, 10)[0].tolist() == [1, 3, 2, 4, 5, 0]
+
+
+def test_cosine_similarities_match_python_loop():
+    E, _ = _clustered(n=50)
+    q = E.mean(axis=0)
+    expected = [
+        float(np.real(np.vdot(e, q))) / (np.linalg.norm(e) * np.linalg.norm(q) + 1e-9) for e in E
+    ]
+    assert np.allclose(cosine_similarities(E, q), expected)
+
+
+def test_lsh_index_recall_and_update():
+    E, centers = _clustered()
+    exact = ExactIndex(E)
+    lsh = LSHIndex(E.copy(), n_bits=10, n_tables=8)
+
+    hits = 0
+    for q in centers[:20]:
+        hits += len(set(exact.search(q, 10)[0]) & set(lsh.search(q, 10)[0]))
+    assert hits / (20 * 10) >= 0.9
+
+    # после изменения строки индекс находит её по новому значению
+    lsh.embeds[7] = centers[3] * 5.0
+    lsh.update([7])
+    idx, sims = lsh.search(centers[3], 1)
+    assert idx[0] == 7 and np.isclose(sims[0], 1.0)
+
+
+def test_lsh_update_does_not_resort_buckets():
+    E, centers = _clustered()
+    lsh = LSHIndex(E.copy(), n_bits=10, n_tables=8)
+    lsh.search(centers[0], 1)
+    buckets = lsh._sorted
+
+    # единичные обновления не пересортировывают таблицы (O(rows), не O(n log n))
+    for step, row in enumerate([11, 250, 3999]):
+        lsh.embeds[row] = centers[step] * 3.0
+        lsh.update([row])
+        idx, _ = lsh.search(centers[step], 1)
+        assert idx[0] == row
+        assert lsh._sorted is buckets
+    assert lsh._dirty.tolist() == [11, 250, 3999]
+
+    # при большом оверлее индекс перестраивается и остаётся точным
+    rows = np.arange(200)
+    lsh.embeds[rows] = centers[5]
+    lsh.update(rows)
+    assert lsh._sorted is None
+    assert set(lsh.search(centers[5], 5)[0]) <= set(rows.tolist())
+    # слишком большие корзины -> None, search переходит к точному скану
+    assert lsh.candidates(centers[0], limit=0) is None
+
+
+def test_optimize_answers_top_k_candidates():
+    answers = ["Paris is the capital.", "Paris is the capital!", "Berlin.", "Madrid maybe"]
+    res = optimize_answers(answers, top_k=3)
+    cands = res["candidates"]
+    assert len(cands) == 3
+    assert cands[0]["index"] == res["index"]
+    assert cands[0]["answer"] == res["chosen"]
+    sims = [c["similarity"] for c in cands]
+    assert sims == sorted(sims, reverse=True)
+    assert "candidates" not in optimize_answers(answers)
+
+
+def test_vpn_selector_lsh_matches_exact():
+    rng = np.random.default_rng(1)
+    configs = [
+        {"latency_ms": float(rng.uniform(10, 200)), "jitter_ms": float(rng.uniform(0, 30)),
+         "packet_loss": float(rng.uniform(0, 0.05)), "uptime_score": float(rng.uniform(0.8, 1.0))}
+        for _ in range(200)
+    ]
+    exact = VpnSelector(configs)
+    lsh = VpnSelector(configs, search="lsh")
+    assert lsh.index == exact.index
+    assert [c["index"] for c in lsh.candidates(3)] == [c["index"] for c in exact.candidates(3)]
@@ -0,0 +1,86 @@
+# tests/test_serialization.py
+
+import numpy as np
+import pytest
+
+from src.gra_multiverse.core import MultiverseState
+from src.gra_multiverse.serialization import (
+    save_state,
+    load_state,
+    load_level_block,
+    read_header,
+    ALIGN,
+)
+from src.gra_multiverse.vpn_module import default_index_dim_fn
+
+
+def _state():
+    rng = np.random.default_rng(0)
+    states = {(i, 0): rng.normal(size=4) + 1j * rng.normal(size=4) for i in range(5)}
+    states[(0, 1)] = np.ones(4, dtype=np.complex128)
+    states[(0, 0, 2)] = np.arange(3, dtype=np.float64)  # уровень 2, другая форма
+    return MultiverseState(states)
+
+
+def test_roundtrip_mmap_is_readonly_view(tmp_path):
+    path = str(tmp_path / "state.gra")
+    state = _state()
+    save_state(state, path, index_dim_fn=default_index_dim_fn)
+
+    loaded = load_state(path)
+    assert set(loaded.keys()) == set(state.keys())
+    for k in state.keys():
+        np.testing.assert_array_equal(loaded[k], state[k])
+        assert not loaded[k].flags.writeable
+
+    header = read_header(path)
+    assert all(meta["offset"] % ALIGN == 0 for meta in header["levels"])
+
+    # copy() даёт изменяемые массивы
+    writable = loaded.copy()
+    writable[(0, 1)][0] = 5.0
+
+
+def test_partial_levels_and_level_block(tmp_path):
+    path = str(tmp_path / "state.gra")
+    state = _state()
+    save_state(state, path, index_dim_fn=default_index_dim_fn)
+
+    only_meta = load_state(path, levels=[1], mmap=False)
+    assert list(only_meta.keys()) == [(0, 1)]
+
+    keys, block = load_level_block(path, 0)
+    assert block.shape == (5, 4)
+    for k, row in zip(keys, block):
+        np.testing.assert_array_equal(row, state[k])
+
+    with pytest.raises(KeyError):
+        load_level_block(path, 7)
+
+
+def test_partial_load_decodes_only_requested_keys(tmp_path, monkeypatch):
+    from src.gra_multiverse import serialization
+
+    path = str(tmp_path / "big.gra")
+    states = {(i, 0): np.full(2, i, dtype=np.complex128) for i in range(10000)}
+    states[(0, 1)] = np.ones(2, dtype=np.complex128)
+    save_state(MultiverseState(states), path, index_dim_fn=default_index_dim_fn)
+
+    decoded = []
+    original = serialization._keys
+
+    def spy(buf, header, meta):
+        keys = original(buf, header, meta)
+        decoded.append(len(keys))
+        return keys
+
+    monkeypatch.setattr(serialization, "_keys", spy)
+    # ключи уровня 0 (10000 штук) не превращаются в кортежи
+    assert list(load_state(path, levels=[1]).keys()) == [(0, 1)]
+    assert decoded == [1]
+
+
+def test_mismatched_shapes_in_level_raise(tmp_path):
+    state = MultiverseState({(0, 0): np.zeros(3), (1, 0): np.zeros(4)})
+    with pytest.raises(ValueError):
+        save_state(state, str(tmp_path / "bad.gra"))
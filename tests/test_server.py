@@ -0,0 +1,174 @@
+# tests/test_server.py
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from src.gra_multiverse.server import ScoringServer
+
+
+ANSWERS = ["Paris is the capital of France.", "Paris, France.", "London is the capital."]
+CONFIGS = [
+    {"protocol": "wireguard", "port": 51820, "latency_ms": 40, "packet_loss": 0.01},
+    {"protocol": "openvpn", "port": 1194, "latency_ms": 90, "packet_loss": 0.05},
+]
+
+
+def test_handle_line_dispatches_methods_and_reports_stats():
+    async def main():
+        server = ScoringServer(batch_window=0.01)
+        lines = [
+            json.dumps({"id": 1, "method": "optimize_answers", "params": {"answers": ANSWERS}}),
+            json.dumps({
+                "id": 2,
+                "method": "optimize_answers_grounded",
+                "params": {"answers": ANSWERS, "context_documents": ["Paris is the capital of France."],
+                           "lambda_levels": {"0": 0.5, "1": 1.0, "2": 2.0}},
+            }),
+            json.dumps({"id": 3, "method": "select_best_vpn_config", "params": {"configs": CONFIGS}}),
+            json.dumps({"id": 4, "method": "no_such_method"}),
+            "not json",
+        ]
+        out = await asyncio.gather(*(server.handle_line(line) for line in lines))
+        stats = await server.handle_line(json.dumps({"id": 5, "method": "stats"}))
+        await server.aclose()
+        return [json.loads(o) for o in out], json.loads(stats)
+
+    responses, stats = asyncio.run(main())
+    assert responses[0]["result"]["index"] in range(3)
+    assert responses[1]["result"]["answer"] in ANSWERS
+    assert responses[2]["result"]["index"] in (0, 1)
+    assert responses[3]["error"]["type"] == "ValueError"
+    assert responses[4]["id"] is None and "error" in responses[4]
+
+    result = stats["result"]
+    assert result["queue_depth"] == 1  # сам запрос stats
+    assert result["requests"]["optimize_answers"] == 1
+    assert result["errors"] == 2
+    assert "p99" in result["latency_ms"]
+
+
+def test_serve_stream_bounds_in_flight_requests_and_warms_answer_cache():
+    async def main():
+        server = ScoringServer(batch_window=0.001, max_in_flight=4)
+        running, peak = 0, 0
+
+        async def slow(params, timeout):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return params["n"]
+
+        server.methods["slow"] = slow
+        reader = asyncio.StreamReader()
+        for n in range(50):
+            reader.feed_data((json.dumps({"id": n, "method": "slow", "params": {"n": n}}) + "\n").encode())
+        request = {"method": "optimize_answers", "params": {"answers": ANSWERS}}
+        reader.feed_data((json.dumps(dict(request, id=50)) + "\n").encode())
+        reader.feed_eof()
+
+        out = []
+        await server.serve_stream(reader, out.append)
+        out.append(await server.handle_line(json.dumps(dict(request, id=51))))
+        await server.aclose()
+        return peak, {r["id"]: r for r in map(json.loads, out)}, server.cache
+
+    peak, responses, cache = asyncio.run(main())
+    # не больше max_in_flight одновременных запросов, но все получили ответ
+    assert peak <= 4 and len(responses) == 52
+    # повторный optimize_answers обслужен общим кэшем сервера
+    assert "cache=hit" in responses[51]["result"]["debug"]
+    assert responses[51]["result"]["index"] == responses[50]["result"]["index"]
+    assert cache.hits == 1
+
+
+def test_unix_socket_round_trip(tmp_path):
+    path = str(tmp_path / "gra.sock")
+
+    async def main():
+        server = ScoringServer()
+        unix = await server.start_unix(path)
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write((json.dumps({"id": "a", "method": "ping"}) + "\n").encode())
+        await writer.drain()
+        line = await reader.readline()
+        writer.close()
+        unix.close()
+        await unix.wait_closed()
+        await server.aclose()
+        return json.loads(line)
+
+    assert asyncio.run(main()) == {"id": "a", "result": "pong"}
+
+
+def test_cli_serve_over_stdio():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    request = json.dumps({"id": 7, "method": "optimize_answers", "params": {"answers": ANSWERS}})
+    proc = subprocess.run(
+        [sys.executable, "-m", "src.gra_multiverse.cli", "serve"],
+        input=request + "\n",
+        capture_output=True,
+        text=True,
+        cwd=root,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    response = json.loads(proc.stdout.strip().splitlines()[-1])
+    assert response["id"] == 7 and "chosen" in response["result"]
+
+
+def test_cli_serve_reads_requests_from_a_regular_file(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    requests = tmp_path / "requests.jsonl"
+    requests.write_text(
+        json.dumps({"id": 1, "method": "ping"}) + "\n"
+        + json.dumps({"id": 2, "method": "optimize_answers", "params": {"answers": ANSWERS}}) + "\n"
+    )
+    with open(requests) as stdin:
+        proc = subprocess.run(
+            [sys.executable, "-m", "src.gra_multiverse.cli", "serve"],
+            stdin=stdin,
+            capture_output=True,
+            text=True,
+            cwd=root,
+            timeout=60,
+        )
+    assert proc.returncode == 0, proc.stderr
+    responses = {r["id"]: r for r in map(json.loads, proc.stdout.strip().splitlines())}
+    assert responses[1]["result"] == "pong" and "chosen" in responses[2]["result"]
+
+
+def test_cli_refuses_to_remove_non_socket_path(tmp_path):
+    from src.gra_multiverse.cli import main
+
+    target = tmp_path / "important.txt"
+    target.write_text("keep me")
+    try:
+        main(["serve", "--socket", str(target)])
+    except SystemExit as exc:
+        assert "not a socket" in str(exc)
+    else:
+        raise AssertionError("expected SystemExit")
+    assert target.read_text() == "keep me"
+
+
+def test_installed_entry_point_imports():
+    # как консольный скрипт gra-multiverse: пакет импортируется из src/, а не как src.*
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.path.join(root, "src"))
+    script = "import sys; from gra_multiverse.cli import main; sys.exit(main())"
+    proc = subprocess.run(
+        [sys.executable, "-c", script, "serve"],
+        input=json.dumps({"id": 1, "method": "ping"}) + "\n",
+        capture_output=True,
+        text=True,
+        cwd=str(os.path.dirname(root)),
+        env=env,
+        timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.strip())["result"] == "pong"
@@ -0,0 +1,72 @@
+# tests/test_tiled.py
+
+import warnings
+
+import numpy as np
+
+from src.gra_multiverse.core import FoamFunctional, Level, MultiverseState
+from src.gra_multiverse.serialization import save_state
+from src.gra_multiverse.tiled import TiledFoamEvaluator
+from src.gra_multiverse.vpn_module import default_index_dim_fn
+
+
+def _vectors(n=17, d=4, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, d)) + 1j * rng.normal(size=(n, d))
+
+
+def _reference_phi(vectors):
+    state = MultiverseState({(i, 0): v for i, v in enumerate(vectors)})
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # phi_level отбрасывает мнимую часть
+        return FoamFunctional().phi_level(state, Level(index=0, name="l0"), default_index_dim_fn)
+
+
+def test_tiled_phi_matches_phi_level_for_any_tile_size():
+    vectors = _vectors()
+    ref = _reference_phi(vectors)
+    for tile_rows in (1, 4, 5, 17, None):
+        ev = TiledFoamEvaluator(tile_rows=tile_rows)
+        assert np.isclose(ev.phi(vectors), ref)
+
+
+def test_tiled_gradient_matches_dense_and_finite_differences():
+    vectors = _vectors()
+    ev = TiledFoamEvaluator(tile_rows=5, prefetch=True)
+    _, grad = ev.phi_and_grad(vectors)
+
+    gram = np.real(np.conj(vectors) @ vectors.T)
+    np.fill_diagonal(gram, 0.0)
+    np.testing.assert_allclose(grad, 4.0 * gram @ vectors, atol=1e-10)
+
+    eps = 1e-6
+    plus, minus = vectors.copy(), vectors.copy()
+    plus[3, 1] += eps
+    minus[3, 1] -= eps
+    fd = (ev.phi(plus) - ev.phi(minus)) / (2 * eps)
+    assert np.isclose(fd, grad[3, 1].real, rtol=1e-5)
+
+
+def test_tiled_phi_from_memory_mapped_state_file(tmp_path):
+    vectors = _vectors(n=9)
+    state = MultiverseState({(i, 0): v for i, v in enumerate(vectors)})
+    state[(0, 1)] = np.ones(4, dtype=np.complex128)
+    path = str(tmp_path / "state.gra")
+    save_state(state, path, index_dim_fn=default_index_dim_fn)
+
+    ev = TiledFoamEvaluator(memory_budget=1024)
+    assert ev.rows_per_tile(9, 4) < 9
+    assert np.isclose(ev.phi_file(path, 0), _reference_phi(vectors))
+    assert ev.phi_file(path, 1) == 0.0
+
+
+def test_parallel_tiles_are_bitwise_reproducible():
+    vectors = _vectors(n=40, d=6, seed=3)
+    serial = TiledFoamEvaluator(tile_rows=7, n_workers=1)
+    phi_ref, grad_ref = serial.phi_and_grad(vectors)
+    for n_workers in (2, 4):
+        ev = TiledFoamEvaluator(tile_rows=7, n_workers=n_workers)
+        phi, grad = ev.phi_and_grad(vectors)
+        ev.close()
+        assert phi == phi_ref
+        assert np.array_equal(grad, grad_ref)
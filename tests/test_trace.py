@@ -0,0 +1,67 @@
+# tests/test_trace.py
+
+import os
+
+import numpy as np
+
+from src.gra_multiverse import Level, Goal, MultiverseState, MultiverseFunctional, MultiverseOptimizer
+from src.gra_multiverse.trace import TraceRecorder, replay
+
+
+def _problem(step_size=1e-2):
+    levels = [Level(index=0, name="answers"), Level(index=1, name="meta")]
+    goals = [Goal(level=l, description=l.name) for l in levels]
+    functional = MultiverseFunctional(levels=levels, goals=goals, index_dim_fn=lambda a: a[-1])
+    rng = np.random.default_rng(0)
+    states = {(i, 0): rng.normal(size=3) + 1j * rng.normal(size=3) for i in range(3)}
+    states[(0, 1)] = np.mean(list(states.values()), axis=0)
+    states[(1, 1)] = states[(0, 0)] + 0.5
+    return MultiverseState(states), MultiverseOptimizer(functional, step_size=step_size)
+
+
+def test_trace_matches_callback_and_does_not_change_result():
+    state, opt = _problem()
+    seen = []
+    plain = opt.run_to_convergence(state, max_steps=6, tol=0.0, callback=lambda t, v: seen.append(v))
+
+    trace = TraceRecorder(capacity=4)
+    traced = opt.run_to_convergence(state, max_steps=6, tol=0.0, trace=trace)
+    for k in plain.keys():
+        assert np.array_equal(plain[k], traced[k])
+
+    # кольцевой буфер хранит только последние 4 шага, в хронологическом порядке
+    data = trace.arrays()
+    assert len(trace) == 4 and trace.n_recorded == 6
+    assert data["step"].tolist() == [2, 3, 4, 5]
+    assert data["J"].tolist() == seen[2:]
+    assert data["levels"].shape == (4, 2)
+    assert np.allclose(data["levels"].sum(axis=1), data["J"])
+    assert np.allclose(data["update_norm"], 1e-2 * data["grad_norm"])
+
+
+def test_snapshots_are_bounded_and_replay_continues(tmp_path):
+    state, opt = _problem()
+    trace = TraceRecorder(snapshot_every=2, snapshot_dir=str(tmp_path), max_snapshots=2)
+    final = opt.run_to_convergence(state, max_steps=6, tol=0.0, trace=trace)
+
+    assert [s for s, _ in trace.snapshots] == [3, 5]
+    assert sorted(os.listdir(tmp_path)) == ["step_00000003.gramvs", "step_00000005.gramvs"]
+
+    # повтор с шага 3 с теми же гиперпараметрами даёт тот же результат
+    step, path = trace.snapshot_at(4)
+    assert step == 3
+    resumed = TraceRecorder()
+    out = replay(opt, path, max_steps=2, tol=0.0, trace=resumed)
+    for k in final.keys():
+        assert np.allclose(out[k], final[k])
+    assert resumed.arrays()["step"].tolist() == [4, 5]
+
+    # replay с другим шагом оптимизатора
+    _, faster = _problem(step_size=5e-2)
+    replay(faster, path, max_steps=2, tol=0.0, trace=resumed)
+    assert resumed.arrays()["step_size"].tolist() == [1e-2, 1e-2, 5e-2, 5e-2]
+
+    trace.save(str(tmp_path / "trace.npz"))
+    loaded = TraceRecorder.load(str(tmp_path / "trace.npz"))
+    assert loaded["snapshot_steps"].tolist() == [3, 5]
+    assert np.array_equal(loaded["J"], trace.arrays()["J"])
@@ -0,0 +1,100 @@
+# tests/test_vpn_io.py
+
+import csv
+import json
+
+import numpy as np
+
+from src.gra_multiverse import vpn_io
+from src.gra_multiverse.vpn_io import iter_config_chunks, load_config_columns, select_best_vpn_config_from_file
+from src.gra_multiverse.vpn_module import (
+    configs_to_columns,
+    default_vpn_embed,
+    default_vpn_embed_batch,
+    select_best_vpn_config,
+)
+
+
+def _fleet():
+    return [
+        {"protocol": "udp", "port": 443, "latency_ms": 40, "jitter_ms": 5, "packet_loss": 0.01, "uptime_score": 0.9},
+        {"protocol": "tcp", "port": 443, "latency_ms": 120, "jitter_ms": 30, "packet_loss": 0.05, "uptime_score": 0.6},
+        {"protocol": "udp", "port": 8443, "latency_ms": 45, "jitter_ms": 6, "packet_loss": 0.01, "uptime_score": 0.9},
+        {"protocol": "tls", "port": 443, "latency_ms": 300, "jitter_ms": 80, "packet_loss": 0.2, "uptime_score": 0.3},
+    ]
+
+
+def test_columnar_embedding_matches_per_config_embedding():
+    configs = _fleet() + [{}, {"protocol": "unknown", "obfuscation": True, "rkn_blocked": True}]
+    mat = default_vpn_embed_batch(configs_to_columns(configs))
+    for row, cfg in zip(mat, configs):
+        assert np.allclose(row, default_vpn_embed(cfg))
+
+    ref = select_best_vpn_config(configs, max_steps=5)
+    res = select_best_vpn_config(configs_to_columns(configs), max_steps=5)
+    assert res["index"] == ref["index"]
+
+
+def test_select_from_jsonl_and_csv_files(tmp_path):
+    configs = [dict(cfg, name=f"node-{i}") for i, cfg in enumerate(_fleet())]
+    ref = select_best_vpn_config(configs, max_steps=5)
+
+    jsonl = tmp_path / "fleet.jsonl"
+    jsonl.write_text("\n".join(json.dumps(c) for c in configs), encoding="utf-8")
+    assert [len(c) for c in iter_config_chunks(str(jsonl), chunk_size=3)] == [3, 1]
+
+    res = select_best_vpn_config_from_file(str(jsonl), chunk_size=3, max_steps=5)
+    assert res["index"] == ref["index"]
+    assert res["config"]["name"] == f"node-{ref['index']}"
+
+    path_csv = tmp_path / "fleet.csv"
+    with open(path_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(configs[0]))
+        writer.writeheader()
+        writer.writerows(configs)
+    res = select_best_vpn_config_from_file(str(path_csv), max_steps=5)
+    assert res["index"] == ref["index"]
+
+
+def test_chunks_match_per_config_columns(tmp_path):
+    configs = _fleet() + [
+        {},
+        {"protocol": " UDP ", "obfuscation": "yes", "rkn_blocked": 0, "latency_ms": "", "port": "8443"},
+        {"protocol": None, "obfuscation": True, "rkn_blocked": "false", "uptime_score": None},
+    ]
+    jsonl = tmp_path / "fleet.jsonl"
+    jsonl.write_text("\n".join(json.dumps(c) for c in configs), encoding="utf-8")
+
+    # поколоночное заполнение чанка совпадает с построчным configs_to_columns
+    loaded = load_config_columns(str(jsonl), chunk_size=4)
+    assert np.array_equal(loaded[:4], configs_to_columns(_fleet()))
+    assert loaded[4] == configs_to_columns([{}])[0]
+
+    # пустые значения -> умолчания, строки из CSV разбираются как в файле
+    assert loaded["protocol"][5] == 1 and loaded["port"][5] == 8443.0
+    assert loaded["obfuscation"][5] and not loaded["rkn_blocked"][5]
+    assert loaded["latency_ms"][5] == configs_to_columns([{}])["latency_ms"][0]
+    assert loaded["protocol"][6] == 0 and loaded["obfuscation"][6] and not loaded["rkn_blocked"][6]
+    assert loaded["uptime_score"][6] == configs_to_columns([{}])["uptime_score"][0]
+
+
+def test_file_selection_reads_the_file_once(tmp_path, monkeypatch):
+    configs = [dict(cfg, name=f"node-{i}", note="line one\nline two") for i, cfg in enumerate(_fleet())]
+    ref = select_best_vpn_config(configs, max_steps=5)
+
+    path_csv = tmp_path / "fleet.csv"
+    with open(path_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(configs[0]))
+        writer.writeheader()
+        writer.writerows(configs)
+
+    passes = []
+    iter_records = vpn_io._iter_records
+    monkeypatch.setattr(vpn_io, "_iter_records", lambda *a: (passes.append(a), iter_records(*a))[1])
+    res = select_best_vpn_config_from_file(str(path_csv), chunk_size=3, max_steps=5)
+
+    # один проход по файлу; выбранная запись читается по смещению (с многострочным полем)
+    assert len(passes) == 1
+    assert res["index"] == ref["index"]
+    assert res["config"]["name"] == f"node-{ref['index']}"
+    assert res["config"]["note"] == "line one\nline two"
@@ -0,0 +1,69 @@
+# tests/test_vpn_probe.py
+
+import asyncio
+import socket
+
+from src.gra_multiverse.vpn_module import select_best_vpn_config
+from src.gra_multiverse.vpn_probe import ProbeHarness, endpoint_of
+
+
+class _Echo(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(data, addr)
+
+
+def _closed_port() -> int:
+    # порт, на котором гарантированно никто не слушает
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def test_probe_harness_against_loopback_servers():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        tcp_server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        tcp_port = tcp_server.sockets[0].getsockname()[1]
+        udp_transport, _ = await loop.create_datagram_endpoint(_Echo, local_addr=("127.0.0.1", 0))
+        udp_port = udp_transport.get_extra_info("sockname")[1]
+
+        configs = [
+            {"host": "127.0.0.1", "port": tcp_port, "protocol": "tcp"},
+            {"host": "127.0.0.1", "port": udp_port, "protocol": "udp"},
+            {"host": "127.0.0.1", "port": _closed_port(), "protocol": "tcp", "latency_ms": 20.0},
+            {"protocol": "tcp", "port": 443, "latency_ms": 50.0},  # без host: не опрашивается
+            # WireGuard работает по UDP; без payload рукопожатия метрики не трогаем
+            {"host": "127.0.0.1", "port": udp_port, "protocol": "wireguard", "latency_ms": 30.0},
+        ]
+        harness = ProbeHarness(concurrency=2, timeout=0.5, probes_per_round=3, udp_payloads={"udp": b"gra-probe"})
+        try:
+            await harness.refresh(configs, rounds=2)
+        finally:
+            tcp_server.close()
+            await tcp_server.wait_closed()
+            udp_transport.close()
+        return configs
+
+    configs = asyncio.run(scenario())
+    ok_tcp, ok_udp, dead, no_host, wireguard = configs
+
+    for cfg in (ok_tcp, ok_udp):
+        assert cfg["packet_loss"] == 0.0
+        assert cfg["uptime_score"] == 1.0
+        assert cfg["latency_ms"] >= 0.0
+        assert cfg["jitter_ms"] >= 0.0
+    assert dead["packet_loss"] == 1.0
+    assert dead["uptime_score"] == 0.0
+    # мёртвый эндпоинт не сохраняет старую «хорошую» задержку
+    assert dead["latency_ms"] == dead["jitter_ms"] == 500.0
+    assert no_host == {"protocol": "tcp", "port": 443, "latency_ms": 50.0}
+    assert endpoint_of(wireguard)[2] == "udp"
+    assert wireguard == {"host": "127.0.0.1", "port": wireguard["port"], "protocol": "wireguard", "latency_ms": 30.0}
+
+    # метрики сразу пригодны для выбора конфигурации
+    assert select_best_vpn_config(configs, max_steps=5)["index"] in range(5)
@@ -0,0 +1,47 @@
+# tests/test_vpn_selector.py
+
+from src.gra_multiverse.vpn_module import select_best_vpn_config
+from src.gra_multiverse.vpn_selector import VpnSelector
+
+
+def _fleet():
+    return [
+        {"protocol": "udp", "port": 443, "latency_ms": 40, "jitter_ms": 5, "packet_loss": 0.01, "uptime_score": 0.9},
+        {"protocol": "tcp", "port": 443, "latency_ms": 120, "jitter_ms": 30, "packet_loss": 0.05, "uptime_score": 0.6},
+        {"protocol": "udp", "port": 8443, "latency_ms": 45, "jitter_ms": 6, "packet_loss": 0.01, "uptime_score": 0.9},
+        {"protocol": "tls", "port": 443, "latency_ms": 300, "jitter_ms": 80, "packet_loss": 0.2, "uptime_score": 0.3},
+    ]
+
+
+def test_selector_initial_choice_matches_function():
+    configs = _fleet()
+    selector = VpnSelector(configs)
+    ref = select_best_vpn_config(configs, max_steps=5)
+    assert selector.result()["index"] == ref["index"]
+
+
+def test_selector_update_matches_rebuild_and_hysteresis():
+    configs = _fleet()
+    selector = VpnSelector(configs, hysteresis=0.0)
+    res = selector.update({3: {"latency_ms": 40, "jitter_ms": 5, "packet_loss": 0.01, "uptime_score": 0.9}})
+
+    configs[3].update({"latency_ms": 40, "jitter_ms": 5, "packet_loss": 0.01, "uptime_score": 0.9})
+    ref = select_best_vpn_config(configs, max_steps=5)
+    assert res["index"] == ref["index"]
+
+    # большой гистерезис: выбор не меняется, даже если текущий конфиг ухудшился
+    sticky = VpnSelector(_fleet(), hysteresis=10.0)
+    before = sticky.result()["index"]
+    res = sticky.update({before: {"latency_ms": 900, "packet_loss": 0.5}})
+    assert res["index"] == before
+    assert res["switched"] is False
+
+
+def test_selector_resums_embeddings_periodically():
+    import numpy as np
+
+    selector = VpnSelector(_fleet(), resum_every=3)
+    for k in range(3):
+        selector.update({k: {"latency_ms": 50 + k}})
+    # после resum_every обновлений сумма пересчитана заново, без накопленной ошибки
+    assert np.array_equal(selector._sum, selector.embeds.sum(axis=0))